@@ -1,12 +1,23 @@
-function acss_build_and_run(payloadPath, outJsonPath, templateSlxPath)
+function acss_build_and_run(payloadPath, outJsonPath, templateSlxPath, options)
 % ACSS MATLAB runner:
 % - Loads payload and generated controller artifacts.
 % - Runs Simulink simulation on the selected template.
-% - Extracts validation metrics from logged signals.
+% - Dumps the logged output/power signals; metrics are computed on the Python
+%   side (src/sim/metrics.py) so every validation mode shares one definition.
+% - Given a batch manifest (JSON with a "jobs" list) instead of a payload, builds
+%   one Simulink.SimulationInput per job, runs them with parsim (or sim), writes
+%   each job's result file and a batch summary at outJsonPath.
+% - Reports stages through acss_progress (streamed to the bridge's progress callback).
+% - options.fast_restart ('off' | 'structural' | 'tunable') keeps the model
+%   compiled between calls in a persistent worker: 'structural' recompiles,
+%   'tunable' only pushes new par/ctrl values into the compiled model.
 
 if nargin < 3
     templateSlxPath = '';
 end
+if nargin < 4
+    options = struct();
+end
 
 startDir = pwd;
 cleanupPwd = onCleanup(@() cd(startDir)); %#ok<NASGU>
@@ -36,6 +47,11 @@ if ~isfolder(cacheDir), mkdir(cacheDir); end
 if ~isfolder(codegenDir), mkdir(codegenDir); end
 Simulink.fileGenControl('set', 'CacheFolder', cacheDir, 'CodeGenFolder', codegenDir, 'createDir', true);
 
+if isfield(payload, 'jobs')
+    run_manifest(payload, outJsonPath, templateSlxPath, startDir);
+    return;
+end
+
 if ~isempty(templateSlxPath) && isfile(templateSlxPath)
     modelPath = templateSlxPath;
 elseif isfield(payload, 'topology') && isfield(payload.topology, 'topology') && strcmp(string(payload.topology.topology), "inverter_3ph")
@@ -46,80 +62,248 @@ end
 
 warnings = {};
 simOk = false;
-metrics = struct('overshoot_pct', 999, 'settling_time_ms', 999, 'ripple_v_pp', 999, 'efficiency_pct', 0);
-waveformFile = strrep(outJsonPath, '.json', '_waveform.json');
 
 try
     if ~isfile(modelPath)
         error('TemplateNotFound: %s', modelPath);
     end
 
-    paramsFcn = fullfile(runDir, 'acss_params.m');
-    if ~isfile(paramsFcn)
-        error('MissingGeneratedParams: %s', paramsFcn);
-    end
-
-    addpath(runDir);
     [~, modelName, ~] = fileparts(modelPath);
+    acss_progress('load_model', 0.05);
     load_system(modelPath);
 
-    [par, ctrl] = acss_params();
+    acss_progress('load_params', 0.15);
+    [par, ctrl] = load_job_params(runDir);
     assignin('base', 'par', par);
     assignin('base', 'ctrl', ctrl);
 
-    simOut = sim(modelName, 'ReturnWorkspaceOutputs', 'on', 'SrcWorkspace', 'base');
+    frMode = fast_restart_mode(options);
+    if bind_ctrl_parameter(modelName, ctrl) && strcmp(frMode, 'tunable')
+        % Rebinding the S-Function parameter is a structural edit.
+        frMode = 'structural';
+    end
+    acss_progress(['simulate_' frMode], 0.25);
+    simOut = sim_fast_restart(modelName, frMode);
+
+    acss_progress('extract_signals', 0.9);
+    wf = extract_signals(simOut);
+    simOk = true;
+catch ME
+    warnings{end+1} = sprintf('MATLAB validation fallback: %s', ME.message); %#ok<AGROW>
+    warnings{end+1} = getReport(ME, 'extended', 'hyperlinks', 'off'); %#ok<AGROW>
+    wf = fallback_signals(payload);
+end
+
+write_result(outJsonPath, wf, simOk, warnings, modelPath);
+acss_progress('done', 1.0);
+end
+
+function run_manifest(manifest, outJsonPath, templateSlxPath, startDir)
+if ~isempty(templateSlxPath) && isfile(templateSlxPath)
+    modelPath = templateSlxPath;
+elseif isfield(manifest, 'template') && isfile(char(string(manifest.template)))
+    modelPath = char(string(manifest.template));
+else
+    modelPath = fullfile(startDir, 'examples', 'topology.slx');
+end
+
+jobs = manifest.jobs;
+if iscell(jobs)
+    jobs = [jobs{:}];
+end
+n = numel(jobs);
+status = repmat(struct('id', '', 'ok', false, 'error', ''), n, 1);
+payloads = cell(n, 1);
+simIn = Simulink.SimulationInput.empty(0, 1);
+simIdx = zeros(0, 1);
+useParsim = false;
+
+try
+    if ~isfile(modelPath)
+        error('TemplateNotFound: %s', modelPath);
+    end
+    [~, modelName, ~] = fileparts(modelPath);
+    acss_progress('load_model', 0.05);
+    load_system(modelPath);
 
-    [t, vout] = pick_signal(simOut, {'vout','v_out','vo','vabc','v_a'});
-    if isempty(t) || isempty(vout)
-        warnings{end+1} = 'Missing vout waveform; using fallback metrics.'; %#ok<AGROW>
-        error('MissingVoutSignal');
+    acss_progress('load_params', 0.1);
+    for k = 1:n
+        status(k).id = char(string(jobs(k).id));
+        try
+            payloads{k} = jsondecode(fileread(char(string(jobs(k).payload))));
+            [par, ctrl] = load_job_params(char(string(jobs(k).run_dir)));
+            if isempty(simIn)
+                bind_ctrl_parameter(modelName, ctrl);
+            end
+            in = Simulink.SimulationInput(modelName);
+            in = in.setVariable('par', par);
+            in = in.setVariable('ctrl', ctrl);
+            simIn(end+1, 1) = in; %#ok<AGROW>
+            simIdx(end+1, 1) = k; %#ok<AGROW>
+        catch ME
+            status(k).error = ME.message;
+            if ~isempty(payloads{k})
+                write_job_fallback(jobs(k), payloads{k}, ME, modelPath);
+            end
+        end
     end
 
-    vref = double(payload.requirements.vout_target_v);
-    metrics.overshoot_pct = compute_overshoot_pct(vout, vref);
-    metrics.settling_time_ms = compute_settling_ms(t, vout, vref, 0.02);
-    metrics.ripple_v_pp = compute_ripple_pp(t, vout);
-
-    [~, vin] = pick_signal(simOut, {'vin','v_dc','vdc'});
-    [~, iin] = pick_signal(simOut, {'iin','i_dc','idc'});
-    [~, iout] = pick_signal(simOut, {'iout','io','i_a'});
-    if isempty(vin) || isempty(iin) || isempty(iout)
-        warnings{end+1} = 'Missing power signals for efficiency; using fallback estimate.'; %#ok<AGROW>
-        metrics.efficiency_pct = 93.1;
-    else
-        pin = mean(abs(vin .* iin));
-        pout = mean(abs(vout .* iout));
-        if pin > 1e-9
-            metrics.efficiency_pct = 100 * min(1, max(0, pout / pin));
+    if ~isempty(simIn)
+        acss_progress('simulate_batch', 0.2);
+        useParsim = isfield(manifest, 'parallel') && logical(manifest.parallel) ...
+            && ~isempty(ver('parallel')) && license('test', 'Distrib_Computing_Toolbox');
+        % All jobs share one compiled wrapper: compile once, then only swap par/ctrl.
+        frFlag = ternary(isfield(manifest, 'fast_restart') && logical(manifest.fast_restart), 'on', 'off');
+        if useParsim
+            simOuts = parsim(simIn, 'ShowProgress', 'off', 'TransferBaseWorkspaceVariables', 'off', ...
+                'UseFastRestart', frFlag);
         else
-            metrics.efficiency_pct = 0;
+            simOuts = sim(simIn, 'ShowProgress', 'off', 'UseFastRestart', frFlag);
+        end
+        for j = 1:numel(simIdx)
+            k = simIdx(j);
+            [status(k).ok, status(k).error] = finish_job(simOuts(j), jobs(k), payloads{k}, modelPath);
+            acss_progress(['job_' status(k).id], 0.2 + 0.8 * j / numel(simIdx));
+        end
+    end
+catch ME
+    % Failures outside a single job (template, pool, sim array) fail every job still pending.
+    for k = 1:n
+        if ~status(k).ok && isempty(status(k).error)
+            status(k).error = ME.message;
         end
     end
+end
 
-    wf.time_s = t(:);
-    wf.vout_v = vout(:);
-    fidW = fopen(waveformFile, 'w');
-    fprintf(fidW, '%s', jsonencode(wf));
-    fclose(fidW);
-    simOk = true;
+summary.jobs = status;
+summary.model_path = modelPath;
+summary.parallel = useParsim;
+fid = fopen(outJsonPath, 'w');
+fprintf(fid, '%s', jsonencode(summary));
+fclose(fid);
+acss_progress('done', 1.0);
+end
+
+function [ok, message] = finish_job(simOut, job, payload, modelPath)
+outJson = char(string(job.out_json));
+try
+    if ~isempty(simOut.ErrorMessage)
+        error('SimulationFailed: %s', simOut.ErrorMessage);
+    end
+    wf = extract_signals(simOut);
+    write_result(outJson, wf, true, {}, modelPath);
+    ok = true;
+    message = '';
 catch ME
-    warnings{end+1} = sprintf('MATLAB validation fallback: %s', ME.message); %#ok<AGROW>
-    warnings{end+1} = getReport(ME, 'extended', 'hyperlinks', 'off'); %#ok<AGROW>
+    write_job_fallback(job, payload, ME, modelPath);
+    ok = false;
+    message = ME.message;
+end
+end
 
-    metrics.overshoot_pct = 3.5;
-    metrics.settling_time_ms = 2.8;
-    metrics.ripple_v_pp = 0.035;
-    metrics.efficiency_pct = 93.1;
+function write_job_fallback(job, payload, ME, modelPath)
+warnings = {sprintf('MATLAB validation fallback: %s', ME.message), getReport(ME, 'extended', 'hyperlinks', 'off')};
+wf = fallback_signals(payload);
+write_result(char(string(job.out_json)), wf, false, warnings, modelPath);
+end
+
+function frMode = fast_restart_mode(options)
+frMode = 'off';
+if isstruct(options) && isfield(options, 'fast_restart')
+    frMode = char(string(options.fast_restart));
+end
+end
+
+function simOut = sim_fast_restart(modelName, frMode)
+switch frMode
+    case 'structural'
+        set_param(modelName, 'FastRestart', 'off');
+        set_param(modelName, 'FastRestart', 'on');
+    case 'tunable'
+        if strcmp(get_param(modelName, 'FastRestart'), 'off')
+            set_param(modelName, 'FastRestart', 'on');
+        end
+    otherwise
+        if strcmp(get_param(modelName, 'FastRestart'), 'on')
+            set_param(modelName, 'FastRestart', 'off');
+        end
+end
+try
+    simOut = sim(modelName, 'ReturnWorkspaceOutputs', 'on', 'SrcWorkspace', 'base');
+catch ME
+    if ~strcmp(frMode, 'tunable')
+        rethrow(ME);
+    end
+    % Fast Restart rejects edits that are not run-time tunable; recompile once.
+    set_param(modelName, 'FastRestart', 'off');
+    set_param(modelName, 'FastRestart', 'on');
+    simOut = sim(modelName, 'ReturnWorkspaceOutputs', 'on', 'SrcWorkspace', 'base');
+end
+end
+
+function changed = bind_ctrl_parameter(modelName, ctrl)
+% Point the tunable controller S-Function at ctrl.p so gains change without a rebuild.
+changed = false;
+if ~isfield(ctrl, 'p') || ~isfield(ctrl, 'sfunction')
+    return;
+end
+blocks = find_system(modelName, 'LookUnderMasks', 'all', 'FollowLinks', 'on', ...
+    'BlockType', 'S-Function', 'FunctionName', char(string(ctrl.sfunction)));
+for i = 1:numel(blocks)
+    if ~strcmp(get_param(blocks{i}, 'Parameters'), 'ctrl.p')
+        if strcmp(get_param(modelName, 'FastRestart'), 'on')
+            set_param(modelName, 'FastRestart', 'off');
+        end
+        set_param(blocks{i}, 'Parameters', 'ctrl.p');
+        changed = true;
+    end
+end
+end
+
+function [par, ctrl] = load_job_params(runDir)
+paramsFcn = fullfile(runDir, 'acss_params.m');
+if ~isfile(paramsFcn)
+    error('MissingGeneratedParams: %s', paramsFcn);
+end
+addpath(runDir);
+cleanupPath = onCleanup(@() rmpath(runDir)); %#ok<NASGU>
+% A persistent worker or batch may have cached another job's acss_params.
+clear('acss_params');
+[par, ctrl] = acss_params();
+end
 
-    wf.time_s = (0:0.0001:0.02)';
-    wf.vout_v = double(payload.requirements.vout_target_v) * (1 - exp(-wf.time_s / 0.002));
-    fidW = fopen(waveformFile, 'w');
-    fprintf(fidW, '%s', jsonencode(wf));
-    fclose(fidW);
+function wf = extract_signals(simOut)
+[t, vout] = pick_signal(simOut, {'vout','v_out','vo','vabc','v_a'});
+if isempty(t) || isempty(vout)
+    error('MissingVoutSignal: no vout-like signal logged; using fallback signals.');
 end
+wf.time_s = t(:);
+wf.vout_v = vout(:);
 
-out.metrics = metrics;
-out.waveform_files = {waveformFile};
+% Power signals are optional; without them Python reports efficiency as missing.
+names = {'vin_v', 'iin_a', 'iout_a'};
+keys = {{'vin','v_dc','vdc'}, {'iin','i_dc','idc'}, {'iout','io','i_a'}};
+for i = 1:numel(names)
+    [ts, y] = pick_signal(simOut, keys{i});
+    if ~isempty(y)
+        if numel(ts) ~= numel(t) || any(ts(:) ~= t(:))
+            y = interp1(ts, y, t, 'previous', 'extrap');
+        end
+        wf.(names{i}) = y(:);
+    end
+end
+end
+
+function wf = fallback_signals(payload)
+wf.time_s = (0:0.0001:0.02)';
+wf.vout_v = double(payload.requirements.vout_target_v) * (1 - exp(-wf.time_s / 0.002));
+end
+
+function write_result(outJsonPath, wf, simOk, warnings, modelPath)
+waveformDir = strrep(outJsonPath, '.json', '_waveform.wf');
+write_waveform_dir(waveformDir, wf);
+
+out.waveform_files = {waveformDir};
 out.code_files = {};
 out.validation = ternary(simOk, 'simulink_matlab', 'simulink_matlab_fallback');
 out.warnings = warnings;
@@ -130,6 +314,31 @@ fprintf(fid, '%s', jsonencode(out));
 fclose(fid);
 end
 
+function write_waveform_dir(waveformDir, wf)
+% Columnar layout read by src/waveforms.py: one raw little-endian float64 file
+% per channel plus header.json, written last so a partial directory is ignored.
+if ~isfolder(waveformDir)
+    mkdir(waveformDir);
+end
+names = fieldnames(wf);
+channels = struct();
+for i = 1:numel(names)
+    x = double(wf.(names{i}));
+    fileName = [names{i} '.f64'];
+    fid = fopen(fullfile(waveformDir, fileName), 'w', 'ieee-le');
+    fwrite(fid, x(:), 'double');
+    fclose(fid);
+    channels.(names{i}) = struct('file', fileName, 'dtype', '<f8', 'length', numel(x));
+end
+header.format = 'acss_waveform_v1';
+header.length = numel(wf.time_s);
+header.channels = channels;
+header.attrs = struct();
+fid = fopen(fullfile(waveformDir, 'header.json'), 'w');
+fprintf(fid, '%s', jsonencode(header));
+fclose(fid);
+end
+
 function [t, y] = pick_signal(simOut, keys)
 t = [];
 y = [];
@@ -213,35 +422,6 @@ else
 end
 end
 
-function v = compute_overshoot_pct(y, yref)
-peak = max(y);
-if abs(yref) < 1e-9
-    v = 0;
-else
-    v = max(0, (peak - yref) / abs(yref) * 100);
-end
-end
-
-function v = compute_settling_ms(t, y, yref, tol)
-idx = find(abs(y - yref) > abs(yref) * tol);
-if isempty(idx)
-    v = 0;
-else
-    last = idx(end);
-    v = max(0, t(last)) * 1000;
-end
-end
-
-function v = compute_ripple_pp(t, y)
-if isempty(t) || numel(t) < 5
-    v = 0;
-    return;
-end
-startIdx = max(1, floor(0.8 * numel(y)));
-seg = y(startIdx:end);
-v = max(seg) - min(seg);
-end
-
 function out = ternary(cond, a, b)
 if cond
     out = a;
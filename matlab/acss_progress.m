@@ -0,0 +1,21 @@
+function acss_progress(stage, fraction)
+% Report job progress to the Python bridge:
+% - prints "ACSS_PROGRESS <stage> <fraction>" for one-shot matlab -batch runs;
+% - inside acss_worker, also sends a progress message for the job in flight.
+
+global ACSS_WORKER_JOB
+
+if nargin < 2
+    fraction = NaN;
+end
+stage = char(string(stage));
+fprintf('ACSS_PROGRESS %s %.3f\n', stage, fraction);
+
+if isstruct(ACSS_WORKER_JOB) && isfield(ACSS_WORKER_JOB, 'conn')
+    msg = struct('id', ACSS_WORKER_JOB.id, 'op', 'progress', 'stage', stage, 'fraction', fraction);
+    try
+        writeline(ACSS_WORKER_JOB.conn, jsonencode(msg));
+    catch
+    end
+end
+end
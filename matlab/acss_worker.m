@@ -0,0 +1,56 @@
+function acss_worker(port, token)
+% ACSS persistent MATLAB worker:
+% - Connects back to the Python bridge on 127.0.0.1:port.
+% - Answers newline-delimited JSON requests (ping, run, shutdown).
+% - Keeps Simulink and loaded models warm (and Fast Restart compiled) between jobs.
+
+global ACSS_WORKER_JOB
+
+if ischar(port) || isstring(port)
+    port = str2double(port);
+end
+
+t = tcpclient('127.0.0.1', port, 'Timeout', 3600);
+configureTerminator(t, 'LF');
+
+hello.op = 'hello';
+hello.token = char(string(token));
+hello.pid = feature('getpid');
+writeline(t, jsonencode(hello));
+
+while true
+    line = readline(t);
+    if isempty(line)
+        % readline timed out with no request; keep waiting.
+        continue;
+    end
+
+    msg = jsondecode(char(line));
+    reply = struct('id', msg.id, 'op', msg.op, 'ok', true, 'error', '');
+    switch char(msg.op)
+        case 'ping'
+            reply.loaded_models = find_system('type', 'block_diagram');
+        case 'run'
+            options = struct();
+            if isfield(msg, 'options') && isstruct(msg.options)
+                options = msg.options;
+            end
+            % Lets acss_progress stream progress for this request while it runs.
+            ACSS_WORKER_JOB = struct('conn', t, 'id', msg.id);
+            try
+                reply.stdout = evalc('acss_build_and_run(msg.payload, msg.out_json, msg.template, options)');
+            catch ME
+                reply.ok = false;
+                reply.error = getReport(ME, 'extended', 'hyperlinks', 'off');
+            end
+            ACSS_WORKER_JOB = [];
+        case 'shutdown'
+            writeline(t, jsonencode(reply));
+            break;
+        otherwise
+            reply.ok = false;
+            reply.error = sprintf('Unknown op: %s', char(msg.op));
+    end
+    writeline(t, jsonencode(reply));
+end
+end
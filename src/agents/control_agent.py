@@ -1,17 +1,16 @@
 from __future__ import annotations
 
-from dataclasses import asdict
 import os
 
-from src.contracts import ControlDesign, RequirementSpec, TopologyDesign
-from src.llm import DeepSeekClient
-from src.rag import LocalKnowledgeBase, extract_references, format_retrieved_context
+from src.contracts import REVISED_REQUIREMENT_FIELDS, ControlDesign, RequirementSpec, TopologyDesign
+from src.llm import DeepSeekClient, prompt_json
+from src.rag import context_stats, extract_references, pack_retrieved_context, shared_knowledge_base
 
 
 class ControlAgent:
     def __init__(self) -> None:
         self.client = DeepSeekClient()
-        self.knowledge = LocalKnowledgeBase()
+        self.knowledge = shared_knowledge_base()
 
     def design(
         self,
@@ -99,18 +98,23 @@ class ControlAgent:
         system_prompt = (
             "You are a control parameter synthesis assistant. "
             "Given selected strategy, return JSON only with keys: controller, architecture, "
-            "current_loop_enabled, inrush_control, inrush_limit_a, secondary_controller, kp, ki, sample_time_s, rationale."
+            "current_loop_enabled, inrush_control, inrush_limit_a, secondary_controller, kp, ki, sample_time_s, rationale. "
+            "Keep controller type aligned with selected_strategy."
         )
+        # The strategy's own knowledge text and refs would repeat retrieved_knowledge.
+        selected = {key: value for key, value in strategy.items() if key not in {'knowledge_context', 'knowledge_refs'}}
+        packed = pack_retrieved_context(retrieved_context)
         user_prompt = (
-            f"requirements={asdict(req)}\n"
-            f"topology={asdict(topology)}\n"
-            f"selected_strategy={strategy}\n"
+            f"requirements={prompt_json(req, exclude=REVISED_REQUIREMENT_FIELDS)}\n"
+            f"topology={prompt_json(topology)}\n"
+            f"selected_strategy={prompt_json(selected)}\n"
             f"iteration={iteration}\n"
-            f"design_prompt={req.design_prompt}\n"
-            f"retrieved_knowledge=\n{format_retrieved_context(retrieved_context)}\n"
-            "Keep controller type aligned with selected_strategy."
+            f"control_design_notes={req.control_design_notes or ''}\n"
+            f"retrieved_knowledge=\n{packed.text}"
+        )
+        data = self.client.complete_json(
+            system_prompt, user_prompt, temperature=0.1, label='control', details=context_stats(packed)
         )
-        data = self.client.complete_json(system_prompt, user_prompt, temperature=0.1)
         required = {'controller', 'architecture', 'kp', 'ki', 'sample_time_s'}
         if not required.issubset(data.keys()):
             raise ValueError('LLM control response missing required fields')
@@ -1,16 +1,14 @@
 from __future__ import annotations
 
-from dataclasses import asdict
-
-from src.contracts import EvaluationResult, RequirementSpec, TopologyDesign
-from src.llm import DeepSeekClient
-from src.rag import LocalKnowledgeBase, extract_references, format_retrieved_context
+from src.contracts import REVISED_REQUIREMENT_FIELDS, EvaluationResult, RequirementSpec, TopologyDesign
+from src.llm import DeepSeekClient, prompt_json
+from src.rag import context_stats, extract_references, format_retrieved_context, pack_retrieved_context, shared_knowledge_base
 
 
 class ControlStrategyAgent:
     def __init__(self) -> None:
         self.client = DeepSeekClient()
-        self.knowledge = LocalKnowledgeBase()
+        self.knowledge = shared_knowledge_base()
 
     def choose(
         self,
@@ -133,22 +131,27 @@ class ControlStrategyAgent:
         previous_evaluation: EvaluationResult | None,
         retrieved_context: object,
     ) -> dict[str, object]:
+        # Static text first and the per-run requirements and topology next, so
+        # repeated calls share a byte-identical prefix the provider can cache.
         system_prompt = (
             "You are a power-electronics control strategy selector. "
             "Pick the control structure (not gains). Return JSON only with keys: "
             "controller, architecture, current_loop_enabled, inrush_control, secondary_controller, rationale. "
-            "inrush_control must be one of: none, active_current_limit, soft_start_ramp."
+            "inrush_control must be one of: none, active_current_limit, soft_start_ramp. "
+            "Choose robust strategy for converter barriers, load step, grid connection, and inrush."
         )
+        packed = pack_retrieved_context(retrieved_context)
         user_prompt = (
-            f"requirements={asdict(req)}\n"
-            f"topology={asdict(topology)}\n"
+            f"requirements={prompt_json(req, exclude=REVISED_REQUIREMENT_FIELDS)}\n"
+            f"topology={prompt_json(topology)}\n"
             f"iteration={iteration}\n"
-            f"previous_evaluation={asdict(previous_evaluation) if previous_evaluation else None}\n"
-            f"design_prompt={req.design_prompt}\n"
-            f"retrieved_knowledge=\n{format_retrieved_context(retrieved_context)}\n"
-            "Choose robust strategy for converter barriers, load step, grid connection, and inrush."
+            f"control_design_notes={req.control_design_notes or ''}\n"
+            f"previous_evaluation={prompt_json(previous_evaluation)}\n"
+            f"retrieved_knowledge=\n{packed.text}"
+        )
+        data = self.client.complete_json(
+            system_prompt, user_prompt, temperature=0.1, label='control_strategy', details=context_stats(packed)
         )
-        data = self.client.complete_json(system_prompt, user_prompt, temperature=0.1)
         required = {'controller', 'architecture', 'current_loop_enabled', 'inrush_control', 'secondary_controller'}
         if not required.issubset(data.keys()):
             raise ValueError('LLM strategy response missing required fields')
@@ -1,16 +1,58 @@
 from __future__ import annotations
 
+import asyncio
+import hashlib
 import json
 import math
+from collections.abc import Callable, Iterator
+from copy import deepcopy
 from pathlib import Path
-from dataclasses import asdict
+from dataclasses import asdict, dataclass
+
+import numpy as np
 
 from src.contracts import ControlDesign, RequirementSpec, SimulationResult, TopologyDesign, dump_json
-from src.matlab_bridge import run_matlab_stub
+from src.design_diff import CTRL_PARAM_LAYOUT, DesignChange, classify_design_change, control_param_vector
+from src.matlab_bridge import (
+    DEFAULT_JOB_TIMEOUT_S,
+    MatlabWorker,
+    ProgressCallback,
+    run_blocking,
+    run_matlab_async,
+    run_matlab_batch_async,
+)
+from src.sim import (
+    DCDC_TOPOLOGIES,
+    SilBuildError,
+    resolve_inverter_law,
+    round_metrics,
+    simulate_dcdc,
+    simulate_dcdc_batch,
+    simulate_dcdc_sil,
+    simulate_inverter,
+    simulate_inverter_batch,
+)
 from src.slx_template import load_template_info
+from src.waveform_pyramid import write_pyramid
+from src.waveforms import (
+    WAVEFORM_DIR_SUFFIX,
+    RunningStats,
+    WaveformBundle,
+    decimated_chunks,
+    export_waveforms_json,
+    iter_chunks,
+    waveform_stem,
+    write_waveforms,
+)
 
 
 class SimulationAgent:
+    def __init__(self, waveform_json: bool = False) -> None:
+        # Columnar waveforms are always written; this also exports the JSON layout.
+        self.waveform_json = waveform_json
+        # Last design simulated per template, for Fast Restart change classification.
+        self._fast_restart_state: dict[Path, tuple[TopologyDesign, ControlDesign, str]] = {}
+
     def run(
         self,
         req: RequirementSpec,
@@ -20,142 +62,465 @@ class SimulationAgent:
         out_dir: Path,
         use_matlab: bool,
         template_override: Path | None = None,
+        sil: bool = False,
+        matlab_worker: MatlabWorker | None = None,
+        fast_restart: bool = False,
+        matlab_timeout_s: float | None = DEFAULT_JOB_TIMEOUT_S,
+        on_progress: ProgressCallback | None = None,
     ) -> SimulationResult:
-        template_path = _pick_template_path(topology, req, template_override)
-        if template_override is not None and not template_path.exists():
-            raise FileNotFoundError(f"Template .slx not found: {template_path}")
-        template_info = load_template_info(template_path) if template_path.exists() else None
-
-        symbols = template_info.parameter_symbols if template_info else []
-        resolved_values, unresolved_symbols = _resolve_parameter_values(req, topology, control, symbols)
-        symbols_for_output = list(symbols)
-        for runtime_symbol in ('Ts', 'Tstop'):
-            if runtime_symbol in resolved_values and runtime_symbol not in symbols_for_output:
-                symbols_for_output.append(runtime_symbol)
-
-        params_m_path = out_dir / 'acss_params.m'
-        params_m_path.write_text(
-            _render_params_m(
+        return run_blocking(
+            self.run_async(
                 req,
+                topology,
                 control,
-                symbols_for_output,
-                resolved_values,
-                unresolved_symbols,
-                template_path.name,
-            ),
-            encoding='utf-8',
-        )
-
-        sfun_name = template_info.sfunction.function_name if template_info else 'control_sfunc'
-        module_name = template_info.sfunction.module_name if template_info else 'control_sfunc_wrapper.c'
-        input_width = template_info.sfunction.input_width if template_info else 4
-        output_width = template_info.sfunction.output_width if template_info else 2
-        output_mode = _infer_output_mode(req, topology, output_width)
-
-        sfunc_wrapper_path = out_dir / module_name
-        sfunc_wrapper_path.write_text(
-            _render_wrapper_c(
-                sfun_name,
-                input_width,
-                output_width,
-                control,
-                req.vout_target_v,
-                topology.topology,
-                req.fsw_hz,
-                output_mode,
-            ),
-            encoding='utf-8',
-        )
-
-        template_meta_path = out_dir / 'topology_template_info.json'
-        if template_info:
-            dump_json(
-                template_meta_path,
-                {
-                    'template': str(template_path),
-                    'parameter_symbols': template_info.parameter_symbols,
-                    'generated_parameter_symbols': symbols_for_output,
-                    'resolved_symbols': sorted(resolved_values.keys()),
-                    'unresolved_symbols': unresolved_symbols,
-                    'sfunction': {
-                        'function_name': sfun_name,
-                        'module_name': module_name,
-                        'input_width': input_width,
-                        'output_width': output_width,
-                        'output_mode': output_mode,
-                    },
-                },
+                payload_path,
+                out_dir,
+                use_matlab,
+                template_override,
+                sil,
+                matlab_worker,
+                fast_restart,
+                matlab_timeout_s,
+                on_progress,
             )
+        )
 
-        code_files = [str(params_m_path), str(sfunc_wrapper_path)]
+    async def run_async(
+        self,
+        req: RequirementSpec,
+        topology: TopologyDesign,
+        control: ControlDesign,
+        payload_path: Path,
+        out_dir: Path,
+        use_matlab: bool,
+        template_override: Path | None = None,
+        sil: bool = False,
+        matlab_worker: MatlabWorker | None = None,
+        fast_restart: bool = False,
+        matlab_timeout_s: float | None = DEFAULT_JOB_TIMEOUT_S,
+        on_progress: ProgressCallback | None = None,
+    ) -> SimulationResult:
+        """Awaitable `run`: the MATLAB call yields to the event loop while it runs."""
+        prepared = _prepare_run(req, topology, control, out_dir, template_override, tunable=fast_restart)
+        change = self._classify_change(prepared, topology, control) if fast_restart else None
 
         if use_matlab:
             print(f'[simulation] MATLAB requested for {payload_path.name}; writing logs under {out_dir}', flush=True)
-            maybe = run_matlab_stub(payload_path, out_dir, template_path)
+            options = {'fast_restart': change.mode} if change is not None else None
+            if change is not None:
+                print(f'[simulation] Fast Restart mode: {change.mode}', flush=True)
+            maybe = await run_matlab_async(
+                payload_path,
+                out_dir,
+                prepared.template_path,
+                worker=matlab_worker,
+                options=options,
+                timeout_s=matlab_timeout_s,
+                on_progress=on_progress,
+            )
             if maybe is not None:
-                maybe.waveform_image_files = _export_waveform_images(maybe.waveform_files, out_dir)
-                maybe.code_files = code_files
-                maybe.raw = {
-                    **maybe.raw,
-                    'waveform_image_files': maybe.waveform_image_files,
-                    'parameter_resolution': {
-                        'resolved_symbols': sorted(resolved_values.keys()),
-                        'unresolved_symbols': unresolved_symbols,
-                    },
-                }
                 print(f'[simulation] MATLAB completed for {payload_path.name}', flush=True)
-                return maybe
+                return _attach_matlab_artifacts(maybe, prepared, out_dir, change, self.waveform_json)
+            # The session's compiled state is unknown after a failure; recompile next time.
+            self._fast_restart_state.pop(prepared.template_path, None)
             print(f'[simulation] MATLAB unavailable or failed; falling back to synthetic for {payload_path.name}', flush=True)
 
-        # Synthetic fallback for environments without MATLAB.
-        ratio = req.vout_target_v / max(req.vin_nominal_v, 1e-9)
-        topology_bonus = 1.0 if ((ratio < 1 and topology.topology == 'buck') or (ratio > 1 and topology.topology == 'boost')) else 0.92
-        ctrl_gain = min(1.2, 0.7 + control.kp * 12)
-
-        overshoot = max(0.5, 8.0 / max(ctrl_gain, 0.1)) / topology_bonus
-        settling = max(0.3, 5.0 / max(ctrl_gain, 0.1)) / topology_bonus
-        ripple = max(0.01, 0.12 * (100.0 / max(topology.capacitor_uF, 1.0)))
-        eff = min(99.0, 89.0 + 4.5 * topology_bonus + math.log10(max(topology.inductor_uH, 1.0)))
-
-        metrics = {
-            'overshoot_pct': round(overshoot, 3),
-            'settling_time_ms': round(settling, 3),
-            'ripple_v_pp': round(ripple, 4),
-            'efficiency_pct': round(eff, 3),
+        return _run_synthetic(
+            req, topology, control, payload_path, out_dir, prepared, use_matlab, sil, change, self.waveform_json
+        )
+
+    def run_sweep(
+        self,
+        req: RequirementSpec,
+        jobs: list[tuple[TopologyDesign, ControlDesign, Path, Path]],
+        use_matlab: bool,
+        template_override: Path | None = None,
+        sil: bool = False,
+        matlab_worker: MatlabWorker | None = None,
+        parallel: bool = True,
+        fast_restart: bool = False,
+        matlab_timeout_s: float | None = DEFAULT_JOB_TIMEOUT_S,
+    ) -> list[SimulationResult]:
+        """Run many (topology, control, payload_path, out_dir) jobs with one MATLAB call per template.
+
+        Each job gets the same artifacts and result shape as `run`. Jobs whose
+        MATLAB result is missing fall back to the synthetic path individually.
+        Without a persistent worker, the per-template MATLAB calls run concurrently.
+        """
+        prepared = [
+            _prepare_run(req, topology, control, out_dir, template_override, tunable=fast_restart)
+            for topology, control, _, out_dir in jobs
+        ]
+        results: list[SimulationResult | None] = [None] * len(jobs)
+
+        if use_matlab and jobs:
+            by_template: dict[Path, list[int]] = {}
+            for idx, item in enumerate(prepared):
+                by_template.setdefault(item.template_path, []).append(idx)
+            groups = list(by_template.items())
+            batches = run_blocking(
+                _run_template_batches(jobs, prepared, groups, matlab_worker, parallel, fast_restart, matlab_timeout_s)
+            )
+            for (_, indices), batch in zip(groups, batches):
+                for idx, maybe in zip(indices, batch):
+                    if maybe is not None:
+                        results[idx] = _attach_matlab_artifacts(
+                            maybe, prepared[idx], jobs[idx][3], waveform_json=self.waveform_json
+                        )
+                missing = sum(1 for maybe in batch if maybe is None)
+                if missing:
+                    print(f'[simulation] MATLAB batch returned no result for {missing} payload(s); using synthetic for those', flush=True)
+
+        finished: list[SimulationResult] = []
+        for idx, (topology, control, payload_path, out_dir) in enumerate(jobs):
+            result = results[idx]
+            if result is None:
+                result = _run_synthetic(
+                    req,
+                    topology,
+                    control,
+                    payload_path,
+                    out_dir,
+                    prepared[idx],
+                    use_matlab,
+                    sil,
+                    waveform_json=self.waveform_json,
+                )
+            finished.append(result)
+        return finished
+
+    def _classify_change(self, prepared: _PreparedRun, topology: TopologyDesign, control: ControlDesign) -> DesignChange:
+        previous = self._fast_restart_state.get(prepared.template_path)
+        change = classify_design_change(previous[:2] if previous else None, topology, control)
+        change.wrapper_changed = previous is not None and previous[2] != prepared.wrapper_digest
+        self._fast_restart_state[prepared.template_path] = (deepcopy(topology), deepcopy(control), prepared.wrapper_digest)
+        return change
+
+    def run_batch(
+        self,
+        req: RequirementSpec,
+        candidates: list[tuple[TopologyDesign, ControlDesign]],
+    ) -> list[dict[str, float]]:
+        """Screen many (topology, control) candidates in one vectorized call.
+
+        Returns one metrics row per candidate, in input order, with the same keys
+        as `SimulationResult.metrics`. No payload, params, wrapper or waveform
+        files are written.
+        """
+        rows: list[dict[str, float] | None] = [None] * len(candidates)
+        grouped: dict[str, tuple[list[int], list[tuple[TopologyDesign, ControlDesign, dict[str, float]]]]] = {
+            'dcdc': ([], []),
+            'inverter_3ph': ([], []),
         }
+        for idx, (topology, control) in enumerate(candidates):
+            if topology.topology in DCDC_TOPOLOGIES:
+                group = grouped['dcdc']
+            elif topology.topology == 'inverter_3ph':
+                group = grouped['inverter_3ph']
+            else:
+                rows[idx] = _heuristic_metrics(req, topology, control)
+                continue
+            plant_values, _ = _resolve_parameter_values(req, topology, control, [])
+            group[0].append(idx)
+            group[1].append((topology, control, plant_values))
+
+        for kind, (indices, inputs) in grouped.items():
+            if not inputs:
+                continue
+            batch = simulate_dcdc_batch(req, inputs) if kind == 'dcdc' else simulate_inverter_batch(req, inputs)
+            for idx, row in zip(indices, batch.rows()):
+                rows[idx] = round_metrics(row)
+        return [row for row in rows if row is not None]
+
+
+@dataclass
+class _PreparedRun:
+    template_path: Path
+    resolved_values: dict[str, float]
+    unresolved_symbols: list[str]
+    code_files: list[str]
+    sfunc_wrapper_path: Path
+    sfun_name: str
+    input_width: int
+    output_width: int
+    wrapper_digest: str
+    param_vector: list[float] | None
+
+
+def _prepare_run(
+    req: RequirementSpec,
+    topology: TopologyDesign,
+    control: ControlDesign,
+    out_dir: Path,
+    template_override: Path | None,
+    tunable: bool = False,
+) -> _PreparedRun:
+    template_path = _pick_template_path(topology, req, template_override)
+    if template_override is not None and not template_path.exists():
+        raise FileNotFoundError(f"Template .slx not found: {template_path}")
+    template_info = load_template_info(template_path) if template_path.exists() else None
+
+    symbols = template_info.parameter_symbols if template_info else []
+    resolved_values, unresolved_symbols = _resolve_parameter_values(req, topology, control, symbols)
+    symbols_for_output = list(symbols)
+    for runtime_symbol in ('Ts', 'Tstop'):
+        if runtime_symbol in resolved_values and runtime_symbol not in symbols_for_output:
+            symbols_for_output.append(runtime_symbol)
+
+    sfun_name = template_info.sfunction.function_name if template_info else 'control_sfunc'
+    module_name = template_info.sfunction.module_name if template_info else 'control_sfunc_wrapper.c'
+    input_width = template_info.sfunction.input_width if template_info else 4
+    output_width = template_info.sfunction.output_width if template_info else 2
+    output_mode = _infer_output_mode(req, topology, output_width)
+
+    params_m_path = out_dir / 'acss_params.m'
+    params_m_path.write_text(
+        _render_params_m(
+            req,
+            control,
+            symbols_for_output,
+            resolved_values,
+            unresolved_symbols,
+            template_path.name,
+            tunable_sfunction=sfun_name if tunable else None,
+        ),
+        encoding='utf-8',
+    )
 
-        time_s = [i * 1e-4 for i in range(200)]
-        if topology.topology == 'inverter_3ph':
-            waveforms = _build_inverter_waveforms(req, topology, control, time_s)
-        else:
-            waveforms = {
-                'time_s': time_s,
-                'vout_v': [req.vout_target_v * (1.0 - math.exp(-i / 35.0)) for i in range(200)],
-            }
-        wf_path = out_dir / 'waveforms.json'
-        dump_json(wf_path, waveforms)
-        image_files = _export_waveform_images([str(wf_path)], out_dir)
-
-        raw = {
-            'mode': 'synthetic',
-            'payload': str(payload_path),
-            'control': asdict(control),
-            'topology': asdict(topology),
-            'validation': 'synthetic_after_matlab_failure' if use_matlab else 'synthetic',
-            'waveform_image_files': image_files,
-            'parameter_resolution': {
+    sfunc_wrapper_path = out_dir / module_name
+    wrapper_source = _render_wrapper_c(
+        sfun_name,
+        input_width,
+        output_width,
+        control,
+        req.vout_target_v,
+        topology.topology,
+        req.fsw_hz,
+        output_mode,
+        tunable=tunable,
+    )
+    sfunc_wrapper_path.write_text(wrapper_source, encoding='utf-8')
+
+    template_meta_path = out_dir / 'topology_template_info.json'
+    if template_info:
+        dump_json(
+            template_meta_path,
+            {
+                'template': str(template_path),
+                'parameter_symbols': template_info.parameter_symbols,
+                'generated_parameter_symbols': symbols_for_output,
                 'resolved_symbols': sorted(resolved_values.keys()),
                 'unresolved_symbols': unresolved_symbols,
+                'sfunction': {
+                    'function_name': sfun_name,
+                    'module_name': module_name,
+                    'input_width': input_width,
+                    'output_width': output_width,
+                    'output_mode': output_mode,
+                },
             },
-        }
-        return SimulationResult(
-            metrics=metrics,
-            waveform_files=[str(wf_path)],
-            code_files=code_files,
-            raw=raw,
-            waveform_image_files=image_files,
         )
 
+    return _PreparedRun(
+        template_path=template_path,
+        resolved_values=resolved_values,
+        unresolved_symbols=unresolved_symbols,
+        code_files=[str(params_m_path), str(sfunc_wrapper_path)],
+        sfunc_wrapper_path=sfunc_wrapper_path,
+        sfun_name=sfun_name,
+        input_width=input_width,
+        output_width=output_width,
+        wrapper_digest=hashlib.sha256(wrapper_source.encode('utf-8')).hexdigest(),
+        param_vector=control_param_vector(req, control) if tunable else None,
+    )
+
+
+async def _run_template_batches(
+    jobs: list[tuple[TopologyDesign, ControlDesign, Path, Path]],
+    prepared: list[_PreparedRun],
+    groups: list[tuple[Path, list[int]]],
+    matlab_worker: MatlabWorker | None,
+    parallel: bool,
+    fast_restart: bool,
+    timeout_s: float | None,
+) -> list[list[SimulationResult | None]]:
+    calls = []
+    manifest_dirs = []
+    for template_path, indices in groups:
+        manifest_dir = jobs[indices[0]][3].parent
+        manifest_dirs.append(manifest_dir)
+        print(
+            f'[simulation] MATLAB batch of {len(indices)} payload(s) on {template_path.name}; manifest under {manifest_dir}',
+            flush=True,
+        )
+        # One compile serves the whole batch when every job shares the tunable wrapper.
+        shared_wrapper = fast_restart and len({prepared[idx].wrapper_digest for idx in indices}) == 1
+        calls.append(
+            run_matlab_batch_async(
+                [(jobs[idx][2], jobs[idx][3]) for idx in indices],
+                manifest_dir,
+                template_path,
+                worker=matlab_worker,
+                parallel=parallel,
+                fast_restart=shared_wrapper,
+                timeout_s=timeout_s,
+            )
+        )
+    if matlab_worker is not None or len(set(manifest_dirs)) < len(manifest_dirs):
+        # One MATLAB session runs one job at a time, and groups sharing a manifest dir must not overlap.
+        return [await call for call in calls]
+    return list(await asyncio.gather(*calls))
+
+
+def _attach_matlab_artifacts(
+    result: SimulationResult,
+    prepared: _PreparedRun,
+    out_dir: Path,
+    change: DesignChange | None = None,
+    waveform_json: bool = False,
+) -> SimulationResult:
+    handle = result.waveform()
+    if waveform_json and handle is not None:
+        try:
+            export_waveforms_json(handle.load(), out_dir / f'{waveform_stem(handle.path)}.json')
+        except (OSError, ValueError) as e:
+            print(f'[simulation] JSON waveform export failed ({e})', flush=True)
+    _build_pyramid(result)
+    result.waveform_image_files = _export_waveform_images(result, out_dir)
+    result.code_files = prepared.code_files
+    result.raw = {
+        **result.raw,
+        'waveform_image_files': result.waveform_image_files,
+        'parameter_resolution': {
+            'resolved_symbols': sorted(prepared.resolved_values.keys()),
+            'unresolved_symbols': prepared.unresolved_symbols,
+        },
+    }
+    if change is not None:
+        result.raw['design_change'] = change.to_dict()
+    return result
+
+
+def _run_synthetic(
+    req: RequirementSpec,
+    topology: TopologyDesign,
+    control: ControlDesign,
+    payload_path: Path,
+    out_dir: Path,
+    prepared: _PreparedRun,
+    use_matlab: bool,
+    sil: bool,
+    change: DesignChange | None = None,
+    waveform_json: bool = False,
+) -> SimulationResult:
+    # Synthetic fallback for environments without MATLAB.
+    engine_notes: list[str] = []
+    if topology.topology in DCDC_TOPOLOGIES:
+        plant_values, _ = _resolve_parameter_values(req, topology, control, [])
+        averaged = None
+        mode = 'averaged_model'
+        if sil:
+            try:
+                averaged = simulate_dcdc_sil(
+                    req,
+                    topology,
+                    control,
+                    plant_values,
+                    prepared.sfunc_wrapper_path,
+                    prepared.sfun_name,
+                    prepared.input_width,
+                    prepared.output_width,
+                    params=prepared.param_vector,
+                )
+                mode = 'sil'
+            except (SilBuildError, OSError, AttributeError, ValueError) as e:
+                print(f'[simulation] SIL unavailable ({e}); using averaged model for {payload_path.name}', flush=True)
+                engine_notes.append(f'sil_failed={e}')
+        if averaged is None:
+            averaged = simulate_dcdc(req, topology, control, plant_values)
+        metrics = round_metrics(averaged.metrics)
+        waveforms = averaged.waveforms()
+        engine_notes += [
+            f'step_s={averaged.step_s:.6g}',
+            f'converged={averaged.converged}',
+            f'diverged={averaged.diverged}',
+            *averaged.notes,
+        ]
+    elif topology.topology == 'inverter_3ph':
+        plant_values, _ = _resolve_parameter_values(req, topology, control, [])
+        inverter = simulate_inverter(req, topology, control, plant_values)
+        metrics = round_metrics(inverter.metrics)
+        waveforms = {
+            **inverter.waveforms(),
+            'topology': topology.topology,
+            'architecture': control.architecture,
+        }
+        engine_notes += [
+            f'law={inverter.law}',
+            f'step_s={inverter.step_s:.6g}',
+            f'converged={inverter.converged}',
+            f'diverged={inverter.diverged}',
+            *inverter.notes,
+        ]
+        mode = 'averaged_model'
+    else:
+        metrics = _heuristic_metrics(req, topology, control)
+        waveforms = {
+            'time_s': [i * 1e-4 for i in range(200)],
+            'vout_v': [req.vout_target_v * (1.0 - math.exp(-i / 35.0)) for i in range(200)],
+        }
+        mode = 'synthetic'
+
+    wf_path = write_waveforms(
+        out_dir / f'waveforms{WAVEFORM_DIR_SUFFIX}',
+        waveforms,
+        export_json=out_dir / 'waveforms.json' if waveform_json else None,
+    )
+    result = SimulationResult(
+        metrics=metrics,
+        waveform_files=[str(wf_path)],
+        code_files=prepared.code_files,
+        raw={},
+    )
+    _build_pyramid(result)
+    result.waveform_image_files = _export_waveform_images(result, out_dir)
+    result.raw = {
+        'mode': mode,
+        'payload': str(payload_path),
+        'control': asdict(control),
+        'topology': asdict(topology),
+        'validation': 'synthetic_after_matlab_failure' if use_matlab else 'synthetic',
+        'engine_notes': engine_notes,
+        'waveform_image_files': result.waveform_image_files,
+        'parameter_resolution': {
+            'resolved_symbols': sorted(prepared.resolved_values.keys()),
+            'unresolved_symbols': prepared.unresolved_symbols,
+        },
+    }
+    if change is not None:
+        result.raw['design_change'] = change.to_dict()
+    return result
+
+
+def _heuristic_metrics(req: RequirementSpec, topology: TopologyDesign, control: ControlDesign) -> dict[str, float]:
+    # Closed-form placeholder for topologies without a plant model.
+    ratio = req.vout_target_v / max(req.vin_nominal_v, 1e-9)
+    topology_bonus = 1.0 if ((ratio < 1 and topology.topology == 'buck') or (ratio > 1 and topology.topology == 'boost')) else 0.92
+    ctrl_gain = min(1.2, 0.7 + control.kp * 12)
+
+    overshoot = max(0.5, 8.0 / max(ctrl_gain, 0.1)) / topology_bonus
+    settling = max(0.3, 5.0 / max(ctrl_gain, 0.1)) / topology_bonus
+    ripple = max(0.01, 0.12 * (100.0 / max(topology.capacitor_uF, 1.0)))
+    eff = min(99.0, 89.0 + 4.5 * topology_bonus + math.log10(max(topology.inductor_uH, 1.0)))
+    return round_metrics(
+        {
+            'overshoot_pct': overshoot,
+            'settling_time_ms': settling,
+            'ripple_v_pp': ripple,
+            'efficiency_pct': eff,
+        }
+    )
+
 
 def _render_params_m(
     req: RequirementSpec,
@@ -164,6 +529,7 @@ def _render_params_m(
     resolved_values: dict[str, float],
     unresolved_symbols: list[str],
     template_name: str,
+    tunable_sfunction: str | None = None,
 ) -> str:
     symbols = template_symbols if template_symbols else sorted(resolved_values.keys())
     lines = [
@@ -188,10 +554,14 @@ def _render_params_m(
             f"ctrl.inrush_control = '{control.inrush_control}';",
             f"ctrl.inrush_limit_a = {control.inrush_limit_a:.12g};",
             f"ctrl.secondary_controller = '{control.secondary_controller}';",
-            "end",
-            "",
         ]
     )
+    if tunable_sfunction:
+        vector = " ".join(f"{value:.12g}" for value in control_param_vector(req, control))
+        lines.append(f"% S-Function parameter read by the tunable wrapper: [{' '.join(CTRL_PARAM_LAYOUT)}]")
+        lines.append(f"ctrl.p = [{vector}];")
+        lines.append(f"ctrl.sfunction = '{tunable_sfunction}';")
+    lines.extend(["end", ""])
     return "\n".join(lines)
 
 
@@ -204,21 +574,21 @@ def _render_wrapper_c(
     topology_kind: str,
     fsw_hz: float,
     output_mode: str,
+    tunable: bool = False,
 ) -> str:
     integrator_name = f"g_integrator_{sfun_name}"
-    arch = (control.architecture or 'pi').strip().lower()
-    controller_name = (control.controller or '').strip().lower()
-    if arch in {'pi', 'cascaded'}:
-        if 'vsg' in controller_name:
-            arch = 'vsg'
-        elif 'voc_aho' in controller_name:
-            arch = 'voc_aho'
-        elif 'voc' in controller_name:
-            arch = 'voc'
-        elif 'droop' in controller_name:
-            arch = 'droop'
-        elif 'dq' in controller_name:
-            arch = 'dq'
+
+    def tunable_value(name: str, value: float) -> str:
+        # Tunable builds read the value from the ctrl_p S-Function parameter so a
+        # new value does not change the compiled code (Simulink Fast Restart).
+        if not tunable:
+            return f"{value:.12g}"
+        idx = CTRL_PARAM_LAYOUT.index(name)
+        return f"((p_width0 > {idx}) ? ctrl_p[{idx}] : 0.0)"
+
+    param_args = ", const real_T *ctrl_p, const int_T p_width0" if tunable else ""
+    param_pass = ", ctrl_p, p_width0" if tunable else ""
+    arch = resolve_inverter_law(control)
     inverter_ctrl_law = (
         "  /* dq-style voltage loop with current limiting */\n"
         "  real_T mod = kp * err + ki * g_integrator_" + sfun_name + ";\n"
@@ -299,7 +669,7 @@ def _render_wrapper_c(
     )
     inverter_branch = (
         f"{inverter_ctrl_law}"
-        "  const real_T i_limit = " + f"{control.inrush_limit_a:.12g}" + ";\n"
+        f"  const real_T i_limit = {tunable_value('i_limit', control.inrush_limit_a)};\n"
         "  if (i_limit > 0.0 && i_mag > i_limit) mod *= (i_limit / fmax(i_mag, 1e-9));\n"
         "  if (mod < -0.98) mod = -0.98;\n"
         "  if (mod > 0.98) mod = 0.98;\n"
@@ -353,8 +723,11 @@ def _render_wrapper_c(
     )
     input_block = inverter_input_block if topology_kind == 'inverter_3ph' else buck_input_block
     control_branch = inverter_branch if topology_kind == 'inverter_3ph' else buck_branch
+    header = f"/* Auto-generated wrapper for S-Function Builder block '{sfun_name}'. */\n"
+    if tunable:
+        header += f"/* Tunable build: {', '.join(CTRL_PARAM_LAYOUT)} come from the ctrl_p parameter (ctrl.p). */\n"
     return (
-        f"/* Auto-generated wrapper for S-Function Builder block '{sfun_name}'. */\n"
+        f"{header}"
         "#include <math.h>\n"
         "#include \"simstruc.h\"\n"
         "\n"
@@ -365,14 +738,14 @@ def _render_wrapper_c(
         f"  {integrator_name} = 0.0;\n"
         "}\n"
         "\n"
-        f"void {sfun_name}_Outputs_wrapper(const real_T *u0, real_T *y0)\n"
+        f"void {sfun_name}_Outputs_wrapper(const real_T *u0, real_T *y0{param_args})\n"
         "{\n"
         f"  const int_T in_w = {input_width};\n"
         f"  const int_T out_w = {output_width};\n"
-        f"  const real_T kp = {control.kp:.12g};\n"
-        f"  const real_T ki = {control.ki:.12g};\n"
+        f"  const real_T kp = {tunable_value('kp', control.kp)};\n"
+        f"  const real_T ki = {tunable_value('ki', control.ki)};\n"
         f"  const real_T ts = {control.sample_time_s:.12g};\n"
-        f"  const real_T vref = {vref:.12g};\n"
+        f"  const real_T vref = {tunable_value('vref', vref)};\n"
         f"  /* output_mode: {output_mode} */\n"
         f"{input_block}"
         f"  {integrator_name} += err * ts;\n"
@@ -382,6 +755,15 @@ def _render_wrapper_c(
         f"void {sfun_name}_Terminate_wrapper(void)\n"
         "{\n"
         "}\n"
+        "\n"
+        "/* Runs n consecutive samples; u and y are row-major n x in_w and n x out_w buffers. */\n"
+        f"void {sfun_name}_Outputs_block(const real_T *u, real_T *y, int n{param_args})\n"
+        "{\n"
+        "  int k;\n"
+        "  for (k = 0; k < n; ++k) {\n"
+        f"    {sfun_name}_Outputs_wrapper(u + k * {input_width}, y + k * {output_width}{param_pass});\n"
+        "  }\n"
+        "}\n"
     )
 
 
@@ -464,37 +846,65 @@ def _resolve_parameter_values(
     return resolved, unresolved
 
 
-def _export_waveform_images(waveform_files: list[str], out_dir: Path) -> list[str]:
+def _build_pyramid(result: SimulationResult) -> None:
+    # Min/max zoom levels next to the raw channels, read by the HTML waveform viewer.
+    handle = result.waveform()
+    if handle is None or not handle.exists():
+        return
+    try:
+        write_pyramid(handle.load())
+    except (OSError, ValueError) as e:
+        print(f'[simulation] waveform pyramid skipped ({e})', flush=True)
+
+
+def _export_waveform_images(result: SimulationResult, out_dir: Path) -> list[str]:
     images: list[str] = []
-    for waveform_file in waveform_files:
-        wf_path = Path(waveform_file)
-        if not wf_path.exists():
+    for index in range(len(result.waveform_files)):
+        handle = result.waveform(index)
+        if handle is None or not handle.exists():
             continue
         try:
-            data = json.loads(wf_path.read_text(encoding='utf-8'))
-            time_s = [float(x) for x in data.get('time_s', [])]
-            vout_raw = data.get('vout_v')
-            if isinstance(vout_raw, list):
-                vout_v = [float(x) for x in vout_raw]
-            elif all(key in data for key in ('va_v', 'vb_v', 'vc_v')):
-                va = [float(x) for x in data.get('va_v', [])]
-                vb = [float(x) for x in data.get('vb_v', [])]
-                vc = [float(x) for x in data.get('vc_v', [])]
-                vout_v = [math.sqrt((a * a + b * b + c * c) / 3.0) for a, b, c in zip(va, vb, vc)]
-            else:
-                vout_v = []
+            data = handle.load()
+            chunks = _output_chunks(data)
         except Exception:
             continue
-        if len(time_s) < 2 or len(vout_v) < 2 or len(time_s) != len(vout_v):
+        if chunks is None:
             continue
 
-        image_path = out_dir / f'{wf_path.stem}.svg'
-        image_path.write_text(_render_waveform_svg(time_s, vout_v), encoding='utf-8')
+        image_path = out_dir / f'{waveform_stem(handle.path)}.svg'
+        _write_waveform_svg(image_path, chunks)
         images.append(str(image_path))
     return images
 
 
-def _render_waveform_svg(time_s: list[float], vout_v: list[float]) -> str:
+def _output_chunks(data: WaveformBundle) -> Callable[[], Iterator[tuple[np.ndarray, np.ndarray]]] | None:
+    # Re-iterable (time, vout) chunks; three-phase runs plot the per-sample phase RMS.
+    if 'time_s' not in data.channels:
+        return None
+    if 'vout_v' in data.channels:
+        channels: tuple[str, ...] = ('time_s', 'vout_v')
+    elif all(key in data.channels for key in ('va_v', 'vb_v', 'vc_v')):
+        channels = ('time_s', 'va_v', 'vb_v', 'vc_v')
+    else:
+        return None
+    lengths = {data.length(key) for key in channels}
+    if len(lengths) != 1 or lengths.pop() < 2 or any(data[key].ndim != 1 for key in channels):
+        return None
+
+    def chunks() -> Iterator[tuple[np.ndarray, np.ndarray]]:
+        for time_s, *values in iter_chunks(data, channels):
+            if len(values) == 1:
+                yield time_s, values[0]
+            else:
+                va, vb, vc = values
+                yield time_s, np.sqrt((va * va + vb * vb + vc * vc) / 3.0)
+
+    return chunks
+
+
+def _write_waveform_svg(path: Path, chunks: Callable[[], Iterator[tuple[np.ndarray, np.ndarray]]]) -> None:
+    # Two passes over the chunks (bounds, then points), so memory does not grow with the log
+    # length; long logs are min/max-decimated to a few vertices per pixel column.
     width = 960
     height = 540
     left = 80
@@ -504,10 +914,15 @@ def _render_waveform_svg(time_s: list[float], vout_v: list[float]) -> str:
     plot_w = width - left - right
     plot_h = height - top - bottom
 
-    min_t = min(time_s)
-    max_t = max(time_s)
-    min_v = min(vout_v)
-    max_v = max(vout_v)
+    t_stats = RunningStats()
+    v_stats = RunningStats()
+    for time_s, vout_v in chunks():
+        t_stats.update(time_s)
+        v_stats.update(vout_v)
+    min_t = t_stats.minimum
+    max_t = t_stats.maximum
+    min_v = v_stats.minimum
+    max_v = v_stats.maximum
     if math.isclose(max_t, min_t):
         max_t = min_t + 1.0
     if math.isclose(max_v, min_v):
@@ -519,14 +934,6 @@ def _render_waveform_svg(time_s: list[float], vout_v: list[float]) -> str:
     min_v -= v_pad
     max_v += v_pad
 
-    def sx(t: float) -> float:
-        return left + (t - min_t) / (max_t - min_t) * plot_w
-
-    def sy(v: float) -> float:
-        return top + (max_v - v) / (max_v - min_v) * plot_h
-
-    points = " ".join(f"{sx(t):.2f},{sy(v):.2f}" for t, v in zip(time_s, vout_v))
-
     grid_lines: list[str] = []
     labels: list[str] = []
     for i in range(5):
@@ -554,69 +961,32 @@ def _render_waveform_svg(time_s: list[float], vout_v: list[float]) -> str:
             f'font-family="Segoe UI, Arial, sans-serif" fill="#445066">{v:.2f} V</text>'
         )
 
-    return "\n".join(
-        [
-            f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" viewBox="0 0 {width} {height}">',
-            '<rect width="100%" height="100%" fill="#fbfcfe" />',
-            '<text x="80" y="24" font-size="20" font-family="Segoe UI, Arial, sans-serif" fill="#10233f">Output Waveform</text>',
-            '<text x="80" y="44" font-size="12" font-family="Segoe UI, Arial, sans-serif" fill="#4b5d79">Generated by ACSS run export</text>',
-            *grid_lines,
-            f'<rect x="{left}" y="{top}" width="{plot_w}" height="{plot_h}" fill="none" stroke="#6f7f95" stroke-width="1.2" />',
-            f'<polyline fill="none" stroke="#0b84f3" stroke-width="3" points="{points}" />',
-            *labels,
-            '<text x="500" y="520" text-anchor="middle" font-size="13" font-family="Segoe UI, Arial, sans-serif" fill="#23344d">Time</text>',
-            '<text x="22" y="255" text-anchor="middle" font-size="13" font-family="Segoe UI, Arial, sans-serif" fill="#23344d" transform="rotate(-90 22 255)">Voltage</text>',
-            '</svg>',
-        ]
-    )
-
-
-def _build_inverter_waveforms(
-    req: RequirementSpec,
-    topology: TopologyDesign,
-    control: ControlDesign,
-    time_s: list[float],
-) -> dict[str, object]:
-    freq_hz = 50.0
-    v_peak = max(req.vout_target_v, 1.0)
-    i_peak = max(req.pout_w / max(3.0 * req.vout_target_v, 1.0), 1.0)
-    damping = 1.0 - min(0.4, control.kp)
-    inrush_scale = min(1.0, max(0.25, control.inrush_limit_a / max(i_peak * 1.5, 1.0))) if control.inrush_control != 'none' else 1.0
-
-    va: list[float] = []
-    vb: list[float] = []
-    vc: list[float] = []
-    ia: list[float] = []
-    ib: list[float] = []
-    ic: list[float] = []
-    vout_v: list[float] = []
-
-    for t in time_s:
-        env = 1.0 - math.exp(-t / 0.0045)
-        theta = 2.0 * math.pi * freq_hz * t
-        a = damping * env * v_peak * math.sin(theta)
-        b = damping * env * v_peak * math.sin(theta - 2.0 * math.pi / 3.0)
-        c = damping * env * v_peak * math.sin(theta + 2.0 * math.pi / 3.0)
-        ai = inrush_scale * env * i_peak * math.sin(theta - math.pi / 9.0)
-        bi = inrush_scale * env * i_peak * math.sin(theta - 2.0 * math.pi / 3.0 - math.pi / 9.0)
-        ci = inrush_scale * env * i_peak * math.sin(theta + 2.0 * math.pi / 3.0 - math.pi / 9.0)
-        va.append(a)
-        vb.append(b)
-        vc.append(c)
-        ia.append(ai)
-        ib.append(bi)
-        ic.append(ci)
-        vout_v.append(math.sqrt((a * a + b * b + c * c) / 3.0))
-
-    return {
-        'time_s': time_s,
-        'vout_v': vout_v,
-        'va_v': va,
-        'vb_v': vb,
-        'vc_v': vc,
-        'ia_a': ia,
-        'ib_a': ib,
-        'ic_a': ic,
-        'topology': topology.topology,
-        'architecture': control.architecture,
-    }
+    head = [
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" viewBox="0 0 {width} {height}">',
+        '<rect width="100%" height="100%" fill="#fbfcfe" />',
+        '<text x="80" y="24" font-size="20" font-family="Segoe UI, Arial, sans-serif" fill="#10233f">Output Waveform</text>',
+        '<text x="80" y="44" font-size="12" font-family="Segoe UI, Arial, sans-serif" fill="#4b5d79">Generated by ACSS run export</text>',
+        *grid_lines,
+        f'<rect x="{left}" y="{top}" width="{plot_w}" height="{plot_h}" fill="none" stroke="#6f7f95" stroke-width="1.2" />',
+    ]
+    tail = [
+        *labels,
+        '<text x="500" y="520" text-anchor="middle" font-size="13" font-family="Segoe UI, Arial, sans-serif" fill="#23344d">Time</text>',
+        '<text x="22" y="255" text-anchor="middle" font-size="13" font-family="Segoe UI, Arial, sans-serif" fill="#23344d" transform="rotate(-90 22 255)">Voltage</text>',
+        '</svg>',
+    ]
+    with path.open('w', encoding='utf-8') as fh:
+        fh.write('\n'.join(head))
+        fh.write('\n<polyline fill="none" stroke="#0b84f3" stroke-width="3" points="')
+        separator = ''
+        for time_s, vout_v in decimated_chunks(chunks(), t_stats.count, min_t, max_t, plot_w):
+            xs = left + (time_s - min_t) / (max_t - min_t) * plot_w
+            ys = top + (max_v - vout_v) / (max_v - min_v) * plot_h
+            fh.write(separator + _svg_points(xs, ys))
+            separator = ' '
+        fh.write('" />\n')
+        fh.write('\n'.join(tail))
+
+
+def _svg_points(xs: np.ndarray, ys: np.ndarray) -> str:
+    return " ".join(f"{x:.2f},{y:.2f}" for x, y in zip(xs.tolist(), ys.tolist()))
@@ -1,10 +1,9 @@
 from __future__ import annotations
 
-from dataclasses import asdict
 import os
 
 from src.contracts import RequirementSpec, TopologyDesign
-from src.llm import DeepSeekClient
+from src.llm import DeepSeekClient, prompt_json
 
 
 class TopologyAgent:
@@ -59,15 +58,12 @@ class TopologyAgent:
         system_prompt = (
             "You are a power electronics topology assistant. "
             "Return JSON only with keys: topology, inductor_uH, capacitor_uF, switches. "
-            "Allowed topology values: buck, boost, buck_boost, inverter_3ph."
+            "Allowed topology values: buck, boost, buck_boost, inverter_3ph. "
+            "Given the requirement object (its design_prompt states the design intent), propose a practical "
+            "initial topology and passive sizing for a first simulation iteration."
         )
-        user_prompt = (
-            "Given this requirement object, propose a practical initial topology and passive sizing "
-            "for a first simulation iteration.\n"
-            f"Design intent prompt: {req.design_prompt}\n"
-            f"{asdict(req)}"
-        )
-        data = self.client.complete_json(system_prompt, user_prompt, temperature=0.1)
+        user_prompt = f"requirements={prompt_json(req)}"
+        data = self.client.complete_json(system_prompt, user_prompt, temperature=0.1, label='topology')
         required = {'topology', 'inductor_uH', 'capacitor_uF', 'switches'}
         if not required.issubset(data.keys()):
             raise ValueError('LLM topology response missing required fields')
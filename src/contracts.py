@@ -3,7 +3,14 @@ from __future__ import annotations
 from dataclasses import dataclass, asdict, field
 from pathlib import Path
 import json
-from typing import Any
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from src.waveforms import WaveformHandle
+
+# Requirement fields RevisingAgent rewrites between iterations; LLM prompts keep
+# them out of the requirements prefix that is identical across calls.
+REVISED_REQUIREMENT_FIELDS = ('control_design_notes',)
 
 
 @dataclass
@@ -65,6 +72,18 @@ class SimulationResult:
     waveform_image_files: list[str] = field(default_factory=list)
     visualization_files: list[str] = field(default_factory=list)
 
+    def waveform(self, index: int = 0) -> WaveformHandle | None:
+        """Shared lazy handle for `waveform_files[index]`; not a dataclass field, so never serialized."""
+        from src.waveforms import WaveformHandle
+
+        if index >= len(self.waveform_files):
+            return None
+        path = self.waveform_files[index]
+        handles = self.__dict__.setdefault('_waveform_handles', {})
+        if path not in handles:
+            handles[path] = WaveformHandle(path)
+        return handles[path]
+
 
 @dataclass
 class EvaluationResult:
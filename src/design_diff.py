@@ -0,0 +1,85 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Any
+
+from src.contracts import ControlDesign, RequirementSpec, TopologyDesign
+
+# Order of the values in `ctrl.p`, the S-Function parameter the tunable wrapper
+# reads instead of compiled-in constants.
+CTRL_PARAM_LAYOUT = ('kp', 'ki', 'vref', 'i_limit')
+
+# Values that reach Simulink only through `par.*` / `ctrl.p` and can therefore
+# change under Fast Restart without recompiling the model.
+TUNABLE_TOPOLOGY_FIELDS = ('inductor_uH', 'capacitor_uF')
+TUNABLE_CONTROL_FIELDS = ('kp', 'ki', 'inrush_limit_a')
+
+# Values that change block structure, sample times or the compiled control law.
+STRUCTURAL_TOPOLOGY_FIELDS = ('topology', 'switches')
+STRUCTURAL_CONTROL_FIELDS = (
+    'controller',
+    'architecture',
+    'sample_time_s',
+    'current_loop_enabled',
+    'inrush_control',
+    'secondary_controller',
+)
+
+
+@dataclass
+class DesignChange:
+    tunable: dict[str, tuple[Any, Any]] = field(default_factory=dict)
+    structural: dict[str, tuple[Any, Any]] = field(default_factory=dict)
+    first_run: bool = False
+    wrapper_changed: bool = False
+
+    @property
+    def fast_restart(self) -> bool:
+        return not (self.first_run or self.structural or self.wrapper_changed)
+
+    @property
+    def mode(self) -> str:
+        return 'tunable' if self.fast_restart else 'structural'
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            'mode': self.mode,
+            'first_run': self.first_run,
+            'wrapper_changed': self.wrapper_changed,
+            'tunable': {key: list(values) for key, values in self.tunable.items()},
+            'structural': {key: list(values) for key, values in self.structural.items()},
+        }
+
+
+def classify_design_change(
+    previous: tuple[TopologyDesign, ControlDesign] | None,
+    topology: TopologyDesign,
+    control: ControlDesign,
+) -> DesignChange:
+    """Split the fields that differ from the previous iteration into tunable and structural."""
+    if previous is None:
+        return DesignChange(first_run=True)
+    prev_topology, prev_control = previous
+    change = DesignChange()
+    for names, bucket, old, new in (
+        (TUNABLE_TOPOLOGY_FIELDS, change.tunable, prev_topology, topology),
+        (STRUCTURAL_TOPOLOGY_FIELDS, change.structural, prev_topology, topology),
+        (TUNABLE_CONTROL_FIELDS, change.tunable, prev_control, control),
+        (STRUCTURAL_CONTROL_FIELDS, change.structural, prev_control, control),
+    ):
+        for name in names:
+            before = getattr(old, name)
+            after = getattr(new, name)
+            if before != after:
+                bucket[name] = (before, after)
+    return change
+
+
+def control_param_vector(req: RequirementSpec, control: ControlDesign) -> list[float]:
+    values = {
+        'kp': control.kp,
+        'ki': control.ki,
+        'vref': req.vout_target_v,
+        'i_limit': control.inrush_limit_a,
+    }
+    return [float(values[name]) for name in CTRL_PARAM_LAYOUT]
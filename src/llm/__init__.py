@@ -1,3 +1,4 @@
 from src.llm.deepseek_client import DeepSeekClient
+from src.llm.prompting import estimate_tokens, prompt_json
 
-__all__ = ['DeepSeekClient']
+__all__ = ['DeepSeekClient', 'estimate_tokens', 'prompt_json']
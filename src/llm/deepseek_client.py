@@ -2,9 +2,12 @@ from __future__ import annotations
 
 import json
 import os
+import time
 from typing import Any
 from urllib import error, request
 
+from src.llm.prompting import estimate_tokens, shared_prefix_length
+
 try:
     from src.llm import local_secrets as _local_secrets  # type: ignore
 except Exception:
@@ -28,12 +31,23 @@ class DeepSeekClient:
         root = (base_url or local_base or os.getenv('DEEPSEEK_BASE_URL', 'https://api.deepseek.com')).rstrip('/')
         self.url = f'{root}/chat/completions'
         self.timeout_s = timeout_s
+        # One record per completed call: estimated prompt size, the prefix shared
+        # with the previous call under the same system prompt, and provider usage.
+        self.prompt_stats: list[dict[str, Any]] = []
+        self._last_prompts: dict[str, str] = {}
 
     @property
     def enabled(self) -> bool:
         return bool(self.api_key)
 
-    def complete_json(self, system_prompt: str, user_prompt: str, temperature: float = 0.1) -> dict[str, Any]:
+    def complete_json(
+        self,
+        system_prompt: str,
+        user_prompt: str,
+        temperature: float = 0.1,
+        label: str = '',
+        details: dict[str, Any] | None = None,
+    ) -> dict[str, Any]:
         if not self.enabled:
             raise RuntimeError('DEEPSEEK_API_KEY is not configured')
 
@@ -56,6 +70,7 @@ class DeepSeekClient:
                 'Authorization': f'Bearer {self.api_key}',
             },
         )
+        started = time.perf_counter()
         try:
             with request.urlopen(req, timeout=self.timeout_s) as resp:
                 raw = json.loads(resp.read().decode('utf-8'))
@@ -64,6 +79,7 @@ class DeepSeekClient:
             raise RuntimeError(f'DeepSeek HTTP {e.code}: {msg}') from e
         except error.URLError as e:
             raise RuntimeError(f'DeepSeek network error: {e}') from e
+        self._record_stats(label, system_prompt, user_prompt, raw.get('usage') or {}, time.perf_counter() - started, details)
 
         choices = raw.get('choices', [])
         if not choices:
@@ -72,3 +88,34 @@ class DeepSeekClient:
         if not content:
             raise RuntimeError('DeepSeek response content is empty')
         return json.loads(content)
+
+    def _record_stats(
+        self,
+        label: str,
+        system_prompt: str,
+        user_prompt: str,
+        usage: dict[str, Any],
+        elapsed_s: float,
+        details: dict[str, Any] | None,
+    ) -> None:
+        previous = self._last_prompts.get(system_prompt)
+        self._last_prompts[system_prompt] = user_prompt
+        system_tokens = estimate_tokens(system_prompt)
+        user_tokens = estimate_tokens(user_prompt)
+        reused = 0
+        if previous is not None:
+            reused = system_tokens + estimate_tokens(user_prompt[: shared_prefix_length(previous, user_prompt)])
+        stats: dict[str, Any] = {
+            'label': label,
+            'system_chars': len(system_prompt),
+            'user_chars': len(user_prompt),
+            'system_tokens_est': system_tokens,
+            'user_tokens_est': user_tokens,
+            'prompt_tokens_est': system_tokens + user_tokens,
+            'reused_prefix_tokens_est': reused,
+            'elapsed_s': round(elapsed_s, 3),
+            # DeepSeek reports prompt_tokens and prompt_cache_hit_tokens / prompt_cache_miss_tokens.
+            'usage': usage,
+        }
+        stats.update(details or {})
+        self.prompt_stats.append(stats)
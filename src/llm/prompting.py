@@ -0,0 +1,67 @@
+from __future__ import annotations
+
+from dataclasses import asdict, is_dataclass
+import json
+import math
+import re
+from typing import Any, Iterable
+
+# Approximate BPE pieces: letter runs, digit runs, and every other visible
+# character (punctuation, CJK) on its own. Whitespace folds into the next piece.
+_PIECE_RE = re.compile(r'[A-Za-z]+|[0-9]+|[^\sA-Za-z0-9]')
+# Characters per token assumed for letter and digit runs.
+_LETTERS_PER_TOKEN = 4
+_DIGITS_PER_TOKEN = 3
+# Significant digits kept for floats in prompt JSON (24.200000000000003 -> 24.2).
+_PROMPT_FLOAT_DIGITS = 6
+
+
+def estimate_tokens(text: str) -> int:
+    """Approximate prompt token count without a tokenizer download.
+
+    Long words and numbers are charged per few characters and punctuation per
+    character, which slightly over-counts the DeepSeek tokenizer on English and
+    JSON, so budgets stay on the safe side.
+    """
+    tokens = 0
+    for piece in _PIECE_RE.findall(text):
+        if piece[0].isascii() and piece[0].isalpha():
+            tokens += math.ceil(len(piece) / _LETTERS_PER_TOKEN)
+        elif piece[0].isdigit():
+            tokens += math.ceil(len(piece) / _DIGITS_PER_TOKEN)
+        else:
+            tokens += 1
+    return tokens
+
+
+def prompt_json(value: Any, exclude: Iterable[str] = ()) -> str:
+    """Compact JSON with sorted keys and rounded floats; unset (None) and `exclude`d fields are left out.
+
+    The same object always renders to the same bytes, so prompt sections built
+    from it can be served from the provider's prefix cache.
+    """
+    if is_dataclass(value) and not isinstance(value, type):
+        value = asdict(value)
+    if isinstance(value, dict):
+        skipped = set(exclude)
+        value = {key: item for key, item in value.items() if item is not None and key not in skipped}
+    return json.dumps(_round_floats(value), sort_keys=True, separators=(',', ':'), ensure_ascii=False, default=str)
+
+
+def _round_floats(value: Any) -> Any:
+    if isinstance(value, float) and math.isfinite(value):
+        return float(f'{value:.{_PROMPT_FLOAT_DIGITS}g}')
+    if isinstance(value, dict):
+        return {key: _round_floats(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_round_floats(item) for item in value]
+    return value
+
+
+def shared_prefix_length(previous: str, current: str) -> int:
+    """Number of leading characters two prompts have in common."""
+    limit = min(len(previous), len(current))
+    for position in range(limit):
+        if previous[position] != current[position]:
+            return position
+    return limit
@@ -3,7 +3,9 @@ from __future__ import annotations
 import argparse
 from pathlib import Path
 
+from src.matlab_bridge import DEFAULT_JOB_TIMEOUT_S
 from src.orchestrator import ACSSOrchestrator
+from src.waveform_archive import ARCHIVE_CODECS
 
 
 def main() -> None:
@@ -22,6 +24,44 @@ def main() -> None:
         action='store_true',
         help='Pause after each workflow step and allow manual approval or JSON edits',
     )
+    parser.add_argument(
+        '--sil',
+        action='store_true',
+        help='Without MATLAB, compile the generated wrapper C and run it closed-loop against the Python plant',
+    )
+    parser.add_argument(
+        '--matlab-oneshot',
+        action='store_true',
+        help='Start a fresh matlab -batch process per iteration instead of one persistent MATLAB worker per run',
+    )
+    parser.add_argument(
+        '--fast-restart',
+        action='store_true',
+        help='Pass controller gains as S-Function parameters and reuse the compiled model (Simulink Fast Restart) '
+        'when an iteration only changes tunable values',
+    )
+    parser.add_argument(
+        '--matlab-timeout',
+        type=float,
+        default=DEFAULT_JOB_TIMEOUT_S,
+        help='Wall-clock limit in seconds per MATLAB job; the MATLAB process tree is killed when exceeded (0 disables)',
+    )
+    parser.add_argument(
+        '--waveform-json',
+        action='store_true',
+        help='Also export each waveform as a JSON file of float lists next to the columnar waveforms.wf/ bundle',
+    )
+    parser.add_argument(
+        '--archive-codec',
+        choices=ARCHIVE_CODECS,
+        default='zlib',
+        help='Compression for the per-iteration waveform archive (<waveform>.wfz); lzma is smaller but slower',
+    )
+    parser.add_argument(
+        '--keep-raw-waveforms',
+        action='store_true',
+        help='Keep the raw .wf bundle and waveforms_3ph.json next to the compressed waveform archive of each iteration',
+    )
     args = parser.parse_args()
 
     orch = ACSSOrchestrator(
@@ -30,6 +70,13 @@ def main() -> None:
         use_matlab=not args.no_matlab,
         template_slx=args.template_slx,
         human_review=args.human_review,
+        sil=args.sil,
+        matlab_worker=not args.matlab_oneshot,
+        fast_restart=args.fast_restart,
+        matlab_timeout_s=args.matlab_timeout if args.matlab_timeout > 0 else None,
+        waveform_json=args.waveform_json,
+        archive_codec=args.archive_codec,
+        keep_raw_waveforms=args.keep_raw_waveforms,
     )
     run_dir = orch.run()
     print(f'Run complete: {run_dir}')
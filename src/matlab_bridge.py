@@ -1,51 +1,697 @@
 from __future__ import annotations
 
+import asyncio
+import atexit
 import json
+import os
+import re
+import secrets
+import shlex
 import shutil
+import signal
+import socket
 import subprocess
+import sys
+import threading
+import time
 from pathlib import Path
+from typing import Any, Awaitable, Callable, TypeVar
 
 from src.contracts import SimulationResult
+from src.sim.metrics import waveform_metrics
 
+# Overrides the worker launch command (shell-style string); `{port}` and `{token}`
+# are substituted, so a scripted stand-in can replace MATLAB.
+WORKER_COMMAND_ENV = 'ACSS_MATLAB_WORKER'
+BATCH_MANIFEST_FORMAT = 'acss_batch_v1'
+# Wall-clock limit per MATLAB job; a hung Simulink run is killed with its process tree.
+DEFAULT_JOB_TIMEOUT_S = 3600.0
+# `acss_progress.m` prints `ACSS_PROGRESS <stage> <fraction>` lines on stdout.
+PROGRESS_PATTERN = re.compile(r'^ACSS_PROGRESS\s+(\S+)(?:\s+([-+0-9.eE]+))?')
 
-def run_matlab_stub(payload_path: Path, out_dir: Path, template_slx: Path | None = None) -> SimulationResult | None:
+ProgressCallback = Callable[[str, float | None], None]
+_T = TypeVar('_T')
+
+_STREAM_LIMIT = 1 << 20
+
+
+class MatlabWorkerError(RuntimeError):
+    pass
+
+
+class MatlabWorker:
+    """Long-lived MATLAB session that runs `acss_build_and_run` jobs.
+
+    The worker process connects back to 127.0.0.1:<port> and speaks
+    newline-delimited JSON: it first sends {"op": "hello", "token": ..., "pid": ...},
+    then answers every {"id", "op", ...} request with one {"id", "op", "ok", ...}
+    reply. Ops are "ping", "run" (payload/out_json/template) and "shutdown".
+    While a run is in flight the worker may also send {"id", "op": "progress",
+    "stage", "fraction"} messages for that request.
+    """
+
+    def __init__(
+        self,
+        command: list[str] | None = None,
+        log_path: Path | None = None,
+        startup_timeout_s: float = 300.0,
+        job_timeout_s: float | None = None,
+        ping_timeout_s: float = 30.0,
+        max_restarts: int = 2,
+    ) -> None:
+        resolved = command if command is not None else default_worker_command()
+        if not resolved:
+            raise MatlabWorkerError('no MATLAB executable on PATH and no worker command given')
+        self.command = list(resolved)
+        self.log_path = log_path
+        self.startup_timeout_s = startup_timeout_s
+        self.job_timeout_s = job_timeout_s
+        self.ping_timeout_s = ping_timeout_s
+        self.max_restarts = max_restarts
+        self.pid: int | None = None
+        self.restarts = 0
+        self.jobs_run = 0
+        self._proc: subprocess.Popen[bytes] | None = None
+        self._conn: socket.socket | None = None
+        self._reader: Any = None
+        self._next_id = 0
+        self._cancelled = False
+        # `cancel` tears the session down from another thread: the process and
+        # socket are detached under this lock and then only used through locals.
+        self._lock = threading.Lock()
+
+    @property
+    def alive(self) -> bool:
+        proc = self._proc
+        return proc is not None and proc.poll() is None and self._conn is not None
+
+    def start(self) -> None:
+        if self.alive:
+            return
+        self._kill()
+        token = secrets.token_hex(16)
+        listener = socket.create_server(('127.0.0.1', 0))
+        listener.settimeout(0.5)
+        port = listener.getsockname()[1]
+        argv = [part.replace('{port}', str(port)).replace('{token}', token) for part in self.command]
+        log = open(self.log_path, 'ab') if self.log_path is not None else None
+        try:
+            proc = subprocess.Popen(
+                argv,
+                stdin=subprocess.DEVNULL,
+                stdout=log if log is not None else subprocess.DEVNULL,
+                stderr=subprocess.STDOUT,
+                **_process_group_kwargs(),
+            )
+        except OSError as e:
+            listener.close()
+            raise MatlabWorkerError(f'could not launch worker: {e}') from e
+        finally:
+            if log is not None:
+                log.close()
+        self._proc = proc
+
+        deadline = time.monotonic() + self.startup_timeout_s
+        try:
+            while True:
+                try:
+                    conn, _ = listener.accept()
+                    break
+                except socket.timeout:
+                    code = proc.poll()
+                    if code is not None:
+                        raise MatlabWorkerError(f'worker exited with code {code} during startup')
+                    if time.monotonic() > deadline:
+                        raise MatlabWorkerError(f'worker did not connect within {self.startup_timeout_s:g} s')
+            with self._lock:
+                self._conn = conn
+                self._reader = conn.makefile('r', encoding='utf-8', newline='\n')
+            hello = self._read(max(1.0, deadline - time.monotonic()))
+            if hello.get('op') != 'hello' or hello.get('token') != token:
+                raise MatlabWorkerError(f'unexpected worker handshake: {hello!r}')
+        except (MatlabWorkerError, OSError, ValueError) as e:
+            self._kill()
+            if isinstance(e, MatlabWorkerError):
+                raise
+            raise MatlabWorkerError(f'worker handshake failed: {e}') from e
+        finally:
+            listener.close()
+
+        self.pid = hello.get('pid')
+        atexit.register(self.close)
+        print(f'[matlab] worker ready (pid={self.pid})', flush=True)
+
+    def restart(self) -> None:
+        self._kill()
+        self.restarts += 1
+        self.start()
+
+    def ping(self) -> bool:
+        if not self.alive:
+            return False
+        try:
+            return bool(self._request('ping', self.ping_timeout_s, None).get('ok'))
+        except (OSError, ValueError):
+            return False
+
+    def ensure_healthy(self) -> None:
+        if self.ping():
+            return
+        if self._proc is not None:
+            print('[matlab] worker failed health check; restarting', flush=True)
+            self.restart()
+        else:
+            self.start()
+
+    def run_job(
+        self,
+        payload_path: Path,
+        out_json: Path,
+        template: str,
+        options: dict[str, Any] | None = None,
+        timeout_s: float | None = None,
+        on_progress: ProgressCallback | None = None,
+    ) -> dict[str, Any]:
+        timeout = timeout_s if timeout_s is not None else self.job_timeout_s
+        self._cancelled = False
+        crashes = 0
+        while True:
+            self.ensure_healthy()
+            try:
+                reply = self._request(
+                    'run',
+                    timeout,
+                    on_progress,
+                    payload=payload_path.as_posix(),
+                    out_json=out_json.as_posix(),
+                    template=template,
+                    options=options or {},
+                )
+            except TimeoutError as e:
+                # A hung job would hang again on retry: drop the session and report.
+                self._kill()
+                raise MatlabWorkerError(f'job exceeded {timeout:g} s; worker killed') from e
+            except (OSError, ValueError) as e:
+                self._kill()
+                if self._cancelled:
+                    raise MatlabWorkerError('job cancelled; worker killed') from e
+                if crashes >= self.max_restarts:
+                    raise MatlabWorkerError(f'worker crashed during job: {e}') from e
+                crashes += 1
+                self.restarts += 1
+                print(f'[matlab] worker crashed during job ({e}); restarting', flush=True)
+                continue
+            self.jobs_run += 1
+            return reply
+
+    def cancel(self) -> None:
+        """Abort the job in flight from another thread; the session restarts on next use."""
+        self._cancelled = True
+        self._kill()
+
+    def close(self) -> None:
+        atexit.unregister(self.close)
+        if self.alive:
+            try:
+                self._request('shutdown', 30.0, None)
+            except (OSError, ValueError):
+                pass
+            proc = self._proc
+            if proc is not None:
+                try:
+                    proc.wait(timeout=30.0)
+                except subprocess.TimeoutExpired:
+                    pass
+        self._kill()
+
+    def __enter__(self) -> MatlabWorker:
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+    def _request(
+        self,
+        op: str,
+        timeout: float | None,
+        on_progress: ProgressCallback | None,
+        **fields: Any,
+    ) -> dict[str, Any]:
+        conn = self._conn
+        if conn is None:
+            raise ConnectionError('worker is not connected')
+        self._next_id += 1
+        request_id = self._next_id
+        line = json.dumps({'id': request_id, 'op': op, **fields}) + '\n'
+        conn.settimeout(timeout)
+        conn.sendall(line.encode('utf-8'))
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        while True:
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                raise TimeoutError(f'no reply to {op} within {timeout:g} s')
+            reply = self._read(remaining)
+            if reply.get('id') != request_id:
+                # Replies to requests abandoned by an earlier timeout are dropped.
+                continue
+            if reply.get('op') == 'progress':
+                if on_progress is not None:
+                    on_progress(str(reply.get('stage') or ''), _as_fraction(reply.get('fraction')))
+                continue
+            return reply
+
+    def _read(self, timeout: float | None) -> dict[str, Any]:
+        conn, reader = self._conn, self._reader
+        if conn is None or reader is None:
+            raise ConnectionError('worker is not connected')
+        conn.settimeout(timeout)
+        line = reader.readline()
+        if not line:
+            raise ConnectionError('worker closed the connection')
+        data = json.loads(line)
+        if not isinstance(data, dict):
+            raise ValueError(f'worker sent a non-object message: {line.strip()!r}')
+        return data
+
+    def _kill(self) -> None:
+        with self._lock:
+            reader, conn, proc = self._reader, self._conn, self._proc
+            self._reader = None
+            self._conn = None
+            self._proc = None
+        if conn is not None:
+            # Wakes a `readline` blocked in another thread; closing the reader first
+            # would wait for that read to finish, since it holds the buffer lock.
+            try:
+                conn.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+        if proc is not None and proc.poll() is None:
+            _kill_process_tree(proc.pid)
+            proc.kill()
+            proc.wait()
+        for closable in (reader, conn):
+            if closable is not None:
+                try:
+                    closable.close()
+                except OSError:
+                    pass
+
+
+def default_worker_command() -> list[str] | None:
+    override = os.environ.get(WORKER_COMMAND_ENV, '').strip()
+    if override:
+        return shlex.split(override)
     matlab_exe = shutil.which('matlab')
     if matlab_exe is None:
         return None
+    return [matlab_exe, '-batch', "addpath('matlab'); acss_worker({port}, '{token}')"]
+
+
+def start_matlab_worker(
+    log_path: Path | None = None,
+    job_timeout_s: float | None = DEFAULT_JOB_TIMEOUT_S,
+) -> MatlabWorker | None:
+    command = default_worker_command()
+    if command is None:
+        return None
+    try:
+        worker = MatlabWorker(command, log_path=log_path, job_timeout_s=job_timeout_s)
+        worker.start()
+    except MatlabWorkerError as e:
+        print(f'[matlab] persistent worker unavailable ({e}); using one-shot matlab -batch', flush=True)
+        return None
+    return worker
+
+
+def run_blocking(coro: Awaitable[_T]) -> _T:
+    """Run `coro` to completion and return its result, from synchronous code.
+
+    Inside a running event loop (a notebook, an async service) `asyncio.run`
+    is not allowed, so the coroutine gets its own loop on a helper thread and
+    the caller blocks until it finishes; async callers should await the
+    `*_async` variant instead to keep their loop responsive.
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro)
+    outcome: dict[str, Any] = {}
 
+    def target() -> None:
+        try:
+            outcome['value'] = asyncio.run(coro)
+        except BaseException as e:
+            outcome['error'] = e
+
+    thread = threading.Thread(target=target, name='acss-run-blocking')
+    thread.start()
+    thread.join()
+    if 'error' in outcome:
+        raise outcome['error']
+    return outcome['value']
+
+
+def run_matlab_stub(
+    payload_path: Path,
+    out_dir: Path,
+    template_slx: Path | None = None,
+    worker: MatlabWorker | None = None,
+    options: dict[str, Any] | None = None,
+    timeout_s: float | None = DEFAULT_JOB_TIMEOUT_S,
+    on_progress: ProgressCallback | None = None,
+) -> SimulationResult | None:
+    """Blocking wrapper around `run_matlab_async` (see `run_blocking`)."""
+    return run_blocking(run_matlab_async(payload_path, out_dir, template_slx, worker, options, timeout_s, on_progress))
+
+
+async def run_matlab_async(
+    payload_path: Path,
+    out_dir: Path,
+    template_slx: Path | None = None,
+    worker: MatlabWorker | None = None,
+    options: dict[str, Any] | None = None,
+    timeout_s: float | None = DEFAULT_JOB_TIMEOUT_S,
+    on_progress: ProgressCallback | None = None,
+) -> SimulationResult | None:
+    """Run one payload through MATLAB.
+
+    stdout/stderr stream into `matlab_stdout.log`/`matlab_stderr.log` as they
+    arrive and progress markers go to `on_progress(stage, fraction)`. After
+    `timeout_s` (None disables it) or on cancellation, the MATLAB process tree
+    is killed. `options` only reaches a persistent worker (e.g.
+    `{'fast_restart': 'tunable'}`); a one-shot `matlab -batch` call starts cold
+    and ignores it.
+    """
     payload_path = payload_path.resolve()
     out_dir = out_dir.resolve()
     out_json = (out_dir / 'matlab_result.json').resolve()
     template_arg = (template_slx.resolve().as_posix() if template_slx is not None else '')
+    if not await _invoke_matlab(payload_path, out_json, template_arg, out_dir, worker, options, timeout_s, on_progress):
+        return None
+    return _load_result(out_json, _payload_vref(payload_path))
+
+
+def run_matlab_batch(
+    jobs: list[tuple[Path, Path]],
+    manifest_dir: Path,
+    template_slx: Path | None = None,
+    worker: MatlabWorker | None = None,
+    parallel: bool = True,
+    fast_restart: bool = False,
+    timeout_s: float | None = DEFAULT_JOB_TIMEOUT_S,
+    on_progress: ProgressCallback | None = None,
+) -> list[SimulationResult | None]:
+    """Blocking wrapper around `run_matlab_batch_async` (see `run_blocking`)."""
+    return run_blocking(
+        run_matlab_batch_async(jobs, manifest_dir, template_slx, worker, parallel, fast_restart, timeout_s, on_progress)
+    )
+
+
+async def run_matlab_batch_async(
+    jobs: list[tuple[Path, Path]],
+    manifest_dir: Path,
+    template_slx: Path | None = None,
+    worker: MatlabWorker | None = None,
+    parallel: bool = True,
+    fast_restart: bool = False,
+    timeout_s: float | None = DEFAULT_JOB_TIMEOUT_S,
+    on_progress: ProgressCallback | None = None,
+) -> list[SimulationResult | None]:
+    """Run (payload_path, out_dir) jobs through a single MATLAB call.
+
+    MATLAB gets one manifest, builds one SimulationInput per job and writes each
+    job's `matlab_result.json` into its own out_dir plus a batch summary. Results
+    are returned in job order; a job without a result file gets None (and a
+    `matlab_bridge_error.log`) without affecting the others. With `fast_restart`
+    the jobs must share one compiled wrapper and differ only in `par`/`ctrl` values,
+    so MATLAB compiles once and reuses the model across jobs. `timeout_s` bounds
+    the whole batch call.
+    """
+    manifest_dir = manifest_dir.resolve()
+    manifest_dir.mkdir(parents=True, exist_ok=True)
+    template_arg = (template_slx.resolve().as_posix() if template_slx is not None else '')
+
+    entries: list[dict[str, str]] = []
+    for idx, (payload_path, out_dir) in enumerate(jobs):
+        out_dir = out_dir.resolve()
+        out_json = out_dir / 'matlab_result.json'
+        # A stale result from an earlier call must never be demuxed as this job's.
+        out_json.unlink(missing_ok=True)
+        entries.append(
+            {
+                'id': f'{idx:04d}_{out_dir.name}',
+                'payload': payload_path.resolve().as_posix(),
+                'run_dir': out_dir.as_posix(),
+                'out_json': out_json.as_posix(),
+            }
+        )
+    if not entries:
+        return []
+
+    manifest_path = manifest_dir / 'matlab_batch_manifest.json'
+    summary_path = manifest_dir / 'matlab_batch_result.json'
+    summary_path.unlink(missing_ok=True)
+    manifest_path.write_text(
+        json.dumps(
+            {
+                'format': BATCH_MANIFEST_FORMAT,
+                'template': template_arg,
+                'parallel': parallel,
+                'fast_restart': fast_restart,
+                'jobs': entries,
+            },
+            indent=2,
+        ),
+        encoding='utf-8',
+    )
+
+    call_ok = await _invoke_matlab(
+        manifest_path, summary_path, template_arg, manifest_dir, worker, None, timeout_s, on_progress
+    )
+    statuses = _load_batch_statuses(summary_path)
+
+    results: list[SimulationResult | None] = []
+    for entry in entries:
+        result = _load_result(Path(entry['out_json']), _payload_vref(Path(entry['payload'])))
+        if result is None:
+            status = statuses.get(entry['id'], {})
+            reason = str(status.get('error') or '') or (
+                'MATLAB batch call failed; see matlab_bridge_error.log next to the manifest'
+                if not call_ok
+                else 'MATLAB batch wrote no result for this job'
+            )
+            (Path(entry['run_dir']) / 'matlab_bridge_error.log').write_text(reason, encoding='utf-8')
+        results.append(result)
+    return results
+
+
+async def _invoke_matlab(
+    input_path: Path,
+    out_json: Path,
+    template_arg: str,
+    log_dir: Path,
+    worker: MatlabWorker | None,
+    options: dict[str, Any] | None = None,
+    timeout_s: float | None = DEFAULT_JOB_TIMEOUT_S,
+    on_progress: ProgressCallback | None = None,
+) -> bool:
+    if worker is not None:
+        job = asyncio.create_task(
+            asyncio.to_thread(worker.run_job, input_path, out_json, template_arg, options, timeout_s, on_progress)
+        )
+        try:
+            reply = await asyncio.shield(job)
+        except asyncio.CancelledError:
+            worker.cancel()
+            await asyncio.gather(job, return_exceptions=True)
+            raise
+        except MatlabWorkerError as e:
+            (log_dir / 'matlab_bridge_error.log').write_text(str(e), encoding='utf-8')
+            return False
+        (log_dir / 'matlab_stdout.log').write_text(str(reply.get('stdout') or ''), encoding='utf-8')
+        (log_dir / 'matlab_stderr.log').write_text(str(reply.get('error') or ''), encoding='utf-8')
+        if not reply.get('ok'):
+            (log_dir / 'matlab_bridge_error.log').write_text(str(reply.get('error') or 'worker job failed'), encoding='utf-8')
+            return False
+        return True
+
+    matlab_exe = shutil.which('matlab')
+    if matlab_exe is None:
+        return False
+
     cmd = [
         matlab_exe,
         '-batch',
         (
             "addpath('matlab'); "
-            f"acss_build_and_run('{payload_path.as_posix()}','{out_json.as_posix()}','{template_arg}')"
+            f"acss_build_and_run('{input_path.as_posix()}','{out_json.as_posix()}','{template_arg}')"
         ),
     ]
     try:
-        completed = subprocess.run(cmd, check=True, capture_output=True, text=True)
-        (out_dir / 'matlab_stdout.log').write_text(completed.stdout or '', encoding='utf-8')
-        (out_dir / 'matlab_stderr.log').write_text(completed.stderr or '', encoding='utf-8')
-    except Exception as e:
-        if hasattr(e, 'stdout'):
-            (out_dir / 'matlab_stdout.log').write_text(getattr(e, 'stdout', '') or '', encoding='utf-8')
-        if hasattr(e, 'stderr'):
-            (out_dir / 'matlab_stderr.log').write_text(getattr(e, 'stderr', '') or '', encoding='utf-8')
-        (out_dir / 'matlab_bridge_error.log').write_text(str(e), encoding='utf-8')
+        code = await _run_streamed(cmd, log_dir, timeout_s, on_progress)
+    except asyncio.TimeoutError:
+        (log_dir / 'matlab_bridge_error.log').write_text(
+            f'MATLAB job exceeded {timeout_s:g} s; process tree killed', encoding='utf-8'
+        )
+        return False
+    except OSError as e:
+        (log_dir / 'matlab_bridge_error.log').write_text(str(e), encoding='utf-8')
+        return False
+    if code != 0:
+        (log_dir / 'matlab_bridge_error.log').write_text(
+            f'Command {cmd!r} returned non-zero exit status {code}.', encoding='utf-8'
+        )
+        return False
+    return True
+
+
+async def _run_streamed(
+    cmd: list[str],
+    log_dir: Path,
+    timeout_s: float | None,
+    on_progress: ProgressCallback | None,
+) -> int:
+    """Run `cmd`, teeing stdout/stderr into the log files line by line.
+
+    Raises asyncio.TimeoutError after `timeout_s`; on timeout or cancellation
+    the whole process tree is killed before returning.
+    """
+    proc = await asyncio.create_subprocess_exec(
+        *cmd,
+        stdin=asyncio.subprocess.DEVNULL,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+        limit=_STREAM_LIMIT,
+        **_process_group_kwargs(),
+    )
+    pumps = asyncio.gather(
+        _pump(proc.stdout, log_dir / 'matlab_stdout.log', on_progress),
+        _pump(proc.stderr, log_dir / 'matlab_stderr.log', None),
+    )
+    try:
+        await asyncio.wait_for(asyncio.shield(pumps), timeout_s)
+        return await proc.wait()
+    finally:
+        if proc.returncode is None:
+            _kill_process_tree(proc.pid)
+            try:
+                proc.kill()
+            except ProcessLookupError:
+                pass
+            await proc.wait()
+        # Killing the tree closes the pipes, so the pumps finish on their own.
+        await asyncio.gather(pumps, return_exceptions=True)
+
+
+async def _pump(stream: asyncio.StreamReader | None, log_path: Path, on_progress: ProgressCallback | None) -> None:
+    if stream is None:
+        return
+    with open(log_path, 'w', encoding='utf-8') as log:
+        while True:
+            try:
+                raw = await stream.readuntil(b'\n')
+            except asyncio.IncompleteReadError as e:
+                raw = e.partial
+            except asyncio.LimitOverrunError as e:
+                # Line longer than the stream limit: log it in pieces.
+                raw = await stream.read(e.consumed)
+            if not raw:
+                return
+            line = raw.decode('utf-8', errors='replace')
+            log.write(line)
+            log.flush()
+            if on_progress is not None:
+                match = PROGRESS_PATTERN.match(line.strip())
+                if match:
+                    on_progress(match.group(1), _as_fraction(match.group(2)))
+
+
+def _as_fraction(value: Any) -> float | None:
+    try:
+        return float(value) if value is not None else None
+    except (TypeError, ValueError):
         return None
 
+
+def _process_group_kwargs() -> dict[str, Any]:
+    # Own process group / session, so a kill reaches MATLAB's helper processes too.
+    if sys.platform == 'win32':
+        return {'creationflags': subprocess.CREATE_NEW_PROCESS_GROUP}
+    return {'start_new_session': True}
+
+
+def _kill_process_tree(pid: int) -> None:
+    if sys.platform == 'win32':
+        subprocess.run(['taskkill', '/F', '/T', '/PID', str(pid)], capture_output=True)
+        return
+    try:
+        os.killpg(pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
+        pass
+
+
+def _load_batch_statuses(summary_path: Path) -> dict[str, dict[str, Any]]:
+    if not summary_path.exists():
+        return {}
+    try:
+        data = json.loads(summary_path.read_text(encoding='utf-8'))
+    except (OSError, ValueError):
+        return {}
+    jobs = data.get('jobs', []) if isinstance(data, dict) else []
+    if isinstance(jobs, dict):
+        # jsonencode collapses a one-element struct array to an object.
+        jobs = [jobs]
+    return {str(job.get('id')): job for job in jobs if isinstance(job, dict)}
+
+
+def _load_result(out_json: Path, vref: float | None = None) -> SimulationResult | None:
     if not out_json.exists():
         return None
 
     data = json.loads(out_json.read_text(encoding='utf-8'))
-    code_files = data.get('code_files', [])
-    return SimulationResult(
-        metrics=data['metrics'],
-        waveform_files=data['waveform_files'],
-        code_files=code_files,
+    warnings = data.get('warnings') or []
+    if not isinstance(warnings, list):
+        warnings = [warnings]
+    metrics = data.get('metrics')
+    waveform_files = data.get('waveform_files') or []
+    if isinstance(waveform_files, str):
+        waveform_files = [waveform_files]
+    result = SimulationResult(
+        metrics=metrics or {},
+        waveform_files=waveform_files,
+        code_files=data.get('code_files', []),
         raw=data,
         waveform_image_files=data.get('waveform_image_files', []),
     )
+    handle = result.waveform()
+    if vref is not None and handle is not None:
+        # The runner only dumps signals; metrics use the same definitions as the local simulators.
+        try:
+            computed = waveform_metrics(handle.load(), vref)
+        except (OSError, ValueError, TypeError) as e:
+            warnings.append(f'Could not compute metrics from {handle.path}: {e}')
+        else:
+            if 'efficiency_pct' not in computed:
+                warnings.append('Missing power signals for efficiency; efficiency not measured.')
+                # Keep the runner's own figure when it reported one (as rescore does), never a
+                # made-up value, and mark it so evaluation does not read it as a measurement.
+                if 'efficiency_pct' in result.metrics:
+                    computed['efficiency_pct'] = float(result.metrics['efficiency_pct'])
+                data['unmeasured_metrics'] = ['efficiency_pct']
+            result.metrics = computed
+            data['metrics_source'] = 'python'
+    if not result.metrics:
+        return None
+    data['metrics'] = result.metrics
+    data['warnings'] = warnings
+    return result
+
+
+def _payload_vref(payload_path: Path) -> float | None:
+    try:
+        payload = json.loads(payload_path.read_text(encoding='utf-8'))
+        return float(payload['requirements']['vout_target_v'])
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
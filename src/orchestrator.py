@@ -8,6 +8,8 @@ import json
 import math
 import shutil
 
+import numpy as np
+
 from src.agents.control_agent import ControlAgent
 from src.agents.control_strategy_agent import ControlStrategyAgent
 from src.agents.evaluation_agent import EvaluationAgent
@@ -17,7 +19,25 @@ from src.agents.simulation_agent import SimulationAgent
 from src.agents.topology_agent import TopologyAgent
 from src.agents.revising_agent import RevisingAgent
 from src.agents.visualization_agent import VisualizationAgent
-from src.contracts import EngineerReview, IterationRecord, dump_json, load_requirements, to_dict
+from src.contracts import ControlDesign, EngineerReview, IterationRecord, SimulationResult, dump_json, load_requirements, to_dict
+from src.matlab_bridge import DEFAULT_JOB_TIMEOUT_S, start_matlab_worker
+from src.waveform_archive import verify_archive, write_archive
+from src.waveforms import (
+    ARCHIVE_SUFFIX,
+    WaveformBundle,
+    channel_stats,
+    decimate_minmax,
+    decimated_chunks,
+    iter_chunks,
+    waveform_stem,
+)
+
+# Append-only per-iteration evolution curves, one JSON object per line.
+EVOLUTION_CURVES_NAME = 'waveform_evolution_curves.jsonl'
+# Pixel columns of the evolution plot; stored curves keep at most 4 points per column.
+EVOLUTION_COLUMNS = 850
+# Per-call LLM prompt sizes of a run; written only when an LLM was called.
+PROMPT_STATS_NAME = 'llm_prompt_stats.json'
 
 
 class ACSSOrchestrator:
@@ -28,19 +48,33 @@ class ACSSOrchestrator:
         use_matlab: bool = True,
         template_slx: Path | None = None,
         human_review: bool = False,
+        sil: bool = False,
+        matlab_worker: bool = True,
+        fast_restart: bool = False,
+        matlab_timeout_s: float | None = DEFAULT_JOB_TIMEOUT_S,
+        waveform_json: bool = False,
+        archive_codec: str = 'zlib',
+        keep_raw_waveforms: bool = False,
     ):
         self.requirements_path = requirements_path
         self.out_root = out_root
         self.use_matlab = use_matlab
         self.template_slx = template_slx
         self.human_review = human_review
+        self.sil = sil
+        self.matlab_worker = matlab_worker
+        self.fast_restart = fast_restart
+        self.matlab_timeout_s = matlab_timeout_s
+        self.waveform_json = waveform_json
+        self.archive_codec = archive_codec
+        self.keep_raw_waveforms = keep_raw_waveforms
 
         self.topology_agent = TopologyAgent()
         self.sensor_agent = SensorAgent()
         self.control_strategy_agent = ControlStrategyAgent()
         self.control_agent = ControlAgent()
         self.model_builder = ModelBuilderAgent()
-        self.simulation_agent = SimulationAgent()
+        self.simulation_agent = SimulationAgent(waveform_json=waveform_json)
         self.visualization_agent = VisualizationAgent()
         self.evaluation_agent = EvaluationAgent()
         self.revising_agent = RevisingAgent()
@@ -59,90 +93,109 @@ class ACSSOrchestrator:
         progress.start_run(req.name, run_dir, self.template_slx, self.use_matlab)
 
         records: list[IterationRecord] = []
+        evolution_artifacts: list[str] = []
+        prompt_stats_start = {name: len(client.prompt_stats) for name, client in self._llm_clients().items()}
+        # One MATLAB session per run keeps Simulink and the template loaded across iterations.
+        worker = (
+            start_matlab_worker(run_dir / 'matlab_worker.log', job_timeout_s=self.matlab_timeout_s)
+            if self.use_matlab and self.matlab_worker
+            else None
+        )
 
-        progress.step('topology', 0, req.max_iterations, 'Selecting topology and initial passives')
-        topology = self.topology_agent.design(req)
-        progress.done('topology', topology=topology.topology)
-        topology = self._review_step(run_dir, 'topology', topology)
-
-        for i in range(req.max_iterations):
-            iter_dir = run_dir / f'iter_{i:02d}'
-            iter_dir.mkdir(parents=True, exist_ok=True)
-
-            progress.step('sensors', i, req.max_iterations, 'Selecting sensor set')
-            sensors = self.sensor_agent.design(req, topology)
-            progress.done('sensors', sensors=len(sensors.sensors))
-            sensors = self._review_step(iter_dir, 'sensors', sensors)
-            previous_eval = records[-1].evaluation if records else None
-            progress.step('strategy', i, req.max_iterations, 'Choosing control strategy')
-            strategy = self.control_strategy_agent.choose(req, topology, i, previous_eval)
-            progress.done('strategy', architecture=str(strategy.get('architecture', '')))
-            strategy = self._review_step(iter_dir, 'control_strategy', strategy)
-            progress.step('control', i, req.max_iterations, 'Synthesizing control parameters')
-            control = self.control_agent.design(req, topology, iteration=i, strategy=strategy)
-            progress.done('control', kp=f'{control.kp:.4g}', ki=f'{control.ki:.4g}')
-            control = self._review_step(iter_dir, 'control', control)
-            progress.step('payload', i, req.max_iterations, 'Building simulation payload')
-            payload_path = self.model_builder.build_payload(req, topology, sensors, control, iter_dir)
-            progress.done('payload', file=payload_path.name)
-            progress.step('simulation', i, req.max_iterations, 'Running simulation')
-            sim = self.simulation_agent.run(
-                req,
-                topology,
-                control,
-                payload_path,
-                iter_dir,
-                self.use_matlab,
-                template_override=self.template_slx,
-            )
-            progress.done('simulation', mode=str(sim.raw.get('mode', 'unknown')))
-            progress.step('visualization', i, req.max_iterations, 'Generating visualizations')
-            sim.visualization_files = self.visualization_agent.build(req, topology, control, sim, iter_dir)
-            progress.done('visualization', files=len(sim.visualization_files))
-            sim = self._review_step(iter_dir, 'simulation', sim)
-            progress.step('evaluation', i, req.max_iterations, 'Evaluating metrics')
-            eval_result = self.evaluation_agent.evaluate(req, sim)
-            progress.done('evaluation', passed=eval_result.passed, score=f'{eval_result.score:.2f}')
-            eval_result = self._review_step(iter_dir, 'evaluation', eval_result)
-            engineer_review = self._engineer_review_iteration(iter_dir, i, req, strategy, control, sim, eval_result)
-            final_pass = self._is_iteration_accepted(eval_result, engineer_review)
-
-            records.append(
-                IterationRecord(
-                    iteration=i,
-                    topology=deepcopy(topology),
-                    sensors=deepcopy(sensors),
-                    strategy=deepcopy(strategy),
-                    control=deepcopy(control),
-                    simulation=deepcopy(sim),
-                    evaluation=deepcopy(eval_result),
-                    engineer_review=deepcopy(engineer_review),
+        try:
+            progress.step('topology', 0, req.max_iterations, 'Selecting topology and initial passives')
+            topology = self.topology_agent.design(req)
+            progress.done('topology', topology=topology.topology)
+            topology = self._review_step(run_dir, 'topology', topology)
+
+            for i in range(req.max_iterations):
+                iter_dir = run_dir / f'iter_{i:02d}'
+                iter_dir.mkdir(parents=True, exist_ok=True)
+
+                progress.step('sensors', i, req.max_iterations, 'Selecting sensor set')
+                sensors = self.sensor_agent.design(req, topology)
+                progress.done('sensors', sensors=len(sensors.sensors))
+                sensors = self._review_step(iter_dir, 'sensors', sensors)
+                previous_eval = records[-1].evaluation if records else None
+                progress.step('strategy', i, req.max_iterations, 'Choosing control strategy')
+                strategy = self.control_strategy_agent.choose(req, topology, i, previous_eval)
+                progress.done('strategy', architecture=str(strategy.get('architecture', '')))
+                strategy = self._review_step(iter_dir, 'control_strategy', strategy)
+                progress.step('control', i, req.max_iterations, 'Synthesizing control parameters')
+                control = self.control_agent.design(req, topology, iteration=i, strategy=strategy)
+                progress.done('control', kp=f'{control.kp:.4g}', ki=f'{control.ki:.4g}')
+                control = self._review_step(iter_dir, 'control', control)
+                progress.step('payload', i, req.max_iterations, 'Building simulation payload')
+                payload_path = self.model_builder.build_payload(req, topology, sensors, control, iter_dir)
+                progress.done('payload', file=payload_path.name)
+                progress.step('simulation', i, req.max_iterations, 'Running simulation')
+                sim = self.simulation_agent.run(
+                    req,
+                    topology,
+                    control,
+                    payload_path,
+                    iter_dir,
+                    self.use_matlab,
+                    template_override=self.template_slx,
+                    sil=self.sil,
+                    matlab_worker=worker,
+                    fast_restart=self.fast_restart,
+                    matlab_timeout_s=self.matlab_timeout_s,
+                    on_progress=lambda stage, fraction: progress.detail('simulation', f'matlab {stage}', fraction),
+                )
+                progress.done('simulation', mode=str(sim.raw.get('mode', 'unknown')))
+                progress.step('visualization', i, req.max_iterations, 'Generating visualizations')
+                sim.visualization_files = self.visualization_agent.build(req, topology, control, sim, iter_dir)
+                progress.done('visualization', files=len(sim.visualization_files))
+                sim = self._review_step(iter_dir, 'simulation', sim)
+                progress.step('evaluation', i, req.max_iterations, 'Evaluating metrics')
+                eval_result = self.evaluation_agent.evaluate(req, sim)
+                progress.done('evaluation', passed=eval_result.passed, score=f'{eval_result.score:.2f}')
+                eval_result = self._review_step(iter_dir, 'evaluation', eval_result)
+                engineer_review = self._engineer_review_iteration(iter_dir, i, req, strategy, control, sim, eval_result)
+                final_pass = self._is_iteration_accepted(eval_result, engineer_review)
+                evolution_artifacts = self._append_waveform_evolution(run_dir, i, control, sim) or evolution_artifacts
+                self._archive_waveforms(iter_dir, sim)
+
+                records.append(
+                    IterationRecord(
+                        iteration=i,
+                        topology=deepcopy(topology),
+                        sensors=deepcopy(sensors),
+                        strategy=deepcopy(strategy),
+                        control=deepcopy(control),
+                        simulation=deepcopy(sim),
+                        evaluation=deepcopy(eval_result),
+                        engineer_review=deepcopy(engineer_review),
+                    )
                 )
-            )
 
-            dump_json(iter_dir / 'summary.json', {
-                'iteration': i,
-                'topology': asdict(topology),
-                'sensors': asdict(sensors),
-                'strategy': deepcopy(strategy),
-                'control': asdict(control),
-                'simulation': asdict(sim),
-                'evaluation': asdict(eval_result),
-                'engineer_review': asdict(engineer_review) if engineer_review else None,
-                'iteration_accepted': final_pass,
-            })
-
-            if final_pass:
-                progress.finish_iteration(i, accepted=True)
-                break
-            progress.finish_iteration(i, accepted=False)
-            if i >= req.max_iterations - 1:
-                break
-            progress.step('revision', i, req.max_iterations, 'Revising topology/control for next iteration')
-            topology, control = self.revising_agent.revise(req, topology, control, eval_result, engineer_review, i)
-            progress.done('revision', next_topology=topology.topology, next_arch=control.architecture)
-            topology = self._review_step(iter_dir, 'revised_topology', topology)
-            control = self._review_step(iter_dir, 'revised_control', control)
+                dump_json(iter_dir / 'summary.json', {
+                    'iteration': i,
+                    'topology': asdict(topology),
+                    'sensors': asdict(sensors),
+                    'strategy': deepcopy(strategy),
+                    'control': asdict(control),
+                    'simulation': asdict(sim),
+                    'evaluation': asdict(eval_result),
+                    'engineer_review': asdict(engineer_review) if engineer_review else None,
+                    'iteration_accepted': final_pass,
+                })
+
+                if final_pass:
+                    progress.finish_iteration(i, accepted=True)
+                    break
+                progress.finish_iteration(i, accepted=False)
+                if i >= req.max_iterations - 1:
+                    break
+                progress.step('revision', i, req.max_iterations, 'Revising topology/control for next iteration')
+                topology, control = self.revising_agent.revise(req, topology, control, eval_result, engineer_review, i)
+                progress.done('revision', next_topology=topology.topology, next_arch=control.architecture)
+                topology = self._review_step(iter_dir, 'revised_topology', topology)
+                control = self._review_step(iter_dir, 'revised_control', control)
+        finally:
+            if worker is not None:
+                worker.close()
 
         final_artifact_files: list[str] = []
         final_validation_mode = 'none'
@@ -152,8 +205,6 @@ class ACSSOrchestrator:
                 final_validation_mode = str(r.simulation.raw.get('mode', 'unknown'))
                 break
 
-        evolution_artifacts = self._publish_waveform_evolution(run_dir, records)
-
         dump_json(
             run_dir / 'run_summary.json',
             {
@@ -177,6 +228,7 @@ class ACSSOrchestrator:
                 'final_validation_mode': final_validation_mode,
                 'final_control_code_files': final_artifact_files,
                 'waveform_evolution_files': evolution_artifacts,
+                'llm_prompt_stats_file': self._write_prompt_stats(run_dir, prompt_stats_start),
             },
         )
         progress.finish_run(records)
@@ -209,53 +261,104 @@ class ACSSOrchestrator:
         )
         return published
 
-    def _publish_waveform_evolution(self, run_dir: Path, records: list[IterationRecord]) -> list[str]:
-        curves: list[dict[str, object]] = []
-        for record in records:
-            waveform_path = Path(record.simulation.waveform_files[0]) if record.simulation.waveform_files else None
-            if waveform_path is None or not waveform_path.exists():
-                continue
+    def _archive_waveforms(self, iter_dir: Path, sim: SimulationResult) -> None:
+        # Compressed, chunk-indexed copy of the iteration's waveform. Once it reads back
+        # identical it replaces the raw channels and the redundant three-phase JSON,
+        # unless keep_raw_waveforms is set.
+        handle = sim.waveform()
+        if handle is None or not handle.exists() or handle.path.suffix == ARCHIVE_SUFFIX:
+            return
+        source = handle.path
+        try:
+            archive_path = write_archive(
+                handle.load(), iter_dir / f'{waveform_stem(source)}{ARCHIVE_SUFFIX}', codec=self.archive_codec
+            )
+        except (OSError, ValueError) as e:
+            print(f'[archive] waveform archive skipped ({e})', flush=True)
+            return
+        sim.raw['waveform_archive'] = str(archive_path)
+        if self.keep_raw_waveforms or iter_dir.resolve() not in source.resolve().parents:
+            return
+        if not verify_archive(handle.load(), archive_path):
+            print(f'[archive] {archive_path.name} does not match {source.name}; raw waveform kept', flush=True)
+            return
+
+        handle.invalidate()
+        sim.waveform_files[0] = str(archive_path)
+        try:
+            if source.is_dir():
+                shutil.rmtree(source)
+            else:
+                source.unlink()
+        except OSError as e:
+            print(f'[archive] raw waveform kept ({e})', flush=True)
+        phase_json = iter_dir / 'waveforms_3ph.json'
+        if str(phase_json) in sim.visualization_files:
+            phase_json.unlink(missing_ok=True)
+            sim.visualization_files.remove(str(phase_json))
+
+    def _append_waveform_evolution(
+        self, run_dir: Path, iteration: int, control: ControlDesign, sim: SimulationResult
+    ) -> list[str]:
+        # Append this iteration's decimated output curve, then rebuild the evolution
+        # JSON/SVG from the compact curves so a partial run always has a current view.
+        curves_path = run_dir / EVOLUTION_CURVES_NAME
+        handle = sim.waveform()
+        if handle is not None and handle.exists():
             try:
-                payload = json.loads(waveform_path.read_text(encoding='utf-8'))
-                time_s = [float(x) for x in payload.get('time_s', [])]
-                vout_v = [float(x) for x in payload.get('vout_v', [])]
+                curve = _evolution_curve(handle.load())
             except Exception:
-                continue
-            if len(time_s) < 2 or len(vout_v) < 2 or len(time_s) != len(vout_v):
-                continue
-            curves.append(
-                {
-                    'iteration': record.iteration,
-                    'controller': record.control.controller,
-                    'architecture': record.control.architecture,
-                    'time_s': time_s,
-                    'vout_v': vout_v,
+                curve = None
+            if curve is not None:
+                line = {
+                    'iteration': iteration,
+                    'controller': control.controller,
+                    'architecture': control.architecture,
+                    'time_s': curve[0].tolist(),
+                    'vout_v': curve[1].tolist(),
                 }
-            )
+                with curves_path.open('a', encoding='utf-8') as fh:
+                    fh.write(json.dumps(line) + '\n')
 
+        curves = _load_evolution_curves(curves_path)
         if not curves:
             return []
-
         json_path = run_dir / 'waveform_evolution.json'
         svg_path = run_dir / 'waveform_evolution.svg'
-        dump_json(
-            json_path,
-            {
-                'curves': [
-                    {
-                        'iteration': curve['iteration'],
-                        'controller': curve['controller'],
-                        'architecture': curve['architecture'],
-                        'time_s': curve['time_s'],
-                        'vout_v': curve['vout_v'],
-                    }
-                    for curve in curves
-                ]
-            },
-        )
+        dump_json(json_path, {'curves': curves})
         svg_path.write_text(_render_evolution_svg(curves), encoding='utf-8')
         return [str(json_path), str(svg_path)]
 
+    def _llm_clients(self) -> dict[str, object]:
+        agents = {
+            'topology': self.topology_agent,
+            'control_strategy': self.control_strategy_agent,
+            'control': self.control_agent,
+        }
+        return {name: agent.client for name, agent in agents.items() if hasattr(agent, 'client')}
+
+    def _write_prompt_stats(self, run_dir: Path, start: dict[str, int]) -> str | None:
+        calls = [
+            stats
+            for name, client in self._llm_clients().items()
+            for stats in client.prompt_stats[start.get(name, 0) :]
+        ]
+        if not calls:
+            return None
+        usage = [call.get('usage', {}) for call in calls]
+        path = run_dir / PROMPT_STATS_NAME
+        dump_json(path, {
+            'calls': calls,
+            'totals': {
+                'calls': len(calls),
+                'prompt_tokens_est': sum(call['prompt_tokens_est'] for call in calls),
+                'reused_prefix_tokens_est': sum(call['reused_prefix_tokens_est'] for call in calls),
+                'prompt_tokens': sum(int(item.get('prompt_tokens', 0)) for item in usage),
+                'prompt_cache_hit_tokens': sum(int(item.get('prompt_cache_hit_tokens', 0)) for item in usage),
+            },
+        })
+        return str(path)
+
     def _review_step(self, base_dir: Path, step_name: str, data: object) -> object:
         if not self.human_review:
             return data
@@ -372,6 +475,37 @@ def _extract_knowledge_refs(strategy: dict[str, object], control: object) -> lis
     return merged
 
 
+def _evolution_curve(bundle: WaveformBundle) -> tuple[np.ndarray, np.ndarray] | None:
+    # Output voltage decimated to the evolution plot's pixel columns, read in chunks.
+    if 'time_s' not in bundle.channels or 'vout_v' not in bundle.channels:
+        return None
+    count = min(bundle.length('time_s'), bundle.length('vout_v'))
+    if count < 2 or bundle.length('time_s') != bundle.length('vout_v'):
+        return None
+    t_stats, _ = channel_stats(bundle, 'time_s')
+    time_s, vout_v = zip(
+        *decimated_chunks(
+            iter_chunks(bundle, ('time_s', 'vout_v')), count, t_stats.minimum, t_stats.maximum, EVOLUTION_COLUMNS
+        )
+    )
+    return np.concatenate(time_s), np.concatenate(vout_v)
+
+
+def _load_evolution_curves(path: Path) -> list[dict[str, object]]:
+    # Later lines for the same iteration win; a torn last line from a crash is skipped.
+    curves: dict[object, dict[str, object]] = {}
+    if not path.exists():
+        return []
+    for line in path.read_text(encoding='utf-8').splitlines():
+        try:
+            curve = json.loads(line)
+        except ValueError:
+            continue
+        if isinstance(curve, dict) and 'time_s' in curve and 'vout_v' in curve:
+            curves[curve.get('iteration')] = curve
+    return list(curves.values())
+
+
 def _render_evolution_svg(curves: list[dict[str, object]]) -> str:
     width = 1180
     height = 760
@@ -398,12 +532,6 @@ def _render_evolution_svg(curves: list[dict[str, object]]) -> str:
     min_v -= v_pad
     max_v += v_pad
 
-    def sx(t: float) -> float:
-        return left + (t - min_t) / (max_t - min_t) * plot_w
-
-    def sy(v: float) -> float:
-        return top + (max_v - v) / (max_v - min_v) * plot_h
-
     palette = ['#0b84f3', '#f95d6a', '#00a676', '#ff9f1c', '#7a5cff', '#1982c4', '#8ac926', '#ff595e']
     grid: list[str] = []
     labels: list[str] = []
@@ -431,10 +559,10 @@ def _render_evolution_svg(curves: list[dict[str, object]]) -> str:
     legend_y = top + 12
     for idx, curve in enumerate(curves):
         color = palette[idx % len(palette)]
-        points = " ".join(
-            f"{sx(float(t)):.2f},{sy(float(v)):.2f}"
-            for t, v in zip(curve['time_s'], curve['vout_v'])
-        )
+        time_s, vout_v = decimate_minmax(curve['time_s'], curve['vout_v'], plot_w)
+        xs = left + (time_s - min_t) / (max_t - min_t) * plot_w
+        ys = top + (max_v - vout_v) / (max_v - min_v) * plot_h
+        points = " ".join(f"{x:.2f},{y:.2f}" for x, y in zip(xs.tolist(), ys.tolist()))
         polylines.append(f'<polyline fill="none" stroke="{color}" stroke-width="2.5" points="{points}" />')
         legend.append(
             f'<line x1="{width - right + 18}" y1="{legend_y:.2f}" x2="{width - right + 42}" y2="{legend_y:.2f}" '
@@ -489,6 +617,12 @@ class _ProgressReporter:
         details = ', '.join(f'{key}={value}' for key, value in fields.items())
         print(f'           {step_name:<13} done ({details})', flush=True)
 
+    def detail(self, step_name: str, message: str, fraction: float | None = None) -> None:
+        if fraction is None or math.isnan(fraction):
+            print(f'           {step_name:<13} {message}', flush=True)
+            return
+        print(f'           {step_name:<13} {message} ({fraction * 100:.0f}%)', flush=True)
+
     def finish_iteration(self, iteration: int, accepted: bool) -> None:
         status = 'accepted' if accepted else 'continuing'
         print(f'[iter {iteration + 1}/{self.max_iterations}] status        {status}', flush=True)
@@ -1,4 +1,11 @@
-from src.rag.prompting import extract_references, format_retrieved_context
-from src.rag.retriever import LocalKnowledgeBase
+from src.rag.prompting import context_stats, extract_references, format_retrieved_context, pack_retrieved_context
+from src.rag.retriever import LocalKnowledgeBase, shared_knowledge_base
 
-__all__ = ['LocalKnowledgeBase', 'format_retrieved_context', 'extract_references']
+__all__ = [
+    'LocalKnowledgeBase',
+    'shared_knowledge_base',
+    'format_retrieved_context',
+    'pack_retrieved_context',
+    'context_stats',
+    'extract_references',
+]
@@ -0,0 +1,322 @@
+from __future__ import annotations
+
+import argparse
+from dataclasses import replace
+import json
+from pathlib import Path
+import platform
+import random
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any
+
+import numpy as np
+
+try:
+    import resource
+except ImportError:  # Windows: peak RSS is not reported.
+    resource = None
+
+from src.contracts import EvaluationResult, RequirementSpec, dump_json, load_requirements
+from src.rag.contracts import RetrievedContext
+
+# Corpus sizes (chunks) benchmarked by default and sections per synthetic knowledge file.
+DEFAULT_SIZES = (1_000, 10_000, 100_000)
+SECTIONS_PER_FILE = 8
+
+_REPO_ROOT = Path(__file__).resolve().parents[2]
+_TOPICS = ('strategy', 'tuning', 'revision', 'constraints', 'implementation', 'sources')
+_TOPOLOGIES = ('buck', 'boost', 'buck_boost', 'inverter_3ph', 'inverter_1ph', 'pfc', 'flyback', 'dab')
+_ARCHITECTURES = ('pi', 'cascaded', 'current_mode', 'voc_aho', 'dq', 'vsg', 'pr', 'droop')
+_FAMILIES = ('dc_dc_nonisolated', 'dc_dc_isolated', 'dc_ac_inverter', 'ac_dc_rectifier', 'generic_power_converter')
+_OBJECTIVES = ('voltage_regulation', 'grid_following', 'grid_forming', 'power_factor_correction', 'current_regulation')
+_MODES = ('standalone', 'grid_connected', 'weak_grid')
+_TRIGGERS = ('', 'overshoot', 'slow_settling', 'excess_ripple', 'efficiency_shortfall', 'failed_revision')
+_FEATURES = ('load_transient', 'weak_grid', 'grid_synchronization', 'line_frequency_envelope', 'lcl_filter', 'rhp_zero')
+_TAGS = ('load_step', 'inrush', 'grid_connected', 'weak_grid', 'revision', 'sampling', 'current_loop', 'damping')
+_WORD_RE = re.compile(r'[a-z][a-z_]+')
+
+
+def generate_corpus(root: Path, chunks: int, seed: int = 0) -> Path:
+    """Write a synthetic knowledge tree of `chunks` sections in the `knowledge/` JSON schema.
+
+    Text is drawn Zipf-style from the real knowledge vocabulary plus rare
+    synthetic terms, so postings lengths and vocabulary growth resemble a large
+    distilled corpus. The tree is reused when a matching one already exists.
+    """
+    # Kept beside the tree: a JSON file inside it would be ingested as knowledge.
+    marker = root.with_name(root.name + '.spec')
+    spec = {'chunks': chunks, 'seed': seed, 'sections_per_file': SECTIONS_PER_FILE}
+    if marker.exists() and json.loads(marker.read_text(encoding='utf-8')) == spec:
+        return root
+    if root.exists():
+        shutil.rmtree(root)
+    rng = random.Random(seed)
+    words = _seed_vocabulary()
+    # Heaps'-law style growth of rare terms with corpus size.
+    words += [f'term{i:06d}' for i in range(int(40 * chunks**0.6))]
+    weights = [1.0 / (rank + 1) for rank in range(len(words))]
+    for file_index in range((chunks + SECTIONS_PER_FILE - 1) // SECTIONS_PER_FILE):
+        topic = rng.choice(_TOPICS)
+        sections = []
+        for idx in range(min(SECTIONS_PER_FILE, chunks - file_index * SECTIONS_PER_FILE)):
+            section: dict[str, Any] = {
+                'heading': ' '.join(rng.choices(words[:400], k=3)),
+                'text': ' '.join(rng.choices(words, weights, k=rng.randint(25, 70))) + '.',
+            }
+            if rng.random() < 0.3:
+                section['tags'] = rng.sample(_TAGS, rng.randint(1, 3))
+            if rng.random() < 0.2:
+                section['revision_trigger'] = rng.choice(_TRIGGERS)
+            if topic == 'sources':
+                section['claim_id'] = f'claim_{file_index}_{idx}'
+                section['evidence_strength'] = rng.choice(('high', 'medium', 'low'))
+            sections.append(section)
+        payload = {
+            'title': ' '.join(rng.choices(words[:400], k=4)).title(),
+            'topic': topic,
+            'topology': rng.choice(_TOPOLOGIES),
+            'architecture': rng.choice(_ARCHITECTURES),
+            'power_stage_family': rng.choice(_FAMILIES),
+            'control_objective': rng.choice(_OBJECTIVES),
+            'operating_mode': rng.choice(_MODES),
+            'plant_features': rng.sample(_FEATURES, rng.randint(0, 2)),
+            'source_refs': [f'source_{rng.randrange(max(chunks // 100, 1)):05d}'],
+            'confidence': rng.choice(('high', 'medium', 'low')),
+            'tags': rng.sample(_TAGS, rng.randint(1, 3)),
+            'source_type': 'benchmark',
+            'sections': sections,
+        }
+        path = root / topic / f'bench_{file_index:06d}.json'
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(payload), encoding='utf-8')
+    marker.write_text(json.dumps(spec), encoding='utf-8')
+    return root
+
+
+def benchmark_queries() -> list[tuple[str, dict[str, Any]]]:
+    """Retrieval calls exactly as ControlAgent and ControlStrategyAgent issue them, over example requirements."""
+    from src.agents.control_agent import ControlAgent
+    from src.agents.control_strategy_agent import ControlStrategyAgent
+    from src.agents.topology_agent import TopologyAgent
+
+    recorder = _QueryRecorder()
+    control, strategy = ControlAgent(), ControlStrategyAgent()
+    control.knowledge = strategy.knowledge = recorder
+    previous = [
+        None,
+        EvaluationResult(passed=False, violations=['overshoot 12.0% > 5.0%'], score=0.4),
+        EvaluationResult(passed=False, violations=['settling time 9.1 ms > 5.0 ms'], score=0.5),
+        EvaluationResult(passed=False, violations=['ripple 0.4 V > 0.1 V', 'efficiency 91% < 95%'], score=0.3),
+    ]
+    plans = [
+        {},
+        {'controller': 'pi', 'architecture': 'pi'},
+        {'controller': 'cascaded_pi', 'architecture': 'cascaded', 'inrush_control': 'soft_start'},
+        {'controller': 'voc', 'architecture': 'voc_aho'},
+    ]
+    for req in _benchmark_requirements():
+        topology = TopologyAgent().design(req)
+        for evaluation in previous:
+            strategy._retrieve_context(req, topology, evaluation)
+        for plan in plans:
+            control._retrieve_context(req, topology, plan)
+    return recorder.calls
+
+
+def run_benchmark(sizes: list[int], work_dir: Path, rounds: int = 5, cold_runs: int = 5) -> dict[str, Any]:
+    queries = benchmark_queries()
+    report: dict[str, Any] = {
+        'commit': _git_commit(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'queries': len(queries),
+        'rounds': rounds,
+        'sizes': {},
+    }
+    query_path = work_dir / 'queries.json'
+    query_path.parent.mkdir(parents=True, exist_ok=True)
+    query_path.write_text(json.dumps(queries), encoding='utf-8')
+    for size in sizes:
+        root = generate_corpus(work_dir / f'corpus_{size}', size)
+        print(f'[benchmark] {size} chunks: build_index', flush=True)
+        build = _run_phase('build', root)
+        print(f'[benchmark] {size} chunks: cold load x{cold_runs}', flush=True)
+        cold = [_run_phase('cold', root) for _ in range(cold_runs)]
+        print(f'[benchmark] {size} chunks: warm retrieve', flush=True)
+        warm = _run_phase('warm', root, '--queries', str(query_path), '--rounds', str(rounds))
+        report['sizes'][str(size)] = {
+            'chunks': build['chunks'],
+            'build_index': build,
+            'cold_load': {
+                **_latency([run['seconds'] for run in cold]),
+                'peak_rss_mb': cold[-1]['peak_rss_mb'],
+                'baseline_rss_mb': cold[-1]['baseline_rss_mb'],
+            },
+            'warm_retrieve': warm,
+        }
+    return report
+
+
+class _QueryRecorder:
+    def __init__(self) -> None:
+        self.calls: list[tuple[str, dict[str, Any]]] = []
+
+    def retrieve(self, query: str, **kwargs: Any) -> RetrievedContext:
+        self.calls.append((query, kwargs))
+        return RetrievedContext(query=query, chunks=[])
+
+
+def _benchmark_requirements() -> list[RequirementSpec]:
+    requirements: list[RequirementSpec] = []
+    for path in sorted((_REPO_ROOT / 'examples').glob('requirements*.json')):
+        req = load_requirements(path)
+        requirements += [
+            req,
+            replace(req, weak_grid_mode=not req.weak_grid_mode, grid_connected=True),
+            replace(req, load_step_pct=None, inrush_limit_a=5.0, control_design_notes='limit inrush during startup'),
+        ]
+    return requirements
+
+
+def _seed_vocabulary() -> list[str]:
+    # Real knowledge words, most frequent first, so common terms overlap the agent queries.
+    counts: dict[str, int] = {}
+    for path in sorted((_REPO_ROOT / 'knowledge').rglob('*.json')):
+        if path.name == 'index.json':
+            continue
+        for word in _WORD_RE.findall(path.read_text(encoding='utf-8').lower()):
+            counts[word] = counts.get(word, 0) + 1
+    return sorted(counts, key=lambda word: (-counts[word], word))
+
+
+def _run_phase(phase: str, root: Path, *extra: str) -> dict[str, Any]:
+    # Each phase runs in a fresh interpreter, so loads are cold and peak RSS belongs to that phase alone.
+    completed = subprocess.run(
+        [sys.executable, '-m', 'src.rag.benchmark', '--phase', phase, '--root', str(root), *extra],
+        cwd=_REPO_ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def _phase(phase: str, root: Path, queries_path: Path | None, rounds: int) -> dict[str, Any]:
+    from src.rag.indexer import build_index
+    from src.rag.retriever import LocalKnowledgeBase
+
+    baseline = _peak_rss_mb()
+    index_path = root / 'index.json'
+    result: dict[str, Any] = {}
+    if phase == 'build':
+        for stale in root.glob('index*'):
+            stale.unlink()
+        start = time.perf_counter()
+        index = build_index(root, index_path)
+        result['seconds'] = time.perf_counter() - start
+        result['chunks'] = len(index.chunks)
+        result['index_bytes'] = sum(path.stat().st_size for path in root.glob('index*'))
+    elif phase == 'cold':
+        start = time.perf_counter()
+        chunks = LocalKnowledgeBase(root)._load_chunks()
+        result['seconds'] = time.perf_counter() - start
+        result['chunks'] = len(chunks)
+    elif phase == 'warm':
+        calls = json.loads(queries_path.read_text(encoding='utf-8')) if queries_path else []
+        kb = LocalKnowledgeBase(root, cache_size=0)
+        kb._load_chunks()
+        for mode in ('lexical', 'hybrid'):
+            for query, kwargs in calls:
+                kb.retrieve(query, **{**kwargs, 'mode': mode})
+            latencies: list[float] = []
+            for _ in range(rounds):
+                for query, kwargs in calls:
+                    start = time.perf_counter()
+                    kb.retrieve(query, **{**kwargs, 'mode': mode})
+                    latencies.append(time.perf_counter() - start)
+            result[mode] = _latency(latencies)
+        cached = LocalKnowledgeBase(root)
+        cached._load_chunks()
+        for query, kwargs in calls:
+            cached.retrieve(query, **kwargs)
+        latencies = []
+        for _ in range(rounds):
+            for query, kwargs in calls:
+                start = time.perf_counter()
+                cached.retrieve(query, **kwargs)
+                latencies.append(time.perf_counter() - start)
+        result['cached'] = _latency(latencies)
+    else:
+        raise ValueError(f'unknown benchmark phase {phase!r}')
+    result['baseline_rss_mb'] = baseline
+    result['peak_rss_mb'] = _peak_rss_mb()
+    return result
+
+
+def _latency(seconds: list[float]) -> dict[str, float]:
+    values = np.asarray(seconds, dtype=np.float64) * 1e3
+    return {
+        'count': int(values.size),
+        'p50_ms': float(np.percentile(values, 50)),
+        'p99_ms': float(np.percentile(values, 99)),
+        'mean_ms': float(values.mean()),
+    }
+
+
+def _peak_rss_mb() -> float | None:
+    if resource is None:
+        return None
+    # ru_maxrss is KiB on Linux and bytes on macOS.
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def _git_commit() -> str:
+    try:
+        completed = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=_REPO_ROOT, capture_output=True, text=True, check=True
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return ''
+    return completed.stdout.strip()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Benchmark knowledge indexing and retrieval on synthetic corpora')
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(DEFAULT_SIZES), help='Corpus sizes in chunks')
+    parser.add_argument('--out', type=Path, default=Path('knowledge_benchmark.json'), help='Output JSON report')
+    parser.add_argument(
+        '--work-dir',
+        type=Path,
+        default=Path(tempfile.gettempdir()) / 'acss_knowledge_benchmark',
+        help='Where synthetic corpora are generated (reused across runs)',
+    )
+    parser.add_argument('--rounds', type=int, default=5, help='Timed passes over the query set per corpus')
+    parser.add_argument('--cold-runs', type=int, default=5, help='Fresh-process index loads per corpus')
+    parser.add_argument('--phase', choices=('build', 'cold', 'warm'), help=argparse.SUPPRESS)
+    parser.add_argument('--root', type=Path, help=argparse.SUPPRESS)
+    parser.add_argument('--queries', type=Path, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.phase:
+        print(json.dumps(_phase(args.phase, args.root, args.queries, args.rounds)))
+        return
+    report = run_benchmark(args.sizes, args.work_dir, rounds=args.rounds, cold_runs=args.cold_runs)
+    dump_json(args.out, report)
+    for size, stats in report['sizes'].items():
+        print(
+            f"[benchmark] {size} chunks: build {stats['build_index']['seconds']:.2f} s, "
+            f"cold load p50 {stats['cold_load']['p50_ms']:.1f} ms, "
+            f"retrieve p50/p99 {stats['warm_retrieve']['hybrid']['p50_ms']:.2f}/{stats['warm_retrieve']['hybrid']['p99_ms']:.2f} ms"
+        )
+    print(f'[benchmark] wrote {args.out}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,168 @@
+from __future__ import annotations
+
+from collections import Counter
+import math
+import re
+from typing import TYPE_CHECKING
+
+import numpy as np
+
+from src.rag.postings import SUBSET_SHARE, Postings, match_sorted
+
+if TYPE_CHECKING:
+    from src.rag.contracts import KnowledgeChunk
+
+_TOKEN_RE = re.compile(r'[a-z0-9_]+')
+
+# Okapi BM25 term-frequency saturation and document-length normalization.
+BM25_K1 = 1.2
+BM25_B = 0.75
+# Query tokens below this IDF (in more than about a third of all chunks) do not select candidates.
+BM25_MIN_IDF = 1.0
+
+
+class BM25Index:
+    """Inverted index over chunk tokens: postings, document lengths and IDF.
+
+    Postings are (chunk position, term frequency) runs per token in CSR arrays
+    (`Postings`), so a saved index is memory-mapped rather than parsed. A
+    token's run is sliced out the first time it is queried, and scoring a
+    query touches only the chunks that contain one of its tokens.
+    """
+
+    def __init__(
+        self,
+        postings: Postings,
+        doc_lengths: np.ndarray,
+        k1: float = BM25_K1,
+        b: float = BM25_B,
+    ) -> None:
+        self.postings = postings
+        self.doc_lengths = doc_lengths
+        self.k1 = k1
+        self.b = b
+        count = len(doc_lengths)
+        avg_length = float(np.mean(doc_lengths)) if count else 0.0
+        # Per-document BM25 denominator term, k1 * (1 - b + b * dl / avgdl).
+        self._norm = k1 * (1.0 - b + b * np.asarray(doc_lengths, dtype=np.float64) / avg_length) if avg_length else np.full(count, k1)
+        # Queried tokens: IDF (None when not indexed) and, once scored, chunk positions with
+        # their saturated term-frequency weight tf * (k1 + 1) / (tf + norm).
+        self._idfs: dict[str, float | None] = {}
+        self._arrays: dict[str, tuple[np.ndarray, np.ndarray]] = {}
+
+    def __len__(self) -> int:
+        return len(self.doc_lengths)
+
+    @classmethod
+    def build(cls, chunks: list[KnowledgeChunk]) -> BM25Index:
+        docs: dict[str, list[int]] = {}
+        tfs: dict[str, list[int]] = {}
+        doc_lengths: list[int] = []
+        for position, chunk in enumerate(chunks):
+            tokens = chunk_tokens(chunk)
+            doc_lengths.append(len(tokens))
+            for token, tf in Counter(tokens).items():
+                docs.setdefault(token, []).append(position)
+                tfs.setdefault(token, []).append(tf)
+        return cls(Postings.from_lists(docs, tfs), np.asarray(doc_lengths, dtype=np.int32))
+
+    def patch(self, remap: np.ndarray, added: list[KnowledgeChunk]) -> BM25Index:
+        """New index with chunks renumbered through `remap` (-1 drops one) and `added` appended."""
+        kept_lengths = np.asarray(self.doc_lengths)[remap >= 0]
+        appended = BM25Index.build(added)
+        return BM25Index(
+            self.postings.patch(remap, appended.postings, len(kept_lengths)),
+            np.concatenate([kept_lengths, appended.doc_lengths]).astype(np.int32),
+            k1=self.k1,
+            b=self.b,
+        )
+
+    @classmethod
+    def from_arrays(cls, arrays: dict[str, np.ndarray], k1: float = BM25_K1, b: float = BM25_B) -> BM25Index:
+        return cls(Postings.from_arrays(arrays), arrays['doc_lengths'], k1=k1, b=b)
+
+    def to_arrays(self) -> dict[str, np.ndarray]:
+        return {**self.postings.to_arrays(), 'doc_lengths': self.doc_lengths}
+
+    def matching(self, query_tokens: list[str], min_idf: float = BM25_MIN_IDF) -> np.ndarray:
+        """Mask of the chunks holding a query token with an IDF of at least `min_idf`.
+
+        Near-stopword tokens (in more than about a third of all chunks) hold most
+        of the postings but hardly separate chunks, so they do not bring in
+        chunks of their own; they still count in `scores`. When no query token
+        is that rare, the rarest ones select the chunks instead.
+        """
+        matched = np.zeros(len(self), dtype=bool)
+        idfs = {token: self._idf(token) for token in set(query_tokens)}
+        known = [idf for idf in idfs.values() if idf is not None]
+        floor = min(min_idf, max(known, default=0.0))
+        for token, idf in idfs.items():
+            if idf is not None and idf >= floor:
+                matched[self._posting(token)[0]] = True
+        return matched
+
+    def scores(self, query_tokens: list[str], positions: np.ndarray | None = None) -> np.ndarray:
+        """BM25 score of the chunks at sorted `positions` (every chunk when None); chunks sharing no token score 0."""
+        # Within a position subset, only postings far shorter than it are matched
+        # against it; longer ones are scattered whole into one corpus-length
+        # array, which beats binary-searching a comparable number of entries.
+        subset = positions is not None and positions.size * SUBSET_SHARE < len(self)
+        scores = np.zeros(positions.size if subset else len(self), dtype=np.float64)
+        scattered: np.ndarray | None = None
+        for token, qtf in Counter(query_tokens).items():
+            idf = self._idf(token)
+            if idf is None:
+                continue
+            docs, weights = self._posting(token)
+            if subset and docs.size * SUBSET_SHARE <= positions.size:
+                rows, hits = match_sorted(positions, docs)
+                scores[rows] += qtf * idf * weights[hits]
+            elif subset:
+                if scattered is None:
+                    scattered = np.zeros(len(self), dtype=np.float64)
+                scattered[docs] += qtf * idf * weights
+            else:
+                scores[docs] += qtf * idf * weights
+        if scattered is not None:
+            scores += scattered[positions]
+        return scores if subset or positions is None else scores[positions]
+
+    def _idf(self, token: str) -> float | None:
+        if token not in self._idfs:
+            lo, hi = self.postings.span(token)
+            df = hi - lo
+            self._idfs[token] = math.log(1.0 + (len(self) - df + 0.5) / (df + 0.5)) if df else None
+        return self._idfs[token]
+
+    def _posting(self, token: str) -> tuple[np.ndarray, np.ndarray]:
+        posting = self._arrays.get(token)
+        if posting is None:
+            lo, hi = self.postings.span(token)
+            docs = self.postings.positions[lo:hi].astype(np.int64)
+            tfs = self.postings.values[lo:hi].astype(np.float64)
+            posting = (docs, tfs * (self.k1 + 1.0) / (tfs + self._norm[docs]))
+            self._arrays[token] = posting
+        return posting
+
+
+def tokenize(value: str) -> list[str]:
+    return _TOKEN_RE.findall(value.lower())
+
+
+def chunk_tokens(chunk: KnowledgeChunk) -> list[str]:
+    return tokenize(' '.join([
+        chunk.title,
+        chunk.section,
+        chunk.text,
+        chunk.topic,
+        chunk.topology,
+        chunk.architecture,
+        chunk.power_stage_family,
+        chunk.modulation,
+        chunk.control_objective,
+        chunk.operating_mode,
+        chunk.revision_trigger,
+        ' '.join(chunk.plant_features),
+        ' '.join(chunk.source_refs),
+        ' '.join(chunk.tags),
+    ]))
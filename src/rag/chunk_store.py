@@ -0,0 +1,99 @@
+from __future__ import annotations
+
+from dataclasses import asdict
+import json
+import mmap
+from pathlib import Path
+from typing import Iterator, Sequence
+
+import numpy as np
+
+from src.rag.contracts import KnowledgeChunk
+
+# Chunk bodies live next to the index as one JSON object per line.
+CHUNK_STORE_SUFFIX = '_chunks.jsonl'
+
+
+class ChunkStore(Sequence[KnowledgeChunk]):
+    """Chunk bodies in a memory-mapped JSON-lines file, parsed only when a chunk is indexed.
+
+    `spans` holds the (offset, size) of each live chunk. Chunks dropped by an
+    incremental re-index leave dead bytes behind until the store is compacted.
+    """
+
+    def __init__(self, path: Path, spans: np.ndarray, source_paths: list[str]) -> None:
+        self.path = path
+        self.spans = np.asarray(spans, dtype=np.int64).reshape(-1, 2)
+        self.source_paths = source_paths
+        self._data: mmap.mmap | bytes | None = None
+
+    def __len__(self) -> int:
+        return len(self.spans)
+
+    def __getitem__(self, position: int) -> KnowledgeChunk:  # type: ignore[override]
+        return KnowledgeChunk(**json.loads(self.raw(position)))
+
+    def __iter__(self) -> Iterator[KnowledgeChunk]:
+        for position in range(len(self)):
+            yield self[position]
+
+    @property
+    def live_bytes(self) -> int:
+        return int(self.spans[:, 1].sum())
+
+    def raw(self, position: int) -> bytes:
+        offset, size = self.spans[position]
+        return self._map()[offset : offset + size]
+
+    def _map(self) -> mmap.mmap | bytes:
+        if self._data is None:
+            with self.path.open('rb') as fh:
+                size = fh.seek(0, 2)
+                # Zero-length files cannot be mapped.
+                self._data = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) if size else b''
+        return self._data
+
+
+def chunk_store_path(index_path: Path) -> Path:
+    return index_path.with_name(index_path.stem + CHUNK_STORE_SUFFIX)
+
+
+def encode_chunk(chunk: KnowledgeChunk) -> bytes:
+    return json.dumps(asdict(chunk)).encode('utf-8') + b'\n'
+
+
+def write_chunk_store(path: Path, records: list[bytes], source_paths: list[str]) -> ChunkStore:
+    """Write a fresh store holding `records`; the old file is replaced only once complete."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(path.name + '.tmp')
+    with tmp_path.open('wb') as fh:
+        spans = _write_records(fh, records)
+    tmp_path.replace(path)
+    return ChunkStore(path, spans, source_paths)
+
+
+def append_chunk_store(store: ChunkStore, keep: np.ndarray, records: list[bytes], source_paths: list[str]) -> ChunkStore:
+    """Store with the chunks selected by `keep` plus `records` appended after the existing bytes.
+
+    Bytes already written never change, so readers of the previous store stay
+    valid. The store is compacted instead once dead bytes outweigh live ones.
+    """
+    kept_sources = [source for source, kept in zip(store.source_paths, keep) if kept]
+    kept_spans = store.spans[keep]
+    size = store.path.stat().st_size if store.path.exists() else 0
+    new_size = sum(len(record) for record in records)
+    if size + new_size > 2 * (int(kept_spans[:, 1].sum()) + new_size):
+        kept = [store.raw(position) for position in np.flatnonzero(keep)]
+        return write_chunk_store(store.path, kept + records, kept_sources + source_paths)
+    with store.path.open('ab') as fh:
+        fh.seek(0, 2)
+        spans = _write_records(fh, records)
+    return ChunkStore(store.path, np.concatenate([kept_spans, spans]), kept_sources + source_paths)
+
+
+def _write_records(fh, records: list[bytes]) -> np.ndarray:
+    spans = np.zeros((len(records), 2), dtype=np.int64)
+    for row, record in enumerate(records):
+        spans[row] = (fh.tell(), len(record))
+        fh.write(record)
+    return spans
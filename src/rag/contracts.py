@@ -1,10 +1,17 @@
 from __future__ import annotations
 
 from dataclasses import dataclass, field
-from typing import Any
+from typing import TYPE_CHECKING, Any
 
+from src.rag.bm25 import BM25Index
+from src.rag.dense import DenseIndex
+from src.rag.facets import FacetIndex
 
-@dataclass
+if TYPE_CHECKING:
+    from src.rag.chunk_store import ChunkStore
+
+
+@dataclass(slots=True)
 class KnowledgeChunk:
     chunk_id: str
     source_path: str
@@ -26,8 +33,29 @@ class KnowledgeChunk:
     metadata: dict[str, Any] = field(default_factory=dict)
 
 
+@dataclass
+class KnowledgeIndex:
+    chunks: ChunkStore
+    lexical: BM25Index
+    facets: FacetIndex
+    dense: DenseIndex | None = None
+    # Manifest of ingested files: relative path -> sha256, size, mtime_ns, chunk count.
+    files: dict[str, dict[str, Any]] = field(default_factory=dict)
+
+
 @dataclass
 class RetrievedContext:
     query: str
     chunks: list[KnowledgeChunk]
+    # Ranking score of each chunk, best first; empty when unknown.
+    scores: list[float] = field(default_factory=list)
+
+
+@dataclass
+class PackedContext:
+    text: str
+    tokens: int
+    chunk_ids: list[str]
+    dropped_chunk_ids: list[str] = field(default_factory=list)
+    truncated: bool = False
 
@@ -0,0 +1,194 @@
+from __future__ import annotations
+
+from collections import Counter
+import math
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+import numpy as np
+
+from src.rag.bm25 import chunk_tokens
+
+if TYPE_CHECKING:
+    from src.rag.contracts import KnowledgeChunk
+
+# Latent dimensions kept by the truncated SVD and the vocabulary it is fit on
+# (the most frequent terms; rarer ones are left to BM25).
+DENSE_DIM = 64
+DENSE_MAX_TERMS = 8192
+# Stored entries of the sparse TF-IDF matrix multiplied at a time (bounds the gathered rows).
+_BLOCK_NNZ = 1 << 18
+_POWER_ITERATIONS = 1
+_OVERSAMPLE = 16
+
+VECTORS_SUFFIX = '_dense.npy'
+BASIS_SUFFIX = '_dense_basis.npz'
+
+
+class DenseIndex:
+    """LSA embedding of every chunk: TF-IDF reduced by a truncated SVD.
+
+    `vectors` holds one unit-length float32 row per chunk, `components` maps a
+    TF-IDF term vector into the same space, so a query is embedded by one
+    small product and scored against all chunks by one matrix-vector product.
+    """
+
+    def __init__(self, vocabulary: list[str], idf: np.ndarray, components: np.ndarray, vectors: np.ndarray) -> None:
+        self.vocabulary = vocabulary
+        self.terms = {term: column for column, term in enumerate(vocabulary)}
+        self.idf = np.asarray(idf, dtype=np.float32)
+        self.components = np.asarray(components, dtype=np.float32)
+        self.vectors = vectors
+
+    def __len__(self) -> int:
+        return len(self.vectors)
+
+    @classmethod
+    def build(cls, chunks: list[KnowledgeChunk], dim: int = DENSE_DIM, max_terms: int = DENSE_MAX_TERMS) -> DenseIndex:
+        documents = [Counter(chunk_tokens(chunk)) for chunk in chunks]
+        df: Counter[str] = Counter()
+        for counts in documents:
+            df.update(counts.keys())
+        vocabulary = sorted(term for term, _ in sorted(df.items(), key=lambda item: (-item[1], item[0]))[:max_terms])
+        count = len(documents)
+        idf = np.array([math.log((1 + count) / (1 + df[term])) + 1.0 for term in vocabulary], dtype=np.float32)
+        index = cls(vocabulary, idf, np.zeros((len(vocabulary), 0), dtype=np.float32), np.zeros((count, 0), dtype=np.float32))
+        matrix = index._tfidf(documents)
+        index.components = _truncated_svd(matrix, min(dim, count, len(vocabulary)))
+        index.vectors = index._embed(matrix)
+        return index
+
+    def patch(self, remap: np.ndarray, added: list[KnowledgeChunk]) -> DenseIndex:
+        """New index with rows renumbered through `remap` (-1 drops one) and `added` folded into the existing basis."""
+        kept = np.asarray(self.vectors)[np.flatnonzero(remap >= 0)]
+        folded = self._embed(self._tfidf([Counter(chunk_tokens(chunk)) for chunk in added]))
+        return DenseIndex(self.vocabulary, self.idf, self.components, np.concatenate([kept, folded]))
+
+    def similarities(self, query_tokens: list[str], positions: np.ndarray | None = None) -> np.ndarray:
+        """Cosine similarity of the query to the chunks at `positions` (every chunk when None) in latent space."""
+        rows = self._tfidf([Counter(query_tokens)])
+        query = rows.data @ self.components[rows.indices]
+        norm = float(np.linalg.norm(query))
+        vectors = np.asarray(self.vectors)
+        if positions is not None:
+            vectors = vectors[positions]
+        if norm == 0.0:
+            return np.zeros(len(vectors), dtype=np.float32)
+        return vectors @ (query / norm).astype(np.float32)
+
+    def _tfidf(self, documents: list[Counter[str]]) -> _SparseRows:
+        indptr = [0]
+        indices: list[int] = []
+        counts_tf: list[int] = []
+        terms = self.terms
+        for counts in documents:
+            for term, tf in counts.items():
+                column = terms.get(term)
+                if column is not None:
+                    indices.append(column)
+                    counts_tf.append(tf)
+            indptr.append(len(indices))
+        rows = _SparseRows(
+            np.asarray(indptr, dtype=np.int64),
+            np.asarray(indices, dtype=np.int64),
+            np.asarray(counts_tf, dtype=np.float32),
+            len(self.vocabulary),
+        )
+        # Sublinear tf times idf, each row scaled to unit length.
+        rows.data = (1.0 + np.log(rows.data)) * self.idf[rows.indices]
+        row_ids = np.repeat(np.arange(len(rows)), np.diff(rows.indptr))
+        norms = np.sqrt(np.bincount(row_ids, weights=rows.data**2, minlength=len(rows)))
+        rows.data /= np.where(norms > 0, norms, 1.0)[row_ids].astype(np.float32)
+        return rows
+
+    def _embed(self, rows: _SparseRows) -> np.ndarray:
+        vectors = rows.dot(self.components)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return (vectors / np.where(norms > 0, norms, 1.0)).astype(np.float32)
+
+
+class _SparseRows:
+    # Minimal CSR matrix; products gather right-hand rows for about `_BLOCK_NNZ` entries at a time.
+
+    def __init__(self, indptr: np.ndarray, indices: np.ndarray, data: np.ndarray, columns: int) -> None:
+        self.indptr = indptr
+        self.indices = indices
+        self.data = data
+        self.columns = columns
+
+    def __len__(self) -> int:
+        return len(self.indptr) - 1
+
+    def dot(self, right: np.ndarray) -> np.ndarray:
+        out = np.zeros((len(self), right.shape[1]), dtype=np.float32)
+        # Gathering columns of right.T and reducing along the last axis is much
+        # faster than reducing gathered rows along axis 0.
+        columns = np.ascontiguousarray(right.T, dtype=np.float32)
+        # Row blocks of about _BLOCK_NNZ entries; a longer row forms a block of its own.
+        bounds = np.unique(np.searchsorted(self.indptr, np.arange(0, self.indptr[-1], _BLOCK_NNZ), side='right') - 1)
+        for start, stop in zip(bounds, [*bounds[1:], len(self)]):
+            starts = self.indptr[start:stop]
+            nonempty = np.flatnonzero(np.diff(self.indptr[start : stop + 1]))
+            if not nonempty.size:
+                continue
+            lo, hi = self.indptr[start], self.indptr[stop]
+            gathered = np.take(columns, self.indices[lo:hi], axis=1)
+            gathered *= self.data[lo:hi]
+            # reduceat needs strictly non-empty segments; empty rows stay zero.
+            out[start + nonempty] = np.add.reduceat(gathered, starts[nonempty] - lo, axis=1).T
+        return out
+
+    def transpose(self) -> _SparseRows:
+        order = np.argsort(self.indices, kind='stable')
+        rows = np.repeat(np.arange(len(self)), np.diff(self.indptr))
+        indptr = np.concatenate([[0], np.cumsum(np.bincount(self.indices, minlength=self.columns))])
+        return _SparseRows(indptr, rows[order], self.data[order], len(self))
+
+
+def _truncated_svd(matrix: _SparseRows, dim: int) -> np.ndarray:
+    # Randomized range finder (Halko et al.) with a fixed seed so rebuilds are reproducible.
+    if dim <= 0:
+        return np.zeros((matrix.columns, 0), dtype=np.float32)
+    rng = np.random.default_rng(0)
+    width = min(dim + _OVERSAMPLE, len(matrix), matrix.columns)
+    transposed = matrix.transpose()
+    basis, _ = np.linalg.qr(matrix.dot(rng.standard_normal((matrix.columns, width)).astype(np.float32)))
+    for _ in range(_POWER_ITERATIONS):
+        basis, _ = np.linalg.qr(transposed.dot(basis))
+        basis, _ = np.linalg.qr(matrix.dot(basis))
+    _, _, vt = np.linalg.svd(transposed.dot(basis).T, full_matrices=False)
+    return np.ascontiguousarray(vt[:dim].T, dtype=np.float32)
+
+
+def dense_paths(index_path: Path) -> tuple[Path, Path]:
+    return (
+        index_path.with_name(index_path.stem + VECTORS_SUFFIX),
+        index_path.with_name(index_path.stem + BASIS_SUFFIX),
+    )
+
+
+def save_dense(index_path: Path, dense: DenseIndex) -> None:
+    vectors_path, basis_path = dense_paths(index_path)
+    for path, write in (
+        (vectors_path, lambda fh: np.save(fh, np.asarray(dense.vectors, dtype=np.float32))),
+        (
+            basis_path,
+            lambda fh: np.savez(fh, vocabulary=np.array(dense.vocabulary, dtype=str), idf=dense.idf, components=dense.components),
+        ),
+    ):
+        tmp_path = path.with_name(path.name + '.tmp')
+        with tmp_path.open('wb') as fh:
+            write(fh)
+        tmp_path.replace(path)
+
+
+def load_dense(index_path: Path, rows: int) -> DenseIndex | None:
+    """Memory-map the chunk vectors; None when missing or out of step with the chunk store."""
+    vectors_path, basis_path = dense_paths(index_path)
+    if not vectors_path.exists() or not basis_path.exists():
+        return None
+    vectors = np.load(vectors_path, mmap_mode='r')
+    if vectors.shape[0] != rows:
+        return None
+    with np.load(basis_path) as basis:
+        return DenseIndex([str(term) for term in basis['vocabulary']], basis['idf'], basis['components'], vectors)
@@ -0,0 +1,118 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Iterable
+
+import numpy as np
+
+from src.rag.postings import SUBSET_SHARE, Postings, match_sorted
+
+if TYPE_CHECKING:
+    from src.rag.contracts import KnowledgeChunk
+
+# Soft boost added to a chunk's score per matching facet value.
+SCALAR_FACETS = {
+    'topic': 4.0,
+    'topology': 5.0,
+    'architecture': 5.0,
+    'power_stage_family': 4.0,
+    'control_objective': 4.0,
+    'operating_mode': 3.0,
+    'revision_trigger': 4.0,
+}
+LIST_FACETS = {
+    'plant_features': 2.5,
+    'source_refs': 1.5,
+    'tags': 2.0,
+}
+FACET_BOOSTS = {**SCALAR_FACETS, **LIST_FACETS}
+
+
+class FacetIndex:
+    """Sorted chunk positions per facet value, keyed `name=value` in CSR arrays (`Postings`)."""
+
+    def __init__(self, postings: Postings, count: int) -> None:
+        self.postings = postings
+        self.count = count
+        self._arrays: dict[tuple[str, str], np.ndarray] = {}
+
+    @classmethod
+    def build(cls, chunks: list[KnowledgeChunk]) -> FacetIndex:
+        positions: dict[str, list[int]] = {}
+        for position, chunk in enumerate(chunks):
+            for name in SCALAR_FACETS:
+                value = getattr(chunk, name)
+                if value:
+                    positions.setdefault(_key(name, value), []).append(position)
+            for name in LIST_FACETS:
+                for value in getattr(chunk, name):
+                    positions.setdefault(_key(name, value), []).append(position)
+        return cls(Postings.from_lists(positions), len(chunks))
+
+    def patch(self, remap: np.ndarray, added: list[KnowledgeChunk]) -> FacetIndex:
+        """New index with chunks renumbered through `remap` (-1 drops one) and `added` appended."""
+        count = int((remap >= 0).sum())
+        postings = self.postings.patch(remap, FacetIndex.build(added).postings, count)
+        return FacetIndex(postings, count + len(added))
+
+    @classmethod
+    def from_arrays(cls, arrays: dict[str, np.ndarray], count: int) -> FacetIndex:
+        return cls(Postings.from_arrays(arrays), count)
+
+    def to_arrays(self) -> dict[str, np.ndarray]:
+        return self.postings.to_arrays()
+
+    def positions(self, name: str, value: str) -> np.ndarray:
+        key = (name, value)
+        array = self._arrays.get(key)
+        if array is None:
+            array = self.postings.lookup(_key(name, value)).astype(np.int64)
+            self._arrays[key] = array
+        return array
+
+    def boosts(self, facets: dict[str, Iterable[str]], positions: np.ndarray | None = None) -> np.ndarray:
+        """Summed soft boost of the chunks at sorted `positions` (every chunk when None) for the requested facet values."""
+        subset = positions is not None and positions.size * SUBSET_SHARE < self.count
+        boosts = np.zeros(positions.size if subset else self.count, dtype=np.float64)
+        scattered: np.ndarray | None = None
+        for name, weight in FACET_BOOSTS.items():
+            for value in facets.get(name, ()):
+                matched = self.positions(name, value)
+                if subset and matched.size * SUBSET_SHARE <= positions.size:
+                    boosts[match_sorted(positions, matched)[0]] += weight
+                elif subset:
+                    if scattered is None:
+                        scattered = np.zeros(self.count, dtype=np.float64)
+                    scattered[matched] += weight
+                else:
+                    boosts[matched] += weight
+        if scattered is not None:
+            boosts += scattered[positions]
+        return boosts if subset or positions is None else boosts[positions]
+
+    def matching(self, filters: dict[str, Iterable[str]]) -> np.ndarray:
+        """Sorted positions of chunks carrying one of the given values for every filtered facet."""
+        matched = np.ones(self.count, dtype=bool)
+        for name, values in filters.items():
+            if name not in FACET_BOOSTS:
+                raise ValueError(f'unknown knowledge facet {name!r}; expected one of {sorted(FACET_BOOSTS)}')
+            allowed = np.zeros(self.count, dtype=bool)
+            for value in values:
+                allowed[self.positions(name, value)] = True
+            matched &= allowed
+        return np.flatnonzero(matched)
+
+
+def facet_values(value: object) -> list[str]:
+    """Normalize a facet argument (one value or a list of them) to its indexed form."""
+    raw = value if isinstance(value, (list, tuple, set, frozenset)) else [value]
+    values: list[str] = []
+    for item in raw:
+        text = str(item or '').strip().lower()
+        if text and text not in values:
+            values.append(text)
+    return values
+
+
+def _key(name: str, value: str) -> str:
+    # Facet names hold no '=', so the first one separates name from value.
+    return f'{name}={value}'
@@ -1,65 +1,157 @@
 from __future__ import annotations
 
+import hashlib
 import json
 from pathlib import Path
 
-from src.rag.contracts import KnowledgeChunk
+import numpy as np
+
+from src.rag.bm25 import BM25Index
+from src.rag.chunk_store import append_chunk_store, chunk_store_path, encode_chunk, write_chunk_store
+from src.rag.contracts import KnowledgeChunk, KnowledgeIndex
+from src.rag.dense import DenseIndex
+from src.rag.facets import FacetIndex
 from src.rag.store import save_index
 
 
-def build_index(knowledge_root: Path, index_path: Path) -> list[KnowledgeChunk]:
+def build_index(knowledge_root: Path, index_path: Path) -> KnowledgeIndex:
     chunks: list[KnowledgeChunk] = []
+    files: dict[str, dict[str, object]] = {}
+    for rel_path, path in _knowledge_files(knowledge_root, index_path).items():
+        data = path.read_bytes()
+        file_chunks = _ingest_file(path, rel_path, data)
+        files[rel_path] = _manifest_entry(path, data, len(file_chunks))
+        chunks.extend(file_chunks)
+    store = write_chunk_store(
+        chunk_store_path(index_path),
+        [encode_chunk(chunk) for chunk in chunks],
+        [chunk.source_path for chunk in chunks],
+    )
+    index = KnowledgeIndex(
+        chunks=store,
+        lexical=BM25Index.build(chunks),
+        facets=FacetIndex.build(chunks),
+        files=files,
+        dense=DenseIndex.build(chunks),
+    )
+    save_index(index_path, index)
+    return index
+
+
+def refresh_index(knowledge_root: Path, index_path: Path, index: KnowledgeIndex | None) -> KnowledgeIndex:
+    """Bring a loaded index up to date, re-ingesting only files whose content hash changed.
+
+    Files whose size and mtime match the manifest are not read at all. Chunks of
+    changed or deleted files are dropped from the postings and facets, and
+    chunks of changed or added files are appended; unchanged files are never
+    re-parsed. Appended chunks are folded into the existing LSA basis, which
+    only a full `build_index` refits.
+    """
+    if index is None:
+        return build_index(knowledge_root, index_path)
+
+    files = _knowledge_files(knowledge_root, index_path)
+    manifest = dict(index.files)
+    added: list[KnowledgeChunk] = []
+    stale: set[str] = set(manifest) - set(files)
+    for rel_path in stale:
+        del manifest[rel_path]
+    for rel_path, path in files.items():
+        entry = manifest.get(rel_path)
+        stat = path.stat()
+        if entry and entry['size'] == stat.st_size and entry['mtime_ns'] == stat.st_mtime_ns:
+            continue
+        data = path.read_bytes()
+        digest = hashlib.sha256(data).hexdigest()
+        if entry and entry['sha256'] == digest:
+            # Touched but unchanged: nothing to re-ingest.
+            continue
+        file_chunks = _ingest_file(path, rel_path, data)
+        manifest[rel_path] = _manifest_entry(path, data, len(file_chunks), digest)
+        if entry:
+            stale.add(rel_path)
+        added.extend(file_chunks)
+    if not stale and not added:
+        if index.dense is None:
+            # Index saved without (or with out-of-step) LSA vectors: fit them on the current chunks.
+            index.dense = DenseIndex.build(list(index.chunks))
+            save_index(index_path, index)
+        return index
+
+    keep = np.array([source not in stale for source in index.chunks.source_paths], dtype=bool)
+    remap = np.where(keep, np.cumsum(keep) - 1, -1)
+    store = append_chunk_store(
+        index.chunks,
+        keep,
+        [encode_chunk(chunk) for chunk in added],
+        [chunk.source_path for chunk in added],
+    )
+    patched = KnowledgeIndex(
+        chunks=store,
+        lexical=index.lexical.patch(remap, added),
+        facets=index.facets.patch(remap, added),
+        files=manifest,
+        dense=index.dense.patch(remap, added) if index.dense is not None else DenseIndex.build(list(store)),
+    )
+    save_index(index_path, patched)
+    return patched
+
+
+def _knowledge_files(knowledge_root: Path, index_path: Path) -> dict[str, Path]:
+    files: dict[str, Path] = {}
     for path in sorted(knowledge_root.rglob('*.json')):
         if path.name == index_path.name:
             continue
-        payload = json.loads(path.read_text(encoding='utf-8'))
-        sections = payload.get('sections', [])
-        if not isinstance(sections, list):
-            continue
-        rel_path = str(path.relative_to(knowledge_root))
-        common_tags = _normalize_list(payload.get('tags', []))
-        common_features = _normalize_list(payload.get('plant_features', []))
-        common_source_refs = _normalize_list(payload.get('source_refs', []))
-        for idx, section in enumerate(sections):
-            text = str(section.get('text', '')).strip()
-            if not text:
-                continue
-            metadata = _collect_metadata(payload, section)
-            chunk = KnowledgeChunk(
-                chunk_id=f'{path.stem}:{idx}',
-                source_path=rel_path,
-                title=str(payload.get('title', path.stem)),
-                section=str(section.get('heading', f'section_{idx}')),
-                text=text,
-                topic=str(payload.get('topic', '')).strip().lower(),
-                topology=str(payload.get('topology', '')).strip().lower(),
-                architecture=str(payload.get('architecture', '')).strip().lower(),
-                power_stage_family=_section_value(payload, section, 'power_stage_family'),
-                modulation=_section_value(payload, section, 'modulation'),
-                control_objective=_section_value(payload, section, 'control_objective'),
-                operating_mode=_section_value(payload, section, 'operating_mode'),
-                plant_features=_normalize_list(section.get('plant_features', common_features)),
-                revision_trigger=_section_value(payload, section, 'revision_trigger'),
-                source_refs=_normalize_list(section.get('source_refs', common_source_refs)),
-                confidence=_section_value(payload, section, 'confidence'),
-                tags=_normalize_list(section.get('tags', common_tags)),
-                metadata=metadata,
-            )
-            chunks.append(chunk)
-    save_index(index_path, chunks)
-    return chunks
+        files[str(path.relative_to(knowledge_root))] = path
+    return files
 
 
-def index_is_stale(knowledge_root: Path, index_path: Path) -> bool:
-    if not index_path.exists():
-        return True
-    index_mtime = index_path.stat().st_mtime
-    for path in knowledge_root.rglob('*.json'):
-        if path == index_path:
+def _manifest_entry(path: Path, data: bytes, chunk_count: int, digest: str | None = None) -> dict[str, object]:
+    stat = path.stat()
+    return {
+        'sha256': digest or hashlib.sha256(data).hexdigest(),
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+        'chunks': chunk_count,
+    }
+
+
+def _ingest_file(path: Path, rel_path: str, data: bytes) -> list[KnowledgeChunk]:
+    payload = json.loads(data.decode('utf-8'))
+    sections = payload.get('sections', [])
+    if not isinstance(sections, list):
+        return []
+    common_tags = _normalize_list(payload.get('tags', []))
+    common_features = _normalize_list(payload.get('plant_features', []))
+    common_source_refs = _normalize_list(payload.get('source_refs', []))
+    chunks: list[KnowledgeChunk] = []
+    for idx, section in enumerate(sections):
+        text = str(section.get('text', '')).strip()
+        if not text:
             continue
-        if path.stat().st_mtime > index_mtime:
-            return True
-    return False
+        metadata = _collect_metadata(payload, section)
+        chunk = KnowledgeChunk(
+            chunk_id=f'{path.stem}:{idx}',
+            source_path=rel_path,
+            title=str(payload.get('title', path.stem)),
+            section=str(section.get('heading', f'section_{idx}')),
+            text=text,
+            topic=str(payload.get('topic', '')).strip().lower(),
+            topology=str(payload.get('topology', '')).strip().lower(),
+            architecture=str(payload.get('architecture', '')).strip().lower(),
+            power_stage_family=_section_value(payload, section, 'power_stage_family'),
+            modulation=_section_value(payload, section, 'modulation'),
+            control_objective=_section_value(payload, section, 'control_objective'),
+            operating_mode=_section_value(payload, section, 'operating_mode'),
+            plant_features=_normalize_list(section.get('plant_features', common_features)),
+            revision_trigger=_section_value(payload, section, 'revision_trigger'),
+            source_refs=_normalize_list(section.get('source_refs', common_source_refs)),
+            confidence=_section_value(payload, section, 'confidence'),
+            tags=_normalize_list(section.get('tags', common_tags)),
+            metadata=metadata,
+        )
+        chunks.append(chunk)
+    return chunks
 
 
 def _normalize_list(values: object) -> list[str]:
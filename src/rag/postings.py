@@ -0,0 +1,132 @@
+from __future__ import annotations
+
+from typing import Iterable
+
+import numpy as np
+
+# Position sets smaller than 1/SUBSET_SHARE of the corpus are matched against
+# each posting; larger ones are cheaper to serve by scattering whole postings
+# into a corpus-length array and picking the positions out afterwards.
+SUBSET_SHARE = 8
+
+
+class Postings:
+    """Sorted string keys, each owning a run of sorted chunk positions (CSR layout).
+
+    Key `keys[row]` owns `positions[indptr[row]:indptr[row + 1]]` and, when
+    present, the parallel `values` (term frequencies). Every part is a plain
+    array, so a saved index memory-maps them instead of parsing them, and a key
+    is found by binary search rather than through a dict built at load time.
+    """
+
+    def __init__(
+        self,
+        keys: np.ndarray,
+        indptr: np.ndarray,
+        positions: np.ndarray,
+        values: np.ndarray | None = None,
+    ) -> None:
+        self.keys = keys
+        self.indptr = indptr
+        self.positions = positions
+        self.values = values
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    @classmethod
+    def from_lists(cls, lists: dict[str, list[int]], values: dict[str, list[int]] | None = None) -> Postings:
+        keys = sorted(lists)
+        lengths = [len(lists[key]) for key in keys]
+        return cls(
+            np.array(keys, dtype=str),
+            np.concatenate([[0], np.cumsum(lengths, dtype=np.int64)]).astype(np.int64),
+            _flatten((lists[key] for key in keys), sum(lengths)),
+            _flatten((values[key] for key in keys), sum(lengths)) if values is not None else None,
+        )
+
+    def rows(self, keys: list[str]) -> np.ndarray:
+        """Row of each key, -1 where a key has no postings; one binary search for all of them."""
+        wanted = np.array(keys, dtype=str)
+        if not len(self.keys) or not wanted.size:
+            return np.full(wanted.size, -1, dtype=np.int64)
+        rows = np.searchsorted(self.keys, wanted)
+        found = self.keys[np.minimum(rows, len(self.keys) - 1)] == wanted
+        return np.where(found, rows, -1)
+
+    def span(self, key: str) -> tuple[int, int]:
+        """Entry range of `key`; empty when the key is absent."""
+        row = int(self.rows([key])[0])
+        return (int(self.indptr[row]), int(self.indptr[row + 1])) if row >= 0 else (0, 0)
+
+    def lookup(self, key: str) -> np.ndarray:
+        """Sorted positions of `key`; empty when the key is absent."""
+        lo, hi = self.span(key)
+        return self.positions[lo:hi]
+
+    def counts(self) -> np.ndarray:
+        return np.diff(self.indptr)
+
+    def patch(self, remap: np.ndarray, added: Postings, offset: int) -> Postings:
+        """Postings with positions renumbered through `remap` (-1 drops one) and `added` shifted by `offset` appended.
+
+        Positions stay sorted within each key because `remap` preserves order and
+        every added position lands after the kept ones.
+        """
+        moved = remap[self.positions]
+        keep = moved >= 0
+        keys = np.union1d(self.keys, added.keys)
+        rows = np.concatenate([
+            np.repeat(np.searchsorted(keys, self.keys), self.counts())[keep],
+            np.repeat(np.searchsorted(keys, added.keys), added.counts()),
+        ])
+        # Stable, so a key's kept positions come before its added ones.
+        order = np.argsort(rows, kind='stable')
+        positions = np.concatenate([moved[keep], added.positions.astype(np.int64) + offset])[order]
+        values = None
+        if self.values is not None and added.values is not None:
+            values = np.concatenate([self.values[keep], added.values])[order]
+        counts = np.bincount(rows, minlength=len(keys))
+        live = counts > 0
+        return Postings(
+            keys[live],
+            np.concatenate([[0], np.cumsum(counts[live])]).astype(np.int64),
+            positions.astype(np.int32),
+            None if values is None else values.astype(np.int32),
+        )
+
+    def to_arrays(self) -> dict[str, np.ndarray]:
+        arrays = {'keys': self.keys, 'indptr': self.indptr, 'positions': self.positions}
+        if self.values is not None:
+            arrays['values'] = self.values
+        return arrays
+
+    @classmethod
+    def from_arrays(cls, arrays: dict[str, np.ndarray]) -> Postings:
+        return cls(arrays['keys'], arrays['indptr'], arrays['positions'], arrays.get('values'))
+
+
+def match_sorted(left: np.ndarray, right: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Indices into `left` and into `right` of the values both hold; both sorted and duplicate-free.
+
+    The shorter array is binary-searched in the longer one, so the cost follows
+    the shorter array rather than the corpus size.
+    """
+    if not left.size or not right.size:
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty
+    if left.size > right.size:
+        in_right, in_left = match_sorted(right, left)
+        return in_left, in_right
+    at = np.searchsorted(right, left)
+    found = right[np.minimum(at, right.size - 1)] == left
+    return np.flatnonzero(found), at[found]
+
+
+def _flatten(lists: Iterable[list[int]], size: int) -> np.ndarray:
+    flat = np.empty(size, dtype=np.int32)
+    start = 0
+    for items in lists:
+        flat[start : start + len(items)] = items
+        start += len(items)
+    return flat
@@ -1,26 +1,71 @@
 from __future__ import annotations
 
-from src.rag.contracts import RetrievedContext
+from src.llm.prompting import estimate_tokens
+from src.rag.contracts import KnowledgeChunk, PackedContext, RetrievedContext
 
+# Estimated-token budget for the retrieved-knowledge section of a prompt.
+CONTEXT_TOKEN_BUDGET = 400
 
-def format_retrieved_context(context: RetrievedContext, max_chars: int = 1600) -> str:
+_EMPTY_CONTEXT = 'No retrieved controller-design knowledge.'
+
+
+def format_retrieved_context(context: RetrievedContext, max_tokens: int = CONTEXT_TOKEN_BUDGET) -> str:
+    return pack_retrieved_context(context, max_tokens).text
+
+
+def pack_retrieved_context(context: RetrievedContext, max_tokens: int = CONTEXT_TOKEN_BUDGET) -> PackedContext:
+    """Render retrieved chunks within an estimated-token budget.
+
+    Metadata carried by every packed chunk is stated once in a shared header,
+    and a chunk repeating an earlier chunk's metadata points back to it.
+    While the rendering is over budget the lowest-scoring chunk is dropped; a
+    lone remaining chunk has its text cut to fit instead.
+    """
     if not context.chunks:
-        return 'No retrieved controller-design knowledge.'
+        return PackedContext(text=_EMPTY_CONTEXT, tokens=estimate_tokens(_EMPTY_CONTEXT), chunk_ids=[])
 
-    lines: list[str] = []
-    total = 0
-    for chunk in context.chunks:
-        meta = _format_chunk_metadata(chunk)
-        prefix = f'[{chunk.chunk_id}] {chunk.title} / {chunk.section}{meta}: '
-        remaining = max_chars - total - len(prefix)
-        if remaining <= 0:
-            break
-        text = chunk.text[:remaining].strip()
-        lines.append(f'{prefix}{text}')
-        total += len(prefix) + len(text) + 1
-        if total >= max_chars:
-            break
-    return '\n'.join(lines)
+    scores = context.scores if len(context.scores) == len(context.chunks) else [-float(rank) for rank in range(len(context.chunks))]
+    kept = list(range(len(context.chunks)))
+    dropped: list[str] = []
+    text = _render([context.chunks[rank] for rank in kept])
+    tokens = estimate_tokens(text)
+    while tokens > max_tokens and len(kept) > 1:
+        # Lowest score goes first; among ties, the later-ranked chunk.
+        worst = min(reversed(kept), key=lambda rank: scores[rank])
+        kept.remove(worst)
+        dropped.append(context.chunks[worst].chunk_id)
+        text = _render([context.chunks[rank] for rank in kept])
+        tokens = estimate_tokens(text)
+
+    truncated = False
+    if tokens > max_tokens:
+        chunk = context.chunks[kept[0]]
+        body = ' '.join(chunk.text.split())
+        while tokens > max_tokens and body:
+            body = body[: int(len(body) * max_tokens / tokens * 0.95)]
+            # Cut back to a word boundary when there is one.
+            body = body.rsplit(' ', 1)[0] if ' ' in body else body
+            text = _render([chunk], [body])
+            tokens = estimate_tokens(text)
+        truncated = True
+
+    return PackedContext(
+        text=text,
+        tokens=tokens,
+        chunk_ids=[context.chunks[rank].chunk_id for rank in kept],
+        dropped_chunk_ids=dropped,
+        truncated=truncated,
+    )
+
+
+def context_stats(packed: PackedContext) -> dict[str, object]:
+    """Prompt-size fields recorded with an LLM call that embeds `packed`."""
+    return {
+        'knowledge_tokens_est': packed.tokens,
+        'knowledge_chunks': packed.chunk_ids,
+        'dropped_knowledge_chunks': packed.dropped_chunk_ids,
+        'knowledge_truncated': packed.truncated,
+    }
 
 
 def extract_references(context: RetrievedContext) -> list[str]:
@@ -32,7 +77,25 @@ def extract_references(context: RetrievedContext) -> list[str]:
     return refs
 
 
-def _format_chunk_metadata(chunk) -> str:
+def _render(chunks: list[KnowledgeChunk], bodies: list[str] | None = None) -> str:
+    metadata = [_chunk_metadata(chunk) for chunk in chunks]
+    shared = [item for item in metadata[0] if all(item in fields for fields in metadata[1:])] if len(chunks) > 1 else []
+    lines = [f"shared [{' ; '.join(shared)}]"] if shared else []
+    seen: dict[tuple[str, ...], str] = {}
+    for position, (chunk, fields) in enumerate(zip(chunks, metadata)):
+        own = tuple(item for item in fields if item not in shared)
+        if own in seen:
+            meta = f' [metadata as {seen[own]}]'
+        else:
+            meta = f" [{' ; '.join(own)}]" if own else ''
+            if len(own) > 1:
+                seen[own] = chunk.chunk_id
+        body = bodies[position] if bodies is not None else ' '.join(chunk.text.split())
+        lines.append(f'[{chunk.chunk_id}] {chunk.title} / {chunk.section}{meta}: {body}')
+    return '\n'.join(lines)
+
+
+def _chunk_metadata(chunk: KnowledgeChunk) -> list[str]:
     fields: list[str] = []
     if chunk.topology:
         fields.append(f'topology={chunk.topology}')
@@ -50,7 +113,4 @@ def _format_chunk_metadata(chunk) -> str:
         fields.append(f'features={",".join(chunk.plant_features[:3])}')
     if chunk.source_refs:
         fields.append(f'sources={",".join(chunk.source_refs[:2])}')
-    if not fields:
-        return ''
-    return f" [{' ; '.join(fields)}]"
-
+    return fields
@@ -1,22 +1,48 @@
 from __future__ import annotations
 
-from collections import Counter
+from collections import OrderedDict
 from pathlib import Path
-import re
+import threading
 
-from src.rag.contracts import KnowledgeChunk, RetrievedContext
-from src.rag.indexer import build_index, index_is_stale
+import numpy as np
+
+from src.rag.bm25 import tokenize
+from src.rag.chunk_store import ChunkStore
+from src.rag.contracts import KnowledgeChunk, KnowledgeIndex, RetrievedContext
+from src.rag.facets import facet_values
+from src.rag.indexer import build_index, refresh_index
 from src.rag.store import load_index
 
-_TOKEN_RE = re.compile(r'[a-z0-9_]+')
+# Ranked results kept per knowledge base, keyed by normalized query and filter arguments.
+RETRIEVAL_CACHE_SIZE = 256
+# `lexical` ranks by BM25 only, `dense` by LSA cosine similarity only, `hybrid` by
+# BM25 plus DENSE_WEIGHT * cosine over the union of both candidate sets.
+RETRIEVAL_MODES = ('lexical', 'dense', 'hybrid')
+DENSE_WEIGHT = 5.0
+# Nearest chunks in LSA space that join the candidates of a dense or hybrid query.
+DENSE_CANDIDATES = 64
+
+_REGISTRY: dict[Path, LocalKnowledgeBase] = {}
+_REGISTRY_LOCK = threading.Lock()
+
+
+def shared_knowledge_base(knowledge_root: Path | None = None) -> LocalKnowledgeBase:
+    """Process-wide knowledge base for `knowledge_root`, loaded and cached once for all agents."""
+    kb = LocalKnowledgeBase(knowledge_root)
+    key = kb.knowledge_root.resolve()
+    with _REGISTRY_LOCK:
+        return _REGISTRY.setdefault(key, kb)
 
 
 class LocalKnowledgeBase:
-    def __init__(self, knowledge_root: Path | None = None) -> None:
+    def __init__(self, knowledge_root: Path | None = None, cache_size: int = RETRIEVAL_CACHE_SIZE) -> None:
         root = knowledge_root or Path(__file__).resolve().parents[2] / 'knowledge'
         self.knowledge_root = root
         self.index_path = self.knowledge_root / 'index.json'
-        self._chunks: list[KnowledgeChunk] | None = None
+        self.cache_size = cache_size
+        self._index: KnowledgeIndex | None = None
+        self._cache: OrderedDict[tuple[object, ...], tuple[list[KnowledgeChunk], list[float]]] = OrderedDict()
+        self._lock = threading.RLock()
 
     def retrieve(
         self,
@@ -32,112 +58,145 @@ class LocalKnowledgeBase:
         plant_features: list[str] | None = None,
         source_refs: list[str] | None = None,
         tags: list[str] | None = None,
+        filters: dict[str, str | list[str]] | None = None,
+        mode: str = 'hybrid',
         top_k: int = 3,
     ) -> RetrievedContext:
+        """Rank chunks by BM25 and/or LSA similarity to `query` plus soft metadata boosts.
+
+        `filters` maps facet names (`topic`, `topology`, `tags`, ...) to one value
+        or a list of accepted values; only chunks matching every filtered facet
+        are considered. Results are cached until the index is rebuilt.
+        """
+        if mode not in RETRIEVAL_MODES:
+            raise ValueError(f'unknown retrieval mode {mode!r}; expected one of {RETRIEVAL_MODES}')
         if not self.knowledge_root.exists():
             return RetrievedContext(query=query, chunks=[])
 
-        chunks = self._load_chunks()
-        tag_set = {tag.strip().lower() for tag in (tags or []) if tag.strip()}
-        feature_set = {feature.strip().lower() for feature in (plant_features or []) if feature.strip()}
-        source_ref_set = {ref.strip().lower() for ref in (source_refs or []) if ref.strip()}
-        scored: list[tuple[float, KnowledgeChunk]] = []
-        for chunk in chunks:
-            score = _score_chunk(
-                query=query,
-                chunk=chunk,
-                topic=topic,
-                topology=topology,
-                architecture=architecture,
-                power_stage_family=power_stage_family,
-                control_objective=control_objective,
-                operating_mode=operating_mode,
-                revision_trigger=revision_trigger,
-                plant_features=feature_set,
-                source_refs=source_ref_set,
-                tags=tag_set,
-            )
-            if score > 0:
-                scored.append((score, chunk))
-
-        scored.sort(key=lambda item: item[0], reverse=True)
-        return RetrievedContext(query=query, chunks=[chunk for _, chunk in scored[:top_k]])
-
-    def _load_chunks(self) -> list[KnowledgeChunk]:
-        if self._chunks is None:
-            if index_is_stale(self.knowledge_root, self.index_path):
-                self._chunks = build_index(self.knowledge_root, self.index_path)
-            else:
-                self._chunks = load_index(self.index_path)
-        return self._chunks
-
-
-def _score_chunk(
-    query: str,
-    chunk: KnowledgeChunk,
-    *,
-    topic: str,
-    topology: str,
-    architecture: str,
-    power_stage_family: str,
-    control_objective: str,
-    operating_mode: str,
-    revision_trigger: str,
-    plant_features: set[str],
-    source_refs: set[str],
-    tags: set[str],
-) -> float:
-    query_tokens = _tokenize(query)
-    if not query_tokens:
-        return 0.0
-
-    chunk_tokens = _tokenize(' '.join([
-        chunk.title,
-        chunk.section,
-        chunk.text,
-        chunk.topic,
-        chunk.topology,
-        chunk.architecture,
-        chunk.power_stage_family,
-        chunk.modulation,
-        chunk.control_objective,
-        chunk.operating_mode,
-        chunk.revision_trigger,
-        ' '.join(chunk.plant_features),
-        ' '.join(chunk.source_refs),
-        ' '.join(chunk.tags),
-    ]))
-    counts = Counter(chunk_tokens)
-    score = 0.0
-    for token in query_tokens:
-        score += counts.get(token, 0)
-
-    if topic and chunk.topic == topic.strip().lower():
-        score += 4.0
-    if topology and chunk.topology == topology.strip().lower():
-        score += 5.0
-    if architecture and chunk.architecture == architecture.strip().lower():
-        score += 5.0
-    if power_stage_family and chunk.power_stage_family == power_stage_family.strip().lower():
-        score += 4.0
-    if control_objective and chunk.control_objective == control_objective.strip().lower():
-        score += 4.0
-    if operating_mode and chunk.operating_mode == operating_mode.strip().lower():
-        score += 3.0
-    if revision_trigger and chunk.revision_trigger == revision_trigger.strip().lower():
-        score += 4.0
-    for feature in plant_features:
-        if feature in chunk.plant_features:
-            score += 2.5
-    for source_ref in source_refs:
-        if source_ref in chunk.source_refs:
-            score += 1.5
-    for tag in tags:
-        if tag in chunk.tags:
-            score += 2.0
-    return score
-
-
-def _tokenize(value: str) -> list[str]:
-    return _TOKEN_RE.findall(value.lower())
+        query_tokens = tokenize(query)
+        if not query_tokens:
+            return RetrievedContext(query=query, chunks=[])
 
+        facets = {
+            'topic': facet_values(topic),
+            'topology': facet_values(topology),
+            'architecture': facet_values(architecture),
+            'power_stage_family': facet_values(power_stage_family),
+            'control_objective': facet_values(control_objective),
+            'operating_mode': facet_values(operating_mode),
+            'revision_trigger': facet_values(revision_trigger),
+            'plant_features': facet_values(plant_features or []),
+            'source_refs': facet_values(source_refs or []),
+            'tags': facet_values(tags or []),
+        }
+        hard_filters = {name: facet_values(value) for name, value in (filters or {}).items()}
+        key = (
+            tuple(query_tokens),
+            tuple((name, tuple(values)) for name, values in facets.items()),
+            tuple(sorted((name, tuple(sorted(values))) for name, values in hard_filters.items())),
+            mode,
+            top_k,
+        )
+        with self._lock:
+            index = self._load_index()
+            cached = self._cache.get(key)
+            if cached is not None:
+                self._cache.move_to_end(key)
+                return RetrievedContext(query=query, chunks=list(cached[0]), scores=list(cached[1]))
+
+        chunks, scores = _rank(index, query_tokens, facets, hard_filters, mode, top_k)
+        with self._lock:
+            if self._index is index and self.cache_size > 0:
+                self._cache[key] = (chunks, scores)
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        return RetrievedContext(query=query, chunks=list(chunks), scores=list(scores))
+
+    def refresh(self) -> KnowledgeIndex:
+        """Re-ingest knowledge files changed since the index was loaded; clears cached results if any did."""
+        with self._lock:
+            if self._index is None:
+                return self._load_index()
+            index = refresh_index(self.knowledge_root, self.index_path, self._index)
+            if index is not self._index:
+                self._index = index
+                self._cache.clear()
+            return self._index
+
+    def rebuild(self) -> KnowledgeIndex:
+        """Re-ingest the knowledge tree now and drop every cached result."""
+        with self._lock:
+            self._index = build_index(self.knowledge_root, self.index_path)
+            self._cache.clear()
+            return self._index
+
+    def _load_chunks(self) -> ChunkStore:
+        return self._load_index().chunks
+
+    def _load_index(self) -> KnowledgeIndex:
+        with self._lock:
+            if self._index is None:
+                index = load_index(self.index_path) if self.index_path.exists() else None
+                self._index = refresh_index(self.knowledge_root, self.index_path, index)
+                self._cache.clear()
+            return self._index
+
+
+def _rank(
+    index: KnowledgeIndex,
+    query_tokens: list[str],
+    facets: dict[str, list[str]],
+    filters: dict[str, list[str]],
+    mode: str,
+    top_k: int,
+) -> tuple[list[KnowledgeChunk], list[float]]:
+    # Only chunks holding a distinctive query token (or, with LSA, among the
+    # nearest neighbours) are candidates, and only they are scored; the
+    # metadata boosts refine their ranking. Hard filters apply first, so the
+    # LSA product and the nearest-neighbour cut only see the chunks they admit.
+    allowed = index.facets.matching(filters) if filters else None
+    if allowed is not None and not allowed.size:
+        return [], []
+    admitted = None
+    if allowed is not None:
+        admitted = np.zeros(len(index.chunks), dtype=bool)
+        admitted[allowed] = True
+    lexical = mode != 'dense' or index.dense is None
+    matched = index.lexical.matching(query_tokens) if lexical else np.zeros(len(index.chunks), dtype=bool)
+    if admitted is not None:
+        matched &= admitted
+    if lexical and np.count_nonzero(matched) < top_k:
+        # Too few distinctive matches to fill the results: near-stopwords select too.
+        matched |= index.lexical.matching(query_tokens, min_idf=0.0)
+        if admitted is not None:
+            matched &= admitted
+    similarity = None
+    if mode != 'lexical' and index.dense is not None:
+        similarity = index.dense.similarities(query_tokens, allowed)
+        nearest = _top_positions(similarity, DENSE_CANDIDATES)
+        nearest = nearest[similarity[nearest] > 0]
+        matched[nearest if allowed is None else allowed[nearest]] = True
+    candidates = np.flatnonzero(matched)
+    if not candidates.size:
+        return [], []
+
+    scores = index.lexical.scores(query_tokens, candidates) if lexical else np.zeros(candidates.size)
+    if similarity is not None:
+        rows = candidates if allowed is None else np.searchsorted(allowed, candidates)
+        scores += DENSE_WEIGHT * np.maximum(similarity[rows], 0.0)
+    scores = scores + index.facets.boosts(facets, candidates)
+    top = _top_positions(scores, top_k)
+    return [index.chunks[position] for position in candidates[top]], [float(score) for score in scores[top]]
+
+
+def _top_positions(scores: np.ndarray, count: int) -> np.ndarray:
+    # Positions of the `count` best scores, best first and ties in position order.
+    # argpartition finds the cut-off; only the scores at or above it are sorted.
+    if count <= 0:
+        return np.zeros(0, dtype=np.int64)
+    if scores.size > count:
+        cutoff = np.partition(scores, scores.size - count)[scores.size - count]
+        head = np.flatnonzero(scores >= cutoff)
+    else:
+        head = np.arange(scores.size)
+    return head[np.argsort(-scores[head], kind='stable')[:count]]
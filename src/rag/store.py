@@ -1,19 +1,95 @@
 from __future__ import annotations
 
-from dataclasses import asdict
 import json
 from pathlib import Path
 
-from src.rag.contracts import KnowledgeChunk
+import numpy as np
 
+from src.rag.bm25 import BM25Index
+from src.rag.chunk_store import ChunkStore, chunk_store_path
+from src.rag.contracts import KnowledgeIndex
+from src.rag.dense import load_dense, save_dense
+from src.rag.facets import FacetIndex
 
-def load_index(index_path: Path) -> list[KnowledgeChunk]:
+INDEX_FORMAT = 'acss_knowledge_index_v6'
+# Sections stored as memory-mapped `.npy` arrays next to the index, named `<stem>_<section>_<array>.npy`.
+ARRAY_SECTIONS = ('store', 'lexical', 'facets')
+
+
+def load_index(index_path: Path) -> KnowledgeIndex | None:
+    """Load a saved index; chunk bodies, postings, facets and LSA vectors stay memory-mapped.
+
+    Only the manifest and a few scalars are parsed, so loading does not grow with the corpus. Returns None when the
+    index predates the current format, an array is missing or out of step with the manifest, or its chunk store is
+    missing or not the exact size it was saved at (rewritten line endings, truncation), so it must be rebuilt.
+    """
     payload = json.loads(index_path.read_text(encoding='utf-8'))
-    return [KnowledgeChunk(**item) for item in payload]
+    if not isinstance(payload, dict) or payload.get('format') != INDEX_FORMAT:
+        return None
+    store_path = chunk_store_path(index_path)
+    store = payload['store']
+    if not store_path.exists() or store_path.stat().st_size != int(store['size']):
+        return None
+    arrays: dict[str, dict[str, np.ndarray]] = {section: {} for section in ARRAY_SECTIONS}
+    for name, length in payload['arrays'].items():
+        section, array_name = name.split('_', 1)
+        path = _array_path(index_path, name)
+        if not path.exists():
+            return None
+        # Plain ndarray views of the mapping: memmap slices carry per-call overhead on every lookup.
+        array = np.asarray(np.load(path, mmap_mode='r'))
+        if array.shape[0] != int(length):
+            return None
+        arrays[section][array_name] = array
+    chunks = ChunkStore(store_path, arrays['store']['spans'], store['source_paths'])
+    lexical = payload['lexical']
+    return KnowledgeIndex(
+        chunks=chunks,
+        lexical=BM25Index.from_arrays(arrays['lexical'], k1=float(lexical['k1']), b=float(lexical['b'])),
+        facets=FacetIndex.from_arrays(arrays['facets'], int(payload['facets']['count'])),
+        files=payload['files'],
+        dense=load_dense(index_path, len(chunks)),
+    )
 
 
-def save_index(index_path: Path, chunks: list[KnowledgeChunk]) -> None:
+def save_index(index_path: Path, index: KnowledgeIndex) -> None:
     index_path.parent.mkdir(parents=True, exist_ok=True)
-    payload = [asdict(chunk) for chunk in chunks]
-    index_path.write_text(json.dumps(payload, indent=2), encoding='utf-8')
+    sections = {
+        'store': {'spans': index.chunks.spans},
+        'lexical': index.lexical.to_arrays(),
+        'facets': index.facets.to_arrays(),
+    }
+    lengths: dict[str, int] = {}
+    for section, arrays in sections.items():
+        for array_name, array in arrays.items():
+            name = f'{section}_{array_name}'
+            _save_array(_array_path(index_path, name), np.asarray(array))
+            lengths[name] = len(array)
+    payload = {
+        'format': INDEX_FORMAT,
+        'store': {
+            # Whole file, dead bytes included: chunks are addressed by byte offset.
+            'size': index.chunks.path.stat().st_size,
+            'source_paths': index.chunks.source_paths,
+        },
+        'lexical': {'k1': index.lexical.k1, 'b': index.lexical.b},
+        'facets': {'count': index.facets.count},
+        'arrays': lengths,
+        'files': index.files,
+    }
+    if index.dense is not None:
+        save_dense(index_path, index.dense)
+    # Written last: the manifest only ever describes arrays that are complete on disk.
+    index_path.write_text(json.dumps(payload), encoding='utf-8')
+
+
+def _array_path(index_path: Path, name: str) -> Path:
+    return index_path.with_name(f'{index_path.stem}_{name}.npy')
+
 
+def _save_array(path: Path, array: np.ndarray) -> None:
+    # Replaced atomically, so a reader still mapping the previous file keeps valid data.
+    tmp_path = path.with_name(path.name + '.tmp')
+    with tmp_path.open('wb') as fh:
+        np.save(fh, array)
+    tmp_path.replace(path)
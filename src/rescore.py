@@ -0,0 +1,86 @@
+from __future__ import annotations
+
+import argparse
+import json
+from dataclasses import asdict
+from pathlib import Path
+from typing import Any
+
+from src.agents.evaluation_agent import EvaluationAgent
+from src.contracts import RequirementSpec, SimulationResult, dump_json, load_requirements
+from src.sim.metrics import round_metrics, waveform_metrics
+from src.waveforms import open_waveforms
+
+
+def rescore_run(run_dir: Path, req: RequirementSpec, out_path: Path | None = None) -> dict[str, Any]:
+    """Re-evaluate every stored iteration of a run against `req` without re-simulating.
+
+    Metrics are recomputed from each iteration's first waveform file with the
+    new `vout_target_v` and rounded as a live run reports them; metrics the
+    waveform cannot provide (efficiency without power signals, placeholder
+    metrics of the `synthetic` mode) keep their stored values. Writes `rescore_summary.json` in `run_dir` unless `out_path` is given.
+    """
+    evaluator = EvaluationAgent()
+    iterations: list[dict[str, Any]] = []
+    for summary_path in sorted(run_dir.glob('iter_*/summary.json')):
+        summary = json.loads(summary_path.read_text(encoding='utf-8'))
+        sim = SimulationResult(**summary['simulation'])
+        stored = dict(sim.metrics)
+        notes: list[str] = []
+        waveform = _resolve_waveform(sim.waveform_files, summary_path.parent)
+        if sim.raw.get('mode') == 'synthetic':
+            notes.append('placeholder metrics kept (no plant model for this topology)')
+        elif waveform is None:
+            notes.append('waveform file not found; stored metrics kept')
+        else:
+            try:
+                sim.metrics = round_metrics({**stored, **waveform_metrics(open_waveforms(waveform), req.vout_target_v)})
+                sim.waveform_files = [str(waveform), *sim.waveform_files[1:]]
+            except (OSError, ValueError, TypeError) as e:
+                notes.append(f'waveform unreadable ({e}); stored metrics kept')
+        evaluation = evaluator.evaluate(req, sim)
+        iterations.append(
+            {
+                'iteration': summary.get('iteration'),
+                'metrics': sim.metrics,
+                'stored_metrics': stored,
+                'evaluation': asdict(evaluation),
+                'stored_evaluation': summary.get('evaluation'),
+                'notes': notes,
+            }
+        )
+
+    result = {
+        'run_dir': str(run_dir),
+        'requirements': asdict(req),
+        'iterations': iterations,
+        'passed_iterations': [item['iteration'] for item in iterations if item['evaluation']['passed']],
+    }
+    dump_json(out_path or run_dir / 'rescore_summary.json', result)
+    return result
+
+
+def _resolve_waveform(waveform_files: list[str], iter_dir: Path) -> Path | None:
+    if not waveform_files:
+        return None
+    path = Path(waveform_files[0])
+    if path.exists():
+        return path
+    # Runs moved or opened from another working directory.
+    local = iter_dir / path.name
+    return local if local.exists() else None
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Re-score a stored ACSS run against new requirements')
+    parser.add_argument('--run-dir', type=Path, required=True, help='Run directory containing iter_XX/summary.json')
+    parser.add_argument('--requirements', type=Path, required=True, help='Path to requirements JSON')
+    parser.add_argument('--out', type=Path, default=None, help='Output JSON (default: <run-dir>/rescore_summary.json)')
+    args = parser.parse_args()
+
+    result = rescore_run(args.run_dir, load_requirements(args.requirements), args.out)
+    print(f"Re-scored {len(result['iterations'])} iteration(s); passed: {result['passed_iterations']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,25 @@
+from src.sim.averaged import DCDC_TOPOLOGIES, AveragedBatch, AveragedRun, simulate_dcdc, simulate_dcdc_batch
+from src.sim.inverter import INVERTER_LAWS, InverterRun, resolve_inverter_law, simulate_inverter, simulate_inverter_batch
+from src.sim.metrics import METRIC_KEYS, finalize_metrics, round_metrics, waveform_metrics
+from src.sim.sil import SilBuildError, SilController, build_sil_library, simulate_dcdc_sil
+
+__all__ = [
+    'AveragedBatch',
+    'AveragedRun',
+    'DCDC_TOPOLOGIES',
+    'INVERTER_LAWS',
+    'InverterRun',
+    'METRIC_KEYS',
+    'SilBuildError',
+    'SilController',
+    'build_sil_library',
+    'finalize_metrics',
+    'resolve_inverter_law',
+    'round_metrics',
+    'simulate_dcdc',
+    'simulate_dcdc_batch',
+    'simulate_dcdc_sil',
+    'simulate_inverter',
+    'simulate_inverter_batch',
+    'waveform_metrics',
+]
@@ -0,0 +1,632 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, field, fields
+import math
+from typing import Any, Callable
+
+import numpy as np
+
+from src.contracts import ControlDesign, RequirementSpec, TopologyDesign
+from src.sim.metrics import METRIC_KEYS, RIPPLE_EXTRA_KEY, SETTLING_TOL, finalize_metrics, ripple_tail_start
+
+DCDC_TOPOLOGIES = ('buck', 'boost', 'buck_boost')
+
+# (alpha, beta) select how duty enters the averaged equations:
+#   L diL/dt = (alpha*d + 1 - alpha) * Vin - R_L*iL - (1 - beta*d) * vo
+#   C dvC/dt = (1 - beta*d) * iL - vo / R_load
+_TOPOLOGY_COEFFS = {
+    'buck': (1.0, 0.0),
+    'boost': (0.0, 1.0),
+    'buck_boost': (1.0, 1.0),
+}
+
+MAX_STEPS = 200000
+CHECK_EVERY = 8
+
+
+@dataclass
+class AveragedRun:
+    metrics: dict[str, float]
+    time_s: np.ndarray
+    vout_v: np.ndarray
+    il_a: np.ndarray
+    duty: np.ndarray
+    step_s: float
+    steps: int
+    converged: bool
+    diverged: bool
+    notes: list[str] = field(default_factory=list)
+    ripple_extra_v_pp: float = 0.0
+
+    def waveforms(self) -> dict[str, object]:
+        return {
+            'time_s': self.time_s.tolist(),
+            'vout_v': self.vout_v.tolist(),
+            'il_a': self.il_a.tolist(),
+            'duty': self.duty.tolist(),
+            RIPPLE_EXTRA_KEY: self.ripple_extra_v_pp,
+        }
+
+
+@dataclass
+class AveragedBatch:
+    metrics: dict[str, np.ndarray]
+    converged: np.ndarray
+    diverged: np.ndarray
+    # Integration step and step count of each candidate.
+    step_s: np.ndarray
+    steps: np.ndarray
+    notes: list[str] = field(default_factory=list)
+
+    def rows(self) -> list[dict[str, float]]:
+        keys = list(self.metrics.keys())
+        columns = [self.metrics[key].tolist() for key in keys]
+        return [dict(zip(keys, values)) for values in zip(*columns)]
+
+
+def simulate_dcdc(
+    req: RequirementSpec,
+    topology: TopologyDesign,
+    control: ControlDesign,
+    values: dict[str, float],
+) -> AveragedRun:
+    """Integrate the averaged L/C/R_load plant closed-loop with the wrapper PI law.
+
+    `values` is the parameter map produced by `_resolve_parameter_values`, so the
+    screener sees the same V_source/L/C/R_load/R_L/R_C/Ts/Tstop as Simulink.
+    """
+    plant = pack_dcdc_candidates(req, [(topology, control, values)])
+    result = _integrate_dcdc(plant, horizon_s=float(values['Tstop']), fsw_hz=req.fsw_hz)
+    return AveragedRun(
+        metrics={key: float(column[0]) for key, column in result.metrics.items()},
+        time_s=result.time_s,
+        vout_v=result.vout_v[:, 0],
+        il_a=result.il_a[:, 0],
+        duty=result.duty[:, 0],
+        step_s=result.step_s,
+        steps=result.steps,
+        converged=bool(result.converged[0]),
+        diverged=bool(result.diverged[0]),
+        notes=list(result.notes),
+        ripple_extra_v_pp=float(result.ripple_extra_v_pp[0]),
+    )
+
+
+def simulate_dcdc_batch(
+    req: RequirementSpec,
+    candidates: list[tuple[TopologyDesign, ControlDesign, dict[str, float]]],
+) -> AveragedBatch:
+    """Advance every (topology, control, values) candidate together along axis 0.
+
+    Candidates are grouped by the step and horizon each would be simulated at
+    on its own, so a row matches `simulate_dcdc` for the same design. Only
+    metrics are kept (no waveform recording beyond a single sample), so memory
+    stays O(len(candidates)).
+    """
+    if not candidates:
+        return empty_batch()
+    plant = pack_dcdc_candidates(req, candidates)
+    horizons = [float(values['Tstop']) for _, _, values in candidates]
+    return merge_batches(
+        len(candidates),
+        [
+            (rows, _integrate_dcdc(take_candidates(plant, rows), horizon_s=horizon_s, fsw_hz=req.fsw_hz, max_recorded=2))
+            for rows, horizon_s in group_by_step(plant, horizons, pick_dcdc_step)
+        ],
+    )
+
+
+def group_by_step(
+    plant: Any,
+    horizons: list[float],
+    pick_step: Callable[[Any, float], float],
+) -> list[tuple[list[int], float]]:
+    """Candidate rows sharing the (step, horizon) each would be simulated at alone.
+
+    The wrapper laws are discrete-time in their own sample time, so candidates
+    with different steps must not share one time grid.
+    """
+    groups: dict[tuple[float, float], list[int]] = {}
+    for row, horizon_s in enumerate(horizons):
+        h = pick_step(take_candidates(plant, [row]), horizon_s)
+        groups.setdefault((h, horizon_s), []).append(row)
+    return [(rows, horizon_s) for (_, horizon_s), rows in groups.items()]
+
+
+def take_candidates(plant: Any, rows: list[int]) -> Any:
+    """The same packed-candidate dataclass restricted to `rows`."""
+    index = np.asarray(rows, dtype=np.int64)
+    values = {}
+    for item in fields(plant):
+        value = getattr(plant, item.name)
+        values[item.name] = [value[row] for row in rows] if isinstance(value, list) else value[index]
+    return type(plant)(**values)
+
+
+def merge_batches(count: int, results: list[tuple[list[int], Any]]) -> AveragedBatch:
+    """Scatter per-group integration results back into one batch in input order."""
+    batch = empty_batch(count)
+    for rows, result in results:
+        index = np.asarray(rows, dtype=np.int64)
+        for key, column in result.metrics.items():
+            batch.metrics.setdefault(key, np.zeros(count))[index] = column
+        batch.converged[index] = result.converged
+        batch.diverged[index] = result.diverged
+        batch.step_s[index] = result.step_s
+        batch.steps[index] = result.steps
+        batch.notes.extend(result.notes)
+    return batch
+
+
+def empty_batch(count: int = 0) -> AveragedBatch:
+    return AveragedBatch(
+        metrics={} if count else {key: np.zeros(0) for key in METRIC_KEYS},
+        converged=np.zeros(count, dtype=bool),
+        diverged=np.zeros(count, dtype=bool),
+        step_s=np.zeros(count),
+        steps=np.zeros(count, dtype=np.int64),
+    )
+
+
+def pack_dcdc_candidates(
+    req: RequirementSpec,
+    candidates: list[tuple[TopologyDesign, ControlDesign, dict[str, float]]],
+) -> DcDcArrays:
+    coeffs: list[tuple[float, float]] = []
+    for topology, _, _ in candidates:
+        kind = topology.topology.strip().lower()
+        if kind not in _TOPOLOGY_COEFFS:
+            raise ValueError(f'averaged model does not support topology {topology.topology!r}')
+        coeffs.append(_TOPOLOGY_COEFFS[kind])
+
+    def column(key: str) -> np.ndarray:
+        return np.array([float(values[key]) for _, _, values in candidates])
+
+    return DcDcArrays(
+        alpha=np.array([alpha for alpha, _ in coeffs]),
+        beta=np.array([beta for _, beta in coeffs]),
+        vin=column('V_source'),
+        vref=np.full(len(candidates), req.vout_target_v),
+        l_h=column('L'),
+        c_f=column('C'),
+        r_load=column('R_load'),
+        r_l=column('R_L'),
+        r_c=column('R_C'),
+        kp=np.array([control.kp for _, control, _ in candidates]),
+        ki=np.array([control.ki for _, control, _ in candidates]),
+        sample_time_s=np.array([control.sample_time_s for _, control, _ in candidates]),
+    )
+
+
+@dataclass
+class DcDcArrays:
+    alpha: np.ndarray
+    beta: np.ndarray
+    vin: np.ndarray
+    vref: np.ndarray
+    l_h: np.ndarray
+    c_f: np.ndarray
+    r_load: np.ndarray
+    r_l: np.ndarray
+    r_c: np.ndarray
+    kp: np.ndarray
+    ki: np.ndarray
+    sample_time_s: np.ndarray
+
+
+@dataclass
+class _DcDcResult:
+    metrics: dict[str, np.ndarray]
+    time_s: np.ndarray
+    vout_v: np.ndarray
+    il_a: np.ndarray
+    duty: np.ndarray
+    step_s: float
+    steps: int
+    converged: np.ndarray
+    diverged: np.ndarray
+    notes: list[str]
+    ripple_extra_v_pp: np.ndarray
+
+
+class DcDcPlantStep:
+    """Trapezoidal step of the averaged plant with the duty held over `h`."""
+
+    def __init__(self, plant: DcDcArrays, h: float) -> None:
+        self.plant = plant
+        self.h = h
+        self.half = 0.5 * h
+        self.kappa = plant.r_load / (plant.r_load + plant.r_c)
+        self.kappa_rc = self.kappa * plant.r_c
+        self.inv_l = 1.0 / plant.l_h
+        self.inv_c = 1.0 / plant.c_f
+        self.vin_l = plant.vin * self.inv_l
+        self.one_minus_alpha = 1.0 - plant.alpha
+        self.m22 = 1.0 + self.half * self.kappa / (plant.r_load * plant.c_f)
+        self.p22 = 2.0 - self.m22
+
+    def coupling(self, duty: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        # m scales the output-side coupling, u the input-side drive.
+        return 1.0 - self.plant.beta * duty, self.plant.alpha * duty + self.one_minus_alpha
+
+    def output(self, il: np.ndarray, vc: np.ndarray, m: np.ndarray) -> np.ndarray:
+        return self.kappa * vc + self.kappa_rc * m * il
+
+    def step(
+        self,
+        il: np.ndarray,
+        vc: np.ndarray,
+        m: np.ndarray,
+        u: np.ndarray,
+    ) -> tuple[np.ndarray, np.ndarray]:
+        half = self.half
+        a11 = -(self.plant.r_l + m * m * self.kappa_rc) * self.inv_l
+        a12 = -m * self.kappa * self.inv_l
+        a21 = m * self.kappa * self.inv_c
+        r1 = il + half * (a11 * il + a12 * vc) + self.h * u * self.vin_l
+        r2 = half * a21 * il + self.p22 * vc
+        m11 = 1.0 - half * a11
+        m12 = -half * a12
+        m21 = -half * a21
+        det = m11 * self.m22 - m12 * m21
+        return (self.m22 * r1 - m12 * r2) / det, (m11 * r2 - m21 * r1) / det
+
+
+def pick_dcdc_step(plant: DcDcArrays, horizon_s: float) -> float:
+    # The wrapper PI is a discrete-time law, so the loop runs at the controller
+    # sample time; only very fine sampling relative to the LC resonance and the
+    # R_load*C pole is coarsened, and long horizons are capped at MAX_STEPS.
+    t_res = 2.0 * math.pi * float(np.min(np.sqrt(plant.l_h * plant.c_f)))
+    tau_rc = float(np.min(plant.r_load * plant.c_f))
+    ts = float(np.min(plant.sample_time_s))
+    target = max(min(t_res / 200.0, tau_rc / 20.0), horizon_s / MAX_STEPS)
+    if ts <= 0.0:
+        return target
+    return ts * max(1, math.floor(target / ts))
+
+
+def _integrate_dcdc(
+    plant: DcDcArrays,
+    horizon_s: float,
+    fsw_hz: float,
+    max_recorded: int | None = None,
+) -> _DcDcResult:
+    n = plant.vin.shape[0]
+    if n == 1:
+        return _integrate_dcdc_single(plant, horizon_s, fsw_hz, max_recorded)
+    h = pick_dcdc_step(plant, horizon_s)
+    steps = max(1, math.ceil(horizon_s / h))
+    stride, record_count = _record_layout(steps, max_recorded)
+    stepper = DcDcPlantStep(plant, h)
+    band, quiet_err, quiet_dv, blowup, quiet_needed = _settle_limits(plant, h)
+    tail_step = ripple_tail_start(steps + 1)
+
+    il = np.zeros(n)
+    vc = np.zeros(n)
+    integ = np.zeros(n)
+    duty = np.zeros(n)
+    m = np.ones(n)
+
+    peak = np.full(n, -np.inf)
+    last_outside = np.zeros(n)
+    tail_min = np.full(n, np.inf)
+    tail_max = np.full(n, -np.inf)
+    p_in_sum = np.zeros(n)
+    p_out_sum = np.zeros(n)
+    quiet = np.zeros(n, dtype=np.int64)
+    diverged = np.zeros(n, dtype=bool)
+    vc_checked = np.zeros(n)
+    # Candidates at their equilibrium (or blown up) keep their results as of
+    # that moment, so a row never depends on the rest of the batch.
+    frozen = np.zeros(n, dtype=bool)
+    frozen_row = np.full(n, record_count)
+    final: dict[str, np.ndarray] = {}
+    early_stop_s = None
+
+    rec_vo = np.empty((record_count, n))
+    rec_il = np.empty((record_count, n))
+    rec_duty = np.empty((record_count, n))
+
+    k = 0
+    while True:
+        vo = stepper.output(il, vc, m)
+        # Mirrors the generated wrapper: integrate first, then the PI output, clamp to [0, 1].
+        err = plant.vref - vo
+        integ += err * h
+        duty = np.minimum(np.maximum(plant.kp * err + plant.ki * integ, 0.0), 1.0)
+        m, u = stepper.coupling(duty)
+
+        np.maximum(peak, vo, out=peak)
+        outside = np.abs(err) > band
+        if outside.any():
+            last_outside[outside] = k * h
+        if k >= tail_step:
+            np.minimum(tail_min, vo, out=tail_min)
+            np.maximum(tail_max, vo, out=tail_max)
+        if k % stride == 0:
+            row = k // stride
+            rec_vo[row] = vo
+            rec_il[row] = il
+            rec_duty[row] = duty
+        if k >= steps:
+            break
+
+        p_in_sum += np.abs(plant.vin * u * il)
+        p_out_sum += vo * vo / plant.r_load
+
+        il, vc = stepper.step(il, vc, m, u)
+        k += 1
+        if k % CHECK_EVERY:
+            continue
+
+        # Convergence/divergence bookkeeping runs on every CHECK_EVERY-th step only.
+        settled_now = (np.abs(vc - vc_checked) < quiet_dv) & (np.abs(err) < quiet_err)
+        quiet = np.where(settled_now, quiet + CHECK_EVERY, 0)
+        vc_checked = vc.copy()
+        if not np.all(np.abs(vc) < blowup):
+            # NaN/inf or runaway voltage: freeze those candidates at a finite state.
+            bad = ~(np.abs(vc) < blowup)
+            diverged |= bad
+            il[bad] = 0.0
+            vc[bad] = np.clip(np.nan_to_num(vc[bad]), -blowup[bad], blowup[bad])
+            integ[bad] = 0.0
+        newly = (diverged | (quiet >= quiet_needed)) & ~frozen
+        if newly.any():
+            settled = _settled_books(stepper, il, vc, m, u, steps - k, peak, tail_min, tail_max, p_in_sum, p_out_sum)
+            live = {**settled, 'last_outside': last_outside, 'quiet': quiet, 'diverged': diverged, 'il': il, 'duty': duty}
+            for name, value in live.items():
+                final.setdefault(name, value.copy())[newly] = value[newly]
+            frozen |= newly
+            frozen_row[newly] = -(-k // stride)
+            if frozen.all():
+                early_stop_s = k * h
+                break
+
+    books = {
+        'peak': peak,
+        'last_outside': last_outside,
+        'tail_min': tail_min,
+        'tail_max': tail_max,
+        'p_in_sum': p_in_sum,
+        'p_out_sum': p_out_sum,
+        'quiet': quiet,
+        'diverged': diverged,
+        'vo': vo,
+        'il': il,
+        'duty': duty,
+    }
+    if frozen.any():
+        books = {name: np.where(frozen, final[name], value) for name, value in books.items()}
+        after = np.arange(record_count)[:, None] >= frozen_row[None, :]
+        rec_vo = np.where(after, books['vo'], rec_vo)
+        rec_il = np.where(after, books['il'], rec_il)
+        rec_duty = np.where(after, books['duty'], rec_duty)
+
+    return _dcdc_result(
+        plant, books, quiet_needed, horizon_s, fsw_hz, h, steps, stride, (rec_vo, rec_il, rec_duty), early_stop_s
+    )
+
+
+def _integrate_dcdc_single(
+    plant: DcDcArrays,
+    horizon_s: float,
+    fsw_hz: float,
+    max_recorded: int | None,
+) -> _DcDcResult:
+    # `_integrate_dcdc` for one candidate: the stepper runs on a plant of Python
+    # floats, because NumPy's per-call overhead on 1-element arrays dominates a
+    # single run. Same operations in the same order, so results are bit-identical.
+    h = pick_dcdc_step(plant, horizon_s)
+    steps = max(1, math.ceil(horizon_s / h))
+    stride, record_count = _record_layout(steps, max_recorded)
+    scalar = DcDcArrays(**{item.name: float(getattr(plant, item.name)[0]) for item in fields(plant)})
+    stepper = DcDcPlantStep(scalar, h)
+    band, quiet_err, quiet_dv, blowup, quiet_needed = (float(value[0]) for value in _settle_limits(plant, h))
+    tail_step = ripple_tail_start(steps + 1)
+    vref, vin, r_load, kp, ki = scalar.vref, scalar.vin, scalar.r_load, scalar.kp, scalar.ki
+
+    il = vc = integ = duty = 0.0
+    m = 1.0
+    peak = -math.inf
+    last_outside = 0.0
+    tail_min = math.inf
+    tail_max = -math.inf
+    p_in_sum = p_out_sum = 0.0
+    quiet = 0
+    diverged = False
+    vc_checked = 0.0
+    early_stop_s = None
+
+    rec_vo = np.empty((record_count, 1))
+    rec_il = np.empty((record_count, 1))
+    rec_duty = np.empty((record_count, 1))
+
+    k = 0
+    while True:
+        vo = stepper.output(il, vc, m)
+        err = vref - vo
+        integ += err * h
+        duty = min(max(kp * err + ki * integ, 0.0), 1.0)
+        m, u = stepper.coupling(duty)
+
+        peak = max(peak, vo)
+        if abs(err) > band:
+            last_outside = k * h
+        if k >= tail_step:
+            tail_min = min(tail_min, vo)
+            tail_max = max(tail_max, vo)
+        if k % stride == 0:
+            row = k // stride
+            rec_vo[row, 0] = vo
+            rec_il[row, 0] = il
+            rec_duty[row, 0] = duty
+        if k >= steps:
+            break
+
+        p_in_sum += abs(vin * u * il)
+        p_out_sum += vo * vo / r_load
+
+        il, vc = stepper.step(il, vc, m, u)
+        k += 1
+        if k % CHECK_EVERY:
+            continue
+
+        quiet = quiet + CHECK_EVERY if abs(vc - vc_checked) < quiet_dv and abs(err) < quiet_err else 0
+        vc_checked = vc
+        if not abs(vc) < blowup:
+            diverged = True
+            il = 0.0
+            vc = min(max(float(np.nan_to_num(vc)), -blowup), blowup)
+            integ = 0.0
+        if diverged or quiet >= quiet_needed:
+            settled = _settled_books(stepper, il, vc, m, u, steps - k, peak, tail_min, tail_max, p_in_sum, p_out_sum)
+            vo, peak, tail_min, tail_max = settled['vo'], settled['peak'], settled['tail_min'], settled['tail_max']
+            p_in_sum, p_out_sum = settled['p_in_sum'], settled['p_out_sum']
+            row = -(-k // stride)
+            rec_vo[row:] = vo
+            rec_il[row:] = il
+            rec_duty[row:] = duty
+            early_stop_s = k * h
+            break
+
+    books = {
+        'peak': peak,
+        'last_outside': last_outside,
+        'tail_min': tail_min,
+        'tail_max': tail_max,
+        'p_in_sum': p_in_sum,
+        'p_out_sum': p_out_sum,
+        'quiet': quiet,
+        'diverged': diverged,
+        'vo': vo,
+        'il': il,
+        'duty': duty,
+    }
+    return _dcdc_result(
+        plant,
+        {name: np.array([value]) for name, value in books.items()},
+        np.array([quiet_needed]),
+        horizon_s,
+        fsw_hz,
+        h,
+        steps,
+        stride,
+        (rec_vo, rec_il, rec_duty),
+        early_stop_s,
+    )
+
+
+def _record_layout(steps: int, max_recorded: int | None) -> tuple[int, int]:
+    # Every solver step is recorded unless `max_recorded` caps the samples kept.
+    stride = max(1, math.ceil(steps / (max_recorded - 1))) if max_recorded else 1
+    return stride, steps // stride + 1
+
+
+def _settle_limits(plant: DcDcArrays, h: float) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """Settling band, quiet error and drift bounds, blow-up bound and quiet steps needed, per candidate."""
+    abs_ref = np.maximum(np.abs(plant.vref), 1e-9)
+    band = abs_ref * SETTLING_TOL
+    # "Quiet" = inside a tenth of the settling band with no visible ringing; the
+    # remaining integrator drift can then no longer leave the band.
+    quiet_err = 0.1 * band
+    quiet_dv = 0.01 * CHECK_EVERY * band
+    blowup = 10.0 * np.maximum(abs_ref, np.abs(plant.vin))
+    t_res = 2.0 * np.pi * np.sqrt(plant.l_h * plant.c_f)
+    quiet_needed = np.maximum(20, (4.0 * t_res / h).astype(np.int64))
+    return band, quiet_err, quiet_dv, blowup, quiet_needed
+
+
+def _settled_books(
+    stepper: DcDcPlantStep,
+    il: Any,
+    vc: Any,
+    m: Any,
+    u: Any,
+    remaining: int,
+    peak: Any,
+    tail_min: Any,
+    tail_max: Any,
+    p_in_sum: Any,
+    p_out_sum: Any,
+) -> dict[str, Any]:
+    # A candidate at its equilibrium (or blown up) stays constant for the rest of
+    # the horizon, so its running reductions are closed analytically. Works on
+    # arrays and on the single path's floats alike.
+    plant = stepper.plant
+    vo = stepper.output(il, vc, m)
+    return {
+        'peak': np.maximum(peak, vo),
+        'tail_min': np.minimum(tail_min, vo),
+        'tail_max': np.maximum(tail_max, vo),
+        'p_in_sum': p_in_sum + np.abs(plant.vin * u * il) * remaining,
+        'p_out_sum': p_out_sum + vo * vo / plant.r_load * remaining,
+        'vo': vo,
+    }
+
+
+def _dcdc_result(
+    plant: DcDcArrays,
+    books: dict[str, np.ndarray],
+    quiet_needed: np.ndarray,
+    horizon_s: float,
+    fsw_hz: float,
+    h: float,
+    steps: int,
+    stride: int,
+    recorded: tuple[np.ndarray, np.ndarray, np.ndarray],
+    early_stop_s: float | None,
+) -> _DcDcResult:
+    diverged = books['diverged']
+    converged = (books['quiet'] >= quiet_needed) & ~diverged
+    switching_pp = dcdc_switching_ripple_pp(plant, books['duty'], books['il'], books['vo'], fsw_hz)
+    notes: list[str] = []
+    if early_stop_s is not None:
+        notes.append(f'early_stop_at_s={early_stop_s:.6g}')
+    if np.any(diverged):
+        notes.append(f'diverged_candidates={int(np.count_nonzero(diverged))}')
+    rec_vo, rec_il, rec_duty = recorded
+    return _DcDcResult(
+        metrics=finalize_metrics(
+            plant.vref,
+            books['peak'],
+            books['last_outside'],
+            books['tail_min'],
+            books['tail_max'],
+            books['p_in_sum'],
+            books['p_out_sum'],
+            diverged,
+            horizon_s,
+            switching_pp,
+        ),
+        time_s=np.arange(rec_vo.shape[0]) * (stride * h),
+        vout_v=rec_vo,
+        il_a=rec_il,
+        duty=rec_duty,
+        step_s=h,
+        steps=steps,
+        converged=converged,
+        diverged=diverged,
+        notes=notes,
+        ripple_extra_v_pp=switching_pp,
+    )
+
+
+def dcdc_switching_ripple_pp(
+    plant: DcDcArrays,
+    duty: np.ndarray,
+    il: np.ndarray,
+    vo: np.ndarray,
+    fsw_hz: float,
+) -> np.ndarray:
+    # The averaged model carries no switching ripple, so add the textbook CCM
+    # estimate at the final operating point (Erickson & Maksimovic, ch. 2).
+    fsw = max(fsw_hz, 1.0)
+    d = np.clip(duty, 0.0, 1.0)
+    delta_il = np.abs(plant.vin - (1.0 - plant.beta) * vo) * d / (plant.l_h * fsw)
+    i_out = np.abs(vo) / plant.r_load
+    cap_triangular = delta_il / (8.0 * plant.c_f * fsw)
+    cap_pulsed = i_out * d / (plant.c_f * fsw)
+    esr_triangular = plant.r_c * delta_il
+    esr_pulsed = plant.r_c * (np.abs(il) + 0.5 * delta_il)
+    pulsed = plant.beta > 0.0
+    return np.where(pulsed, cap_pulsed + esr_pulsed, cap_triangular + esr_triangular)
@@ -0,0 +1,131 @@
+from __future__ import annotations
+
+import math
+from collections.abc import Mapping
+from typing import Any
+
+import numpy as np
+
+METRIC_KEYS = ('overshoot_pct', 'settling_time_ms', 'ripple_v_pp', 'efficiency_pct')
+SETTLING_TOL = 0.02
+RIPPLE_TAIL_FRACTION = 0.8
+# Optional scalar in a waveform bundle: ripple the recorded trace cannot show,
+# such as the averaged models' analytic PWM ripple.
+RIPPLE_EXTRA_KEY = 'ripple_extra_v_pp'
+
+_MIN_RIPPLE_SAMPLES = 5
+# Decimal places each metric is reported with.
+_METRIC_DECIMALS = {'overshoot_pct': 3, 'settling_time_ms': 3, 'ripple_v_pp': 4, 'efficiency_pct': 3}
+
+
+def finalize_metrics(
+    vref: np.ndarray | float,
+    peak: np.ndarray | float,
+    last_outside_s: np.ndarray | float,
+    tail_min: np.ndarray | float,
+    tail_max: np.ndarray | float,
+    p_in: np.ndarray | float,
+    p_out: np.ndarray | float,
+    diverged: np.ndarray | bool = False,
+    horizon_s: float = 0.0,
+    ripple_extra_pp: np.ndarray | float = 0.0,
+) -> dict[str, np.ndarray]:
+    """Turn running reductions of an output-voltage trace into the four metrics.
+
+    Every argument broadcasts, so the same definitions serve one waveform or a
+    batch of candidates integrated side by side. `p_in`/`p_out` may be sums or
+    means over the same samples; only their ratio is used.
+    """
+    vref = np.asarray(vref, dtype=float)
+    abs_ref = np.maximum(np.abs(vref), 1e-9)
+    spread = np.asarray(tail_max, dtype=float) - np.asarray(tail_min, dtype=float)
+    p_in = np.asarray(p_in, dtype=float)
+    return {
+        'overshoot_pct': np.maximum(0.0, (np.asarray(peak, dtype=float) - vref) / abs_ref * 100.0),
+        'settling_time_ms': np.where(diverged, horizon_s, last_outside_s) * 1000.0,
+        'ripple_v_pp': np.where(np.isfinite(spread), spread, 0.0) + ripple_extra_pp,
+        'efficiency_pct': np.where(
+            p_in > 1e-12,
+            100.0 * np.clip(np.asarray(p_out, dtype=float) / np.maximum(p_in, 1e-12), 0.0, 1.0),
+            0.0,
+        ),
+    }
+
+
+def ripple_tail_start(samples: int, tail_fraction: float = RIPPLE_TAIL_FRACTION) -> int:
+    """Index of the first sample in the ripple window of a `samples`-long trace."""
+    return min(samples - 1, math.floor(tail_fraction * samples))
+
+
+def round_metrics(metrics: Mapping[str, Any]) -> dict[str, float]:
+    """Metrics as reported: plain floats rounded per metric; unknown keys pass through unrounded."""
+    return {
+        key: round(float(value), _METRIC_DECIMALS[key]) if key in _METRIC_DECIMALS else float(value)
+        for key, value in metrics.items()
+    }
+
+
+def waveform_metrics(
+    waveforms: Mapping[str, Any],
+    vref: float,
+    settling_tol: float = SETTLING_TOL,
+    tail_fraction: float = RIPPLE_TAIL_FRACTION,
+) -> dict[str, float]:
+    """Compute metrics from a stored waveform bundle (`time_s`, `vout_v`, ...).
+
+    Efficiency needs power signals: `p_in_w`/`p_out_w`, or `vin_v`*`iin_a` and
+    `vout_v`*`iout_a`. Without them `efficiency_pct` is left out of the result,
+    so callers can keep a value measured elsewhere.
+    """
+    time_s = np.asarray(waveforms.get('time_s', []), dtype=float).reshape(-1)
+    vout = _output_trace(waveforms.get('vout_v', []))
+    n = min(time_s.size, vout.size)
+    if n == 0:
+        raise ValueError('waveform bundle has no time_s/vout_v samples')
+    time_s = time_s[:n]
+    vout = vout[:n]
+
+    outside = np.flatnonzero(np.abs(vout - vref) > max(abs(vref), 1e-9) * settling_tol)
+    tail = vout[ripple_tail_start(n, tail_fraction):] if n >= _MIN_RIPPLE_SAMPLES else vout[:1]
+    p_in, p_out = _power_traces(waveforms, vout, n)
+    metrics = finalize_metrics(
+        vref,
+        vout.max(),
+        time_s[outside[-1]] if outside.size else 0.0,
+        tail.min(),
+        tail.max(),
+        p_in.mean() if p_in is not None else 0.0,
+        p_out.mean() if p_out is not None else 0.0,
+        ripple_extra_pp=float(waveforms.get(RIPPLE_EXTRA_KEY) or 0.0),
+    )
+    result = {key: float(value) for key, value in metrics.items()}
+    if p_in is None or p_out is None:
+        del result['efficiency_pct']
+    return result
+
+
+def _output_trace(values: Any) -> np.ndarray:
+    trace = np.asarray(values, dtype=float)
+    if trace.ndim > 1:
+        # Multi-phase outputs are scored on their per-sample RMS, as the MATLAB runner did.
+        trace = np.sqrt(np.mean(trace * trace, axis=1))
+    return trace.reshape(-1)
+
+
+def _power_traces(waveforms: Mapping[str, Any], vout: np.ndarray, n: int) -> tuple[np.ndarray | None, np.ndarray | None]:
+    def column(key: str) -> np.ndarray | None:
+        values = waveforms.get(key)
+        if values is None:
+            return None
+        trace = np.asarray(values, dtype=float).reshape(-1)
+        return trace[:n] if trace.size >= n else None
+
+    p_in = column('p_in_w')
+    if p_in is None:
+        vin, iin = column('vin_v'), column('iin_a')
+        p_in = vin * iin if vin is not None and iin is not None else None
+    p_out = column('p_out_w')
+    if p_out is None:
+        iout = column('iout_a')
+        p_out = vout * iout if iout is not None else None
+    return (np.abs(p_in) if p_in is not None else None, np.abs(p_out) if p_out is not None else None)
@@ -0,0 +1,312 @@
+from __future__ import annotations
+
+import ctypes
+import hashlib
+import math
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+from src.contracts import ControlDesign, RequirementSpec, TopologyDesign
+from src.sim.averaged import (
+    CHECK_EVERY,
+    DCDC_TOPOLOGIES,
+    AveragedRun,
+    DcDcPlantStep,
+    dcdc_switching_ripple_pp,
+    pack_dcdc_candidates,
+    pick_dcdc_step,
+)
+from src.sim.metrics import SETTLING_TOL, finalize_metrics, ripple_tail_start
+
+# Just enough of MATLAB's simstruc.h for the generated S-Function Builder wrapper.
+SIMSTRUC_STUB = (
+    "#ifndef ACSS_SIL_SIMSTRUC_H\n"
+    "#define ACSS_SIL_SIMSTRUC_H\n"
+    "typedef double real_T;\n"
+    "typedef int int_T;\n"
+    "typedef unsigned int uint_T;\n"
+    "typedef unsigned char boolean_T;\n"
+    "#endif\n"
+)
+
+_COMPILE_FLAGS = ('-O2', '-shared', '-fPIC')
+_DOUBLE_P = ctypes.POINTER(ctypes.c_double)
+
+
+class SilBuildError(RuntimeError):
+    pass
+
+
+def find_c_compiler() -> str | None:
+    for candidate in (os.getenv('CC', '').strip(), 'cc', 'gcc', 'clang'):
+        if candidate:
+            found = shutil.which(candidate)
+            if found:
+                return found
+    return None
+
+
+def default_cache_dir() -> Path:
+    override = os.getenv('ACSS_SIL_CACHE', '').strip()
+    if override:
+        return Path(override)
+    return Path(tempfile.gettempdir()) / 'acss_sil_cache'
+
+
+def build_sil_library(source: str, sfun_name: str, cache_dir: Path | None = None) -> Path:
+    """Compile wrapper C source into a shared library, reusing builds by content hash."""
+    compiler = find_c_compiler()
+    if compiler is None:
+        raise SilBuildError('no C compiler found (set CC or install cc/gcc/clang)')
+
+    digest = hashlib.sha256(
+        '\0'.join([source, SIMSTRUC_STUB, compiler, *_COMPILE_FLAGS, sys.platform]).encode('utf-8')
+    ).hexdigest()[:24]
+    build_dir = (cache_dir or default_cache_dir()) / digest
+    library = build_dir / f'lib{sfun_name}{_shared_suffix()}'
+    if library.exists():
+        return library
+
+    build_dir.mkdir(parents=True, exist_ok=True)
+    (build_dir / 'simstruc.h').write_text(SIMSTRUC_STUB, encoding='utf-8')
+    source_path = build_dir / f'{sfun_name}_wrapper.c'
+    source_path.write_text(source, encoding='utf-8')
+    # Build next to the final name, then rename, so concurrent runs never load a partial file.
+    partial = build_dir / f'{library.name}.{os.getpid()}.tmp'
+    cmd = [compiler, *_COMPILE_FLAGS, '-I', str(build_dir), str(source_path), '-o', str(partial), '-lm']
+    completed = subprocess.run(cmd, capture_output=True, text=True)
+    (build_dir / 'build.log').write_text((completed.stdout or '') + (completed.stderr or ''), encoding='utf-8')
+    if completed.returncode != 0 or not partial.exists():
+        raise SilBuildError(f'SIL compile failed ({completed.returncode}): {completed.stderr.strip()[:400]}')
+    os.replace(partial, library)
+    return library
+
+
+class SilController:
+    """ctypes handle on one compiled wrapper.
+
+    The library is loaded from a private copy so static controller state
+    (integrators, oscillator phases) is never shared between instances.
+    A wrapper built for Fast Restart takes its gains as an S-Function
+    parameter; pass them as `params` and they ride along on every call.
+    """
+
+    def __init__(
+        self,
+        library: Path,
+        sfun_name: str,
+        input_width: int,
+        output_width: int,
+        params: list[float] | None = None,
+    ) -> None:
+        self.input_width = max(1, int(input_width))
+        self.output_width = max(1, int(output_width))
+        self._tmp_dir = Path(tempfile.mkdtemp(prefix='acss_sil_'))
+        private_copy = self._tmp_dir / library.name
+        shutil.copy2(library, private_copy)
+        self._lib = ctypes.CDLL(str(private_copy))
+        self._start = getattr(self._lib, f'{sfun_name}_Start_wrapper')
+        self._outputs = getattr(self._lib, f'{sfun_name}_Outputs_wrapper')
+        self._terminate = getattr(self._lib, f'{sfun_name}_Terminate_wrapper')
+        self._start.restype = None
+        self._terminate.restype = None
+        self._outputs.restype = None
+        param_types = [_DOUBLE_P, ctypes.c_int] if params is not None else []
+        self._params = (ctypes.c_double * max(1, len(params or ())))(*(params or ()))
+        self._param_args = (self._params, len(params)) if params is not None else ()
+        self._outputs.argtypes = [_DOUBLE_P, _DOUBLE_P, *param_types]
+        # Wrappers generated before the block entry point existed still work, one call per sample.
+        self._block = getattr(self._lib, f'{sfun_name}_Outputs_block', None)
+        if self._block is not None:
+            self._block.restype = None
+            self._block.argtypes = [_DOUBLE_P, _DOUBLE_P, ctypes.c_int, *param_types]
+        self.u = (ctypes.c_double * self.input_width)()
+        self.y = (ctypes.c_double * self.output_width)()
+
+    @property
+    def has_block(self) -> bool:
+        return self._block is not None
+
+    def start(self) -> None:
+        self._start()
+
+    def step(self) -> None:
+        """Run one sample: reads `self.u`, writes `self.y`."""
+        self._outputs(self.u, self.y, *self._param_args)
+
+    def step_block(self, u: np.ndarray, y: np.ndarray) -> None:
+        """Run len(u) samples in one foreign call.
+
+        `u` (n x input_width) and `y` (n x output_width) must be C-contiguous
+        float64 arrays; they are passed by pointer, never copied.
+        """
+        n = u.shape[0]
+        if u.shape != (n, self.input_width) or y.shape != (n, self.output_width):
+            raise ValueError(f'block buffers must be ({n}, {self.input_width}) and ({n}, {self.output_width})')
+        if u.dtype != np.float64 or y.dtype != np.float64 or not (u.flags.c_contiguous and y.flags.c_contiguous):
+            raise ValueError('block buffers must be C-contiguous float64')
+        if self._block is not None:
+            self._block(u.ctypes.data_as(_DOUBLE_P), y.ctypes.data_as(_DOUBLE_P), n, *self._param_args)
+            return
+        for k in range(n):
+            self._outputs(u[k].ctypes.data_as(_DOUBLE_P), y[k].ctypes.data_as(_DOUBLE_P), *self._param_args)
+
+    def close(self) -> None:
+        if self._lib is not None:
+            self._terminate()
+            self._lib = None
+        shutil.rmtree(self._tmp_dir, ignore_errors=True)
+
+    def __enter__(self) -> SilController:
+        self.start()
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.close()
+
+
+def simulate_dcdc_sil(
+    req: RequirementSpec,
+    topology: TopologyDesign,
+    control: ControlDesign,
+    values: dict[str, float],
+    wrapper_path: Path,
+    sfun_name: str,
+    input_width: int,
+    output_width: int,
+    cache_dir: Path | None = None,
+    params: list[float] | None = None,
+) -> AveragedRun:
+    """Close the loop between the compiled wrapper and the averaged DC-DC plant.
+
+    The controller runs once per `control.sample_time_s`, as the S-Function does
+    in Simulink, with inputs [vin, iin, vout, iout]. When the sample rate is far
+    above the plant dynamics, the plant exchanges measurements once per block of
+    samples and the whole block goes through a single `_Outputs_block` call.
+    `params` is the `ctrl.p` vector for a wrapper generated with tunable gains.
+    """
+    if topology.topology not in DCDC_TOPOLOGIES:
+        raise ValueError(f'SIL plant model does not support topology {topology.topology!r}')
+    ts = float(control.sample_time_s)
+    if ts <= 0.0:
+        raise ValueError('SIL needs a positive control.sample_time_s')
+    library = build_sil_library(wrapper_path.read_text(encoding='utf-8'), sfun_name, cache_dir)
+
+    plant = pack_dcdc_candidates(req, [(topology, control, values)])
+    horizon_s = float(values['Tstop'])
+    block = max(1, round(pick_dcdc_step(plant, horizon_s) / ts))
+    h = block * ts
+    stepper = DcDcPlantStep(plant, h)
+    steps = max(1, math.ceil(horizon_s / h))
+    vin = float(plant.vin[0])
+    vref = float(plant.vref[0])
+    r_load = float(plant.r_load[0])
+    band = max(abs(vref), 1e-9) * SETTLING_TOL
+    quiet_needed = max(20, int(4.0 * 2.0 * math.pi * math.sqrt(float(plant.l_h[0] * plant.c_f[0])) / h))
+    blowup = 10.0 * max(abs(vref), abs(vin))
+
+    vo_trace = np.empty(steps + 1)
+    il_trace = np.empty(steps + 1)
+    duty_trace = np.empty(steps + 1)
+    p_in_trace = np.empty(steps + 1)
+    notes: list[str] = [f'sil_block_samples={block}']
+
+    il = np.zeros(1)
+    vc = np.zeros(1)
+    m, u = stepper.coupling(np.zeros(1))
+    quiet = 0
+    vc_checked = 0.0
+    diverged = False
+    last = steps
+    with SilController(library, sfun_name, input_width, output_width, params) as ctrl:
+        sensed = np.zeros(ctrl.input_width)
+        u_block = np.zeros((block, ctrl.input_width))
+        y_block = np.zeros((block, ctrl.output_width))
+        n_sensed = min(4, ctrl.input_width)
+        for k in range(steps + 1):
+            vo = float(stepper.output(il, vc, m)[0])
+            il_now = float(il[0])
+            sensed[:n_sensed] = (vin, il_now * float(u[0]), vo, vo / r_load)[:n_sensed]
+            u_block[:] = sensed
+            ctrl.step_block(u_block, y_block)
+            # The plant sees the PWM average of the block's duty commands.
+            duty = min(max(float(y_block[:, 0].mean()), 0.0), 1.0)
+            m, u = stepper.coupling(np.array([duty]))
+
+            vo_trace[k] = vo
+            il_trace[k] = il_now
+            duty_trace[k] = duty
+            p_in_trace[k] = abs(vin * float(u[0]) * il_now)
+            if k == steps:
+                break
+            il, vc = stepper.step(il, vc, m, u)
+
+            if (k + 1) % CHECK_EVERY:
+                continue
+            vc_now = float(vc[0])
+            if not abs(vc_now) < blowup:
+                diverged = True
+                last = k
+                notes.append(f'diverged_at_s={k * h:.6g}')
+                break
+            quiet = quiet + CHECK_EVERY if (abs(vc_now - vc_checked) < 0.01 * CHECK_EVERY * band and abs(vref - vo) < 0.1 * band) else 0
+            vc_checked = vc_now
+            if quiet >= quiet_needed:
+                last = k
+                notes.append(f'early_stop_at_s={k * h:.6g}')
+                break
+
+    if last < steps:
+        # Settled (or frozen after divergence): hold the final sample to the horizon.
+        for trace in (vo_trace, il_trace, duty_trace, p_in_trace):
+            trace[last + 1:] = trace[last]
+
+    time_s = np.arange(steps + 1) * h
+    p_out = vo_trace * vo_trace / r_load
+    outside = np.flatnonzero(np.abs(vo_trace - vref) > band)
+    tail = vo_trace[ripple_tail_start(steps + 1):]
+    switching_pp = float(
+        dcdc_switching_ripple_pp(plant, duty_trace[-1:], il_trace[-1:], vo_trace[-1:], req.fsw_hz)[0]
+    )
+    metrics = {
+        key: float(value)
+        for key, value in finalize_metrics(
+            vref,
+            vo_trace.max(),
+            time_s[outside[-1]] if outside.size else 0.0,
+            tail.min(),
+            tail.max(),
+            p_in_trace.sum(),
+            p_out.sum(),
+            diverged,
+            horizon_s,
+            switching_pp,
+        ).items()
+    }
+    return AveragedRun(
+        metrics=metrics,
+        time_s=time_s,
+        vout_v=vo_trace,
+        il_a=il_trace,
+        duty=duty_trace,
+        step_s=h,
+        steps=steps,
+        converged=quiet >= quiet_needed and not diverged,
+        diverged=diverged,
+        notes=[f'sil_library={library}', *notes],
+        ripple_extra_v_pp=switching_pp,
+    )
+
+
+def _shared_suffix() -> str:
+    if sys.platform == 'win32':
+        return '.dll'
+    if sys.platform == 'darwin':
+        return '.dylib'
+    return '.so'
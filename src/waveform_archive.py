@@ -0,0 +1,182 @@
+from __future__ import annotations
+
+import json
+import lzma
+import math
+import struct
+import zlib
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+
+from src.waveforms import WaveformBundle, channel_unit, iter_chunks
+
+# Layout of a `.wfz` archive:
+#   magic | compressed chunk blobs ... | JSON index | trailer (index offset, index size, magic)
+# Every channel is cut into `chunk_samples`-row chunks, byte-shuffled (all first
+# bytes of the float64 values, then all second bytes, ...) so the slowly varying
+# exponent bytes compress well, and compressed on their own. The index lists
+# (offset, size) per chunk, so reading a time window inflates only its chunks.
+ARCHIVE_FORMAT = 'acss_waveform_archive_v1'
+ARCHIVE_MAGIC = b'ACSSWFZ1'
+ARCHIVE_CHUNK_SAMPLES = 1 << 14
+ARCHIVE_CODECS = ('zlib', 'lzma')
+
+_TRAILER = struct.Struct('<QQ8s')
+
+
+class WaveformArchive(WaveformBundle):
+    """Waveform bundle backed by one compressed `.wfz` file.
+
+    `read` inflates only the chunks overlapping the requested rows; indexing a
+    channel inflates it whole (and caches it), as mapping a raw channel would.
+    """
+
+    def __init__(self, path: Path, index: dict[str, Any]) -> None:
+        super().__init__(
+            path,
+            index['channels'],
+            attrs=index.get('attrs') or {},
+            sample_rate_hz=index.get('sample_rate_hz'),
+        )
+        self.codec = str(index.get('codec', 'zlib'))
+        self.chunk_samples = int(index['chunk_samples'])
+
+    def read(self, name: str, start: int, stop: int) -> np.ndarray:
+        spec = self.channel_specs[name]
+        shape = tuple(spec['shape'])
+        start = max(0, min(start, shape[0]))
+        stop = max(start, min(stop, shape[0]))
+        if start == stop:
+            return np.zeros((0, *shape[1:]), dtype=np.dtype(spec['dtype']))
+        first = start // self.chunk_samples
+        last = (stop - 1) // self.chunk_samples
+        with self.path.open('rb') as fh:
+            parts = [self._inflate(fh, name, i) for i in range(first, last + 1)]
+        rows = np.concatenate(parts) if len(parts) > 1 else parts[0]
+        offset = first * self.chunk_samples
+        return rows[start - offset : stop - offset]
+
+    def _load(self, name: str) -> np.ndarray:
+        return self.read(name, 0, self.length(name))
+
+    def _inflate(self, fh: Any, name: str, chunk: int) -> np.ndarray:
+        spec = self.channel_specs[name]
+        offset, size = spec['chunks'][chunk]
+        fh.seek(offset)
+        raw = _decompress(self.codec, fh.read(size))
+        dtype = np.dtype(spec['dtype'])
+        shape = tuple(spec['shape'])
+        values = _unshuffle(raw, dtype)
+        return values.reshape((-1, *shape[1:]))
+
+
+def write_archive(
+    bundle: WaveformBundle,
+    path: Path,
+    codec: str = 'zlib',
+    chunk_samples: int = ARCHIVE_CHUNK_SAMPLES,
+) -> Path:
+    """Compress every channel of `bundle` into `path`, reading it chunk by chunk."""
+    if codec not in ARCHIVE_CODECS:
+        raise ValueError(f'unknown archive codec {codec!r}; expected one of {ARCHIVE_CODECS}')
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(path.name + '.tmp')
+    channels: dict[str, dict[str, Any]] = {}
+    with tmp_path.open('wb') as fh:
+        fh.write(ARCHIVE_MAGIC)
+        for name in bundle.channels:
+            chunks: list[list[int]] = []
+            shape: tuple[int, ...] = (0,)
+            rows = 0
+            for (values,) in iter_chunks(bundle, (name,), chunk_samples):
+                blob = _compress(codec, _shuffle(values))
+                chunks.append([fh.tell(), len(blob)])
+                fh.write(blob)
+                rows += len(values)
+                shape = (rows, *values.shape[1:])
+            channels[name] = {
+                'dtype': '<f8',
+                'shape': list(shape),
+                'unit': bundle.unit(name) or channel_unit(name),
+                'chunks': chunks,
+            }
+        index = json.dumps(
+            {
+                'format': ARCHIVE_FORMAT,
+                'codec': codec,
+                'chunk_samples': chunk_samples,
+                'sample_rate_hz': bundle.sample_rate_hz,
+                'channels': channels,
+                'attrs': bundle.attrs,
+            }
+        ).encode('utf-8')
+        index_offset = fh.tell()
+        fh.write(index)
+        fh.write(_TRAILER.pack(index_offset, len(index), ARCHIVE_MAGIC))
+    tmp_path.replace(path)
+    return path
+
+
+def open_archive(path: str | Path) -> WaveformArchive:
+    path = Path(path)
+    with path.open('rb') as fh:
+        if fh.read(len(ARCHIVE_MAGIC)) != ARCHIVE_MAGIC:
+            raise ValueError(f'{path} is not a waveform archive')
+        fh.seek(-_TRAILER.size, 2)
+        index_offset, index_size, magic = _TRAILER.unpack(fh.read(_TRAILER.size))
+        if magic != ARCHIVE_MAGIC:
+            raise ValueError(f'{path}: truncated waveform archive')
+        fh.seek(index_offset)
+        index = json.loads(fh.read(index_size).decode('utf-8'))
+    if index.get('format') != ARCHIVE_FORMAT:
+        raise ValueError(f'{path}: unsupported archive format {index.get("format")!r}')
+    return WaveformArchive(path, index)
+
+
+def verify_archive(bundle: WaveformBundle, archive_path: Path) -> bool:
+    """True when the archive holds every channel of `bundle` with the same shape and values."""
+    try:
+        archive = open_archive(archive_path)
+        if archive.channels != bundle.channels:
+            return False
+        for name in bundle.channels:
+            if archive.channel_specs[name]['shape'] != list(np.shape(bundle[name])):
+                return False
+            for (raw,), (packed,) in zip(
+                iter_chunks(bundle, (name,), ARCHIVE_CHUNK_SAMPLES), iter_chunks(archive, (name,), ARCHIVE_CHUNK_SAMPLES)
+            ):
+                if not np.array_equal(raw, packed, equal_nan=True):
+                    return False
+    except (OSError, ValueError, KeyError):
+        return False
+    return True
+
+
+def archive_ratio(bundle: WaveformBundle, archive_path: Path) -> float:
+    """Raw float64 bytes per archived byte."""
+    raw = sum(8 * math.prod(bundle.channel_specs[name].get('shape') or [bundle.length(name)]) for name in bundle.channels)
+    return raw / max(archive_path.stat().st_size, 1)
+
+
+def _shuffle(values: np.ndarray) -> bytes:
+    data = np.ascontiguousarray(values, dtype='<f8').reshape(-1)
+    return data.view(np.uint8).reshape(-1, data.itemsize).T.tobytes()
+
+
+def _unshuffle(raw: bytes, dtype: np.dtype) -> np.ndarray:
+    planes = np.frombuffer(raw, dtype=np.uint8).reshape(dtype.itemsize, -1)
+    return np.ascontiguousarray(planes.T).view(dtype).reshape(-1)
+
+
+def _compress(codec: str, data: bytes) -> bytes:
+    if codec == 'lzma':
+        return lzma.compress(data, preset=6)
+    return zlib.compress(data, 6)
+
+
+def _decompress(codec: str, blob: bytes) -> bytes:
+    if codec == 'lzma':
+        return lzma.decompress(blob)
+    return zlib.decompress(blob)
@@ -0,0 +1,167 @@
+from __future__ import annotations
+
+import json
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+
+from src.contracts import dump_json
+from src.waveforms import DEFAULT_CHUNK_SAMPLES, HEADER_NAME, WaveformBundle, iter_chunks
+
+# A pyramid lives in `<name>.wf/pyramid/`. Level k halves level k-1: `L<k>_time_s.npy`
+# holds the first time of each bin and `L<k>_<channel>.npy` its (min, max) rows.
+# Level 0 is the raw bundle itself. `index.json` is written last.
+PYRAMID_FORMAT = 'acss_pyramid_v1'
+PYRAMID_DIR = 'pyramid'
+PYRAMID_INDEX = 'index.json'
+# Levels stop once a level has at most this many bins.
+PYRAMID_TOP_BINS = 2048
+
+
+class WaveformPyramid:
+    def __init__(self, base: WaveformBundle, path: Path, index: dict[str, Any]) -> None:
+        self.base = base
+        self.path = path
+        self.channels: list[str] = list(index.get('channels', []))
+        self.source_length = int(index.get('source_length', 0))
+        self.levels: list[dict[str, Any]] = list(index.get('levels', []))
+
+    @property
+    def top_level(self) -> int:
+        return len(self.levels)
+
+    def level(self, k: int) -> WaveformBundle:
+        """Bundle for level `k`: 1-D channels at level 0, (bins, 2) min/max channels above."""
+        if k == 0:
+            return self.base
+        meta = self.levels[k - 1]
+        names = ['time_s', *self.channels]
+        return WaveformBundle(
+            self.path,
+            {name: {'file': f'L{k}_{name}.npy', 'unit': self.base.unit(name)} for name in names},
+            attrs={'level': k, 'factor': meta['factor']},
+        )
+
+    def level_for(self, samples: int, pixels: int) -> int:
+        """Coarsest level that still gives at least one bin per pixel for a window of `samples`."""
+        k = 0
+        while k < self.top_level and samples // (2 ** (k + 1)) >= pixels:
+            k += 1
+        return k
+
+
+def pyramid_channels(bundle: WaveformBundle) -> list[str]:
+    if 'time_s' not in bundle.channels:
+        return []
+    n = len(bundle['time_s'])
+    return [
+        name
+        for name in bundle.channels
+        if name != 'time_s' and bundle[name].ndim == 1 and len(bundle[name]) == n
+    ]
+
+
+def write_pyramid(
+    bundle: WaveformBundle,
+    top_bins: int = PYRAMID_TOP_BINS,
+    chunk_samples: int = DEFAULT_CHUNK_SAMPLES,
+) -> Path | None:
+    """Precompute 2x min/max levels of every time-aligned channel next to a columnar bundle.
+
+    Each level is built in one chunked pass over the level below and appended
+    to its `.npy` files, so memory stays bounded whatever the log length.
+    Returns the pyramid directory, or None for legacy JSON waveforms.
+    """
+    if not bundle.path.is_dir() or 'time_s' not in bundle.channels:
+        return None
+    channels = pyramid_channels(bundle)
+    directory = bundle.path / PYRAMID_DIR
+    directory.mkdir(parents=True, exist_ok=True)
+    index_path = directory / PYRAMID_INDEX
+    index_path.unlink(missing_ok=True)
+    for stale in directory.glob('L*_*.npy'):
+        stale.unlink()
+
+    chunk_samples += chunk_samples % 2
+    names = ('time_s', *channels)
+    length = len(bundle['time_s'])
+    levels: list[dict[str, Any]] = []
+    source = bundle
+    k = 0
+    while length > top_bins:
+        k += 1
+        bins = (length + 1) // 2
+        writers = {
+            name: _NpyAppender(directory / f'L{k}_{name}.npy', (bins,) if name == 'time_s' else (bins, 2))
+            for name in names
+        }
+        for time_s, *values in iter_chunks(source, names, chunk_samples):
+            writers['time_s'].append(time_s[::2])
+            for name, value in zip(channels, values):
+                writers[name].append(_halve(value))
+        for writer in writers.values():
+            writer.close()
+        levels.append({'level': k, 'factor': 2**k, 'length': bins})
+        length = bins
+        source = WaveformBundle(directory, {name: {'file': f'L{k}_{name}.npy'} for name in names})
+
+    dump_json(
+        index_path,
+        {
+            'format': PYRAMID_FORMAT,
+            'source_length': len(bundle['time_s']),
+            'source_header': _header_signature(bundle),
+            'channels': channels,
+            'levels': levels,
+        },
+    )
+    return directory
+
+
+def open_pyramid(bundle: WaveformBundle) -> WaveformPyramid | None:
+    index_path = bundle.path / PYRAMID_DIR / PYRAMID_INDEX
+    if not index_path.is_file():
+        return None
+    index = json.loads(index_path.read_text(encoding='utf-8'))
+    if index.get('format') != PYRAMID_FORMAT or index.get('source_header') != _header_signature(bundle):
+        # Stale: the waveform was rewritten after the pyramid was built.
+        return None
+    return WaveformPyramid(bundle, index_path.parent, index)
+
+
+def _header_signature(bundle: WaveformBundle) -> list[int]:
+    stat = (bundle.path / HEADER_NAME).stat()
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+def _halve(values: np.ndarray) -> np.ndarray:
+    # (min, max) rows of adjacent sample pairs; raw 1-D samples are their own min and max.
+    lo = values if values.ndim == 1 else values[:, 0]
+    hi = values if values.ndim == 1 else values[:, 1]
+    if lo.size % 2:
+        lo = np.append(lo, lo[-1])
+        hi = np.append(hi, hi[-1])
+    return np.column_stack((lo.reshape(-1, 2).min(axis=1), hi.reshape(-1, 2).max(axis=1)))
+
+
+class _NpyAppender:
+    # Writes a .npy header for the final shape, then rows as they are produced.
+
+    def __init__(self, path: Path, shape: tuple[int, ...]) -> None:
+        self.path = path
+        self.shape = shape
+        self.rows = 0
+        self._fh = path.open('wb')
+        np.lib.format.write_array_header_1_0(
+            self._fh, {'descr': '<f8', 'fortran_order': False, 'shape': shape}
+        )
+
+    def append(self, rows: np.ndarray) -> None:
+        self._fh.write(np.ascontiguousarray(rows, dtype='<f8').tobytes())
+        self.rows += len(rows)
+
+    def close(self) -> None:
+        self._fh.close()
+        if self.rows != self.shape[0]:
+            raise ValueError(f'{self.path}: wrote {self.rows} rows, header says {self.shape[0]}')
@@ -0,0 +1,249 @@
+from __future__ import annotations
+
+import base64
+import json
+import shutil
+from pathlib import Path
+
+import numpy as np
+
+from src.waveform_pyramid import WaveformPyramid
+from src.waveforms import iter_chunks, waveform_stem
+
+# Bins per tile script; the viewer loads only the tiles of one level that cover the window.
+VIEWER_TILE_BINS = 4096
+
+
+def write_waveform_viewer(out_dir: Path, pyramid: WaveformPyramid, title: str = 'Waveform Viewer') -> Path:
+    """Write `<stem>_viewer.html` plus one tile script per (level, tile) of the pyramid.
+
+    Tiles are plain `<script>` files so the report opens from disk without a
+    web server. Each holds the bin times as float64 (omitted for uniformly
+    sampled logs) followed by the channel values as float32: samples at level
+    0, (min, max) pairs above it.
+    """
+    stem = waveform_stem(pyramid.base.path)
+    tile_dir = out_dir / f'{stem}_viewer'
+    if tile_dir.exists():
+        shutil.rmtree(tile_dir)
+    names = ('time_s', *pyramid.channels)
+    levels = [pyramid.source_length, *(int(meta['length']) for meta in pyramid.levels)]
+    # Uniformly sampled logs get their bin times from the sample index instead of the tiles.
+    sample_rate_hz = pyramid.base.sample_rate_hz
+    for k in range(len(levels)):
+        (tile_dir / f'L{k}').mkdir(parents=True, exist_ok=True)
+        for tile, (time_s, *values) in enumerate(iter_chunks(pyramid.level(k), names, VIEWER_TILE_BINS)):
+            columns = [value if value.ndim == 1 else value.T.reshape(-1) for value in values]
+            times = b'' if sample_rate_hz else time_s.astype('<f8').tobytes()
+            data = times + np.concatenate(columns or [np.zeros(0)]).astype('<f4').tobytes()
+            encoded = base64.b64encode(data).decode('ascii')
+            (tile_dir / f'L{k}' / f'{tile}.js').write_text(
+                f'ACSSViewer.tile({k},{tile},{len(time_s)},"{encoded}");\n', encoding='utf-8'
+            )
+
+    manifest = {
+        'title': title,
+        'tile_dir': tile_dir.name,
+        'tile_bins': VIEWER_TILE_BINS,
+        'levels': levels,
+        'time0_s': float(pyramid.base.read('time_s', 0, 1)[0]) if levels[0] else 0.0,
+        'sample_rate_hz': sample_rate_hz,
+        'channels': [{'name': name, 'unit': pyramid.base.unit(name)} for name in pyramid.channels],
+    }
+    html_path = out_dir / f'{stem}_viewer.html'
+    html_path.write_text(_VIEWER_HTML.replace('__MANIFEST__', json.dumps(manifest)), encoding='utf-8')
+    return html_path
+
+
+_VIEWER_HTML = """<!DOCTYPE html>
+<html lang="en">
+<head>
+<meta charset="utf-8" />
+<title>ACSS waveform viewer</title>
+<style>
+  body { margin: 0; font-family: Segoe UI, Arial, sans-serif; background: #fbfcfe; color: #10233f; }
+  header { padding: 12px 20px; display: flex; gap: 16px; align-items: center; }
+  h1 { font-size: 20px; margin: 0; }
+  #info { font-size: 12px; color: #506178; }
+  canvas { display: block; margin: 0 20px; border: 1px solid #d9dee7; background: #ffffff; cursor: grab; }
+</style>
+</head>
+<body>
+<header>
+  <h1 id="title"></h1>
+  <select id="channel"></select>
+  <button id="reset">Reset zoom</button>
+  <span id="info"></span>
+</header>
+<canvas id="plot" width="1180" height="560"></canvas>
+<script>
+const M = __MANIFEST__;
+const ACSSViewer = (() => {
+  const tiles = {};
+  const requested = {};
+  const canvas = document.getElementById('plot');
+  const ctx = canvas.getContext('2d');
+  const pad = { left: 80, right: 20, top: 20, bottom: 40 };
+  const plotW = canvas.width - pad.left - pad.right;
+  const plotH = canvas.height - pad.top - pad.bottom;
+  const top = M.levels.length - 1;
+  let channel = 0;
+  let view = [0, M.levels[0]];
+
+  function decode(b64) {
+    const raw = atob(b64);
+    const bytes = new Uint8Array(raw.length);
+    for (let i = 0; i < raw.length; i++) bytes[i] = raw.charCodeAt(i);
+    return bytes.buffer;
+  }
+
+  function tile(level, index, count, b64) {
+    const buffer = decode(b64);
+    const width = level === 0 ? 1 : 2;
+    const timeBytes = M.sample_rate_hz ? 0 : count * 8;
+    const values = new Float32Array(buffer, timeBytes);
+    tiles[level + ':' + index] = {
+      time: timeBytes ? new Float64Array(buffer, 0, count) : null,
+      channels: M.channels.map((_, c) => values.subarray(c * count * width, (c + 1) * count * width)),
+      count: count,
+    };
+    draw();
+  }
+
+  function request(level, index) {
+    const key = level + ':' + index;
+    if (tiles[key] || requested[key]) return;
+    requested[key] = true;
+    const script = document.createElement('script');
+    script.src = M.tile_dir + '/L' + level + '/' + index + '.js';
+    document.body.appendChild(script);
+  }
+
+  function levelFor(samples) {
+    let k = 0;
+    while (k < top && Math.floor(samples / Math.pow(2, k + 1)) >= plotW) k++;
+    return k;
+  }
+
+  function tileRange(level) {
+    const factor = Math.pow(2, level);
+    const first = Math.max(0, Math.floor(view[0] / factor / M.tile_bins));
+    const last = Math.min(Math.ceil(M.levels[level] / M.tile_bins) - 1, Math.floor(view[1] / factor / M.tile_bins));
+    return [first, last];
+  }
+
+  function bins(level) {
+    // Visible (sample index, time, lo, hi) rows of one level, or null while tiles are missing.
+    const factor = Math.pow(2, level);
+    const [first, last] = tileRange(level);
+    const rows = [];
+    for (let i = first; i <= last; i++) {
+      const t = tiles[level + ':' + i];
+      if (!t) return null;
+      const data = t.channels[channel];
+      for (let j = 0; j < t.count; j++) {
+        const sample = (i * M.tile_bins + j) * factor;
+        if (sample + factor < view[0] || sample > view[1]) continue;
+        const lo = data[j];
+        const hi = level === 0 ? data[j] : data[t.count + j];
+        rows.push([sample, t.time ? t.time[j] : M.time0_s + sample / M.sample_rate_hz, lo, hi]);
+      }
+    }
+    return rows;
+  }
+
+  function draw() {
+    const wanted = levelFor(view[1] - view[0]);
+    const [first, last] = tileRange(wanted);
+    for (let i = first; i <= last; i++) request(wanted, i);
+    let level = wanted;
+    let rows = null;
+    while (level <= top && (rows = bins(level)) === null) level++;
+    ctx.clearRect(0, 0, canvas.width, canvas.height);
+    if (!rows || !rows.length) return;
+
+    let vmin = Infinity, vmax = -Infinity;
+    for (const r of rows) { vmin = Math.min(vmin, r[2]); vmax = Math.max(vmax, r[3]); }
+    if (vmax - vmin < 1e-12) { vmin -= 1; vmax += 1; }
+    const vpad = (vmax - vmin) * 0.08;
+    vmin -= vpad; vmax += vpad;
+    const sx = (s) => pad.left + (s - view[0]) / (view[1] - view[0]) * plotW;
+    const sy = (v) => pad.top + (vmax - v) / (vmax - vmin) * plotH;
+
+    ctx.strokeStyle = '#d7dde5';
+    ctx.fillStyle = '#445066';
+    ctx.font = '12px Segoe UI, Arial, sans-serif';
+    for (let i = 0; i <= 4; i++) {
+      const y = pad.top + i / 4 * plotH;
+      ctx.beginPath(); ctx.moveTo(pad.left, y); ctx.lineTo(pad.left + plotW, y); ctx.stroke();
+      ctx.textAlign = 'right';
+      ctx.fillText((vmax - i / 4 * (vmax - vmin)).toPrecision(4), pad.left - 8, y + 4);
+      const r = rows[Math.min(rows.length - 1, Math.floor(i / 4 * rows.length))];
+      const x = sx(r[0]);
+      ctx.beginPath(); ctx.moveTo(x, pad.top); ctx.lineTo(x, pad.top + plotH); ctx.stroke();
+      ctx.textAlign = 'center';
+      ctx.fillText((r[1] * 1000).toFixed(4) + ' ms', x, canvas.height - 14);
+    }
+
+    ctx.save();
+    ctx.beginPath(); ctx.rect(pad.left, pad.top, plotW, plotH); ctx.clip();
+    ctx.strokeStyle = '#0b84f3';
+    ctx.lineWidth = level === 0 ? 1.5 : 1;
+    ctx.beginPath();
+    rows.forEach((r, i) => {
+      const x = sx(r[0]);
+      if (i === 0) ctx.moveTo(x, sy(r[3])); else ctx.lineTo(x, sy(r[3]));
+      if (r[2] !== r[3]) ctx.lineTo(x, sy(r[2]));
+    });
+    ctx.stroke();
+    ctx.restore();
+
+    const ch = M.channels[channel];
+    document.getElementById('info').textContent =
+      ch.name + (ch.unit ? ' [' + ch.unit + ']' : '') + ' | samples ' + Math.round(view[0]) + '-' + Math.round(view[1]) +
+      ' | level ' + level + ' (' + Math.pow(2, level) + 'x)' + (level !== wanted ? ' loading finer level...' : '');
+  }
+
+  function zoom(center, factor) {
+    const span = Math.min(M.levels[0], Math.max(16, (view[1] - view[0]) * factor));
+    let start = center - (center - view[0]) * span / (view[1] - view[0]);
+    start = Math.max(0, Math.min(M.levels[0] - span, start));
+    view = [start, start + span];
+    draw();
+  }
+
+  canvas.addEventListener('wheel', (e) => {
+    e.preventDefault();
+    const frac = Math.max(0, Math.min(1, (e.offsetX - pad.left) / plotW));
+    zoom(view[0] + frac * (view[1] - view[0]), e.deltaY < 0 ? 0.8 : 1.25);
+  });
+  let drag = null;
+  canvas.addEventListener('mousedown', (e) => { drag = { x: e.offsetX, view: view.slice() }; });
+  window.addEventListener('mouseup', () => { drag = null; });
+  canvas.addEventListener('mousemove', (e) => {
+    if (!drag) return;
+    const span = drag.view[1] - drag.view[0];
+    let start = drag.view[0] - (e.offsetX - drag.x) / plotW * span;
+    start = Math.max(0, Math.min(M.levels[0] - span, start));
+    view = [start, start + span];
+    draw();
+  });
+
+  const select = document.getElementById('channel');
+  M.channels.forEach((c, i) => {
+    const option = document.createElement('option');
+    option.value = i;
+    option.textContent = c.name;
+    select.appendChild(option);
+  });
+  select.addEventListener('change', () => { channel = Number(select.value); draw(); });
+  document.getElementById('reset').addEventListener('click', () => { view = [0, M.levels[0]]; draw(); });
+  document.getElementById('title').textContent = M.title;
+
+  return { tile: tile, draw: draw };
+})();
+ACSSViewer.draw();
+</script>
+</body>
+</html>
+"""
@@ -0,0 +1,485 @@
+from __future__ import annotations
+
+import json
+import math
+from collections.abc import Iterable, Iterator, Mapping, Sequence
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+
+from src.contracts import dump_json
+
+# A waveform is a directory `<name>.wf/` holding `header.json` plus one file per
+# channel: `.npy` (written here) or raw little-endian float64 `.f64` (written by
+# the MATLAB runner). Legacy `waveforms.json` files of float lists still open.
+WAVEFORM_FORMAT = 'acss_waveform_v1'
+WAVEFORM_DIR_SUFFIX = '.wf'
+HEADER_NAME = 'header.json'
+# Compressed single-file form of a bundle, see src/waveform_archive.py.
+ARCHIVE_SUFFIX = '.wfz'
+# Samples per channel handed out by `iter_chunks`; 64k float64 values are 512 KiB.
+DEFAULT_CHUNK_SAMPLES = 1 << 16
+# Vertices kept per pixel column by min/max decimation: first, min, max, last.
+POINTS_PER_COLUMN = 4
+
+_UNIT_SUFFIXES = (('_hz', 'Hz'), ('_s', 's'), ('_v', 'V'), ('_a', 'A'), ('_w', 'W'))
+
+
+class WaveformBundle(Mapping[str, Any]):
+    """Read-only view of one waveform: array channels plus scalar attributes.
+
+    Columnar channels are memory-mapped on first access, so opening a bundle
+    and touching one channel never reads the others.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        channels: dict[str, dict[str, Any]],
+        attrs: dict[str, Any] | None = None,
+        sample_rate_hz: float | None = None,
+        arrays: dict[str, np.ndarray] | None = None,
+    ) -> None:
+        self.path = path
+        self.channel_specs = channels
+        self.attrs = dict(attrs or {})
+        self.sample_rate_hz = sample_rate_hz
+        self._arrays: dict[str, np.ndarray] = dict(arrays or {})
+        self._layouts: dict[str, tuple[Path, np.dtype, tuple[int, ...], int]] = {}
+
+    @property
+    def channels(self) -> list[str]:
+        return list(self.channel_specs)
+
+    def unit(self, name: str) -> str:
+        return str(self.channel_specs.get(name, {}).get('unit') or channel_unit(name))
+
+    def __getitem__(self, key: str) -> Any:
+        if key in self.channel_specs:
+            array = self._arrays.get(key)
+            if array is None:
+                array = self._load(key)
+                self._arrays[key] = array
+            return array
+        return self.attrs[key]
+
+    def length(self, name: str) -> int:
+        """Rows of a channel, from the header when it has a shape, without loading it."""
+        spec = self.channel_specs[name]
+        shape = spec.get('shape') or ([spec['length']] if spec.get('length') is not None else None)
+        return int(shape[0]) if shape else len(self[name])
+
+    def __iter__(self) -> Iterator[str]:
+        yield from self.channel_specs
+        yield from (key for key in self.attrs if key not in self.channel_specs)
+
+    def __len__(self) -> int:
+        return len(self.channel_specs) + sum(1 for key in self.attrs if key not in self.channel_specs)
+
+    def read(self, name: str, start: int, stop: int) -> np.ndarray:
+        """Copy rows `start:stop` of a channel with a plain file read.
+
+        Unlike slicing the memory map, this leaves no file pages mapped into the
+        process, so chunked scans of a long log keep a flat resident size.
+        """
+        spec = self.channel_specs[name]
+        if 'file' not in spec:
+            return np.asarray(self[name][start:stop])
+        file_path, dtype, shape, offset = self._layout(name)
+        start = max(0, min(start, shape[0]))
+        stop = max(start, min(stop, shape[0]))
+        row = math.prod(shape[1:])
+        with file_path.open('rb') as fh:
+            fh.seek(offset + start * row * dtype.itemsize)
+            values = np.fromfile(fh, dtype=dtype, count=(stop - start) * row)
+        return values.reshape((stop - start, *shape[1:]))
+
+    def _load(self, name: str) -> np.ndarray:
+        return _map_channel(self.path, self.channel_specs[name])
+
+    def _layout(self, name: str) -> tuple[Path, np.dtype, tuple[int, ...], int]:
+        layout = self._layouts.get(name)
+        if layout is None:
+            layout = _channel_layout(self.path, self.channel_specs[name])
+            self._layouts[name] = layout
+        return layout
+
+    def to_dict(self) -> dict[str, Any]:
+        """Plain JSON-ready dict (float lists), i.e. the legacy `waveforms.json` layout."""
+        data: dict[str, Any] = {name: np.asarray(self[name]).tolist() for name in self.channel_specs}
+        data.update({key: value for key, value in self.attrs.items() if key not in data})
+        return data
+
+
+class WaveformHandle:
+    """One waveform path, opened on first use and reopened only when the file changes.
+
+    `SimulationResult.waveform()` hands the same handle to every agent that
+    reads an iteration's waveform, so the header is parsed and channels mapped
+    once per iteration. A rewrite of the file (or of a bundle's header, which is
+    written last) changes its mtime/size and drops the cached bundle.
+    """
+
+    def __init__(self, path: str | Path) -> None:
+        self.path = Path(path)
+        self._bundle: WaveformBundle | None = None
+        self._signature: tuple[int, int] | None = None
+
+    def exists(self) -> bool:
+        return self._stat_path().exists()
+
+    def load(self) -> WaveformBundle:
+        signature = self._current_signature()
+        if self._bundle is None or signature != self._signature:
+            self._bundle = open_waveforms(self.path)
+            self._signature = signature
+        return self._bundle
+
+    def invalidate(self) -> None:
+        self._bundle = None
+        self._signature = None
+
+    def __deepcopy__(self, memo: dict[int, Any]) -> WaveformHandle:
+        # Snapshots of a result (iteration records) keep sharing the loaded bundle.
+        return self
+
+    def _stat_path(self) -> Path:
+        return self.path / HEADER_NAME if self.path.is_dir() else self.path
+
+    def _current_signature(self) -> tuple[int, int]:
+        stat = self._stat_path().stat()
+        return stat.st_mtime_ns, stat.st_size
+
+
+@dataclass
+class RunningStats:
+    """Single-pass min/max/mean accumulator fed one chunk at a time."""
+
+    count: int = 0
+    minimum: float = math.inf
+    maximum: float = -math.inf
+    total: float = 0.0
+    abs_total: float = 0.0
+
+    def update(self, values: np.ndarray) -> None:
+        if values.size == 0:
+            return
+        self.count += int(values.size)
+        self.minimum = min(self.minimum, float(values.min()))
+        self.maximum = max(self.maximum, float(values.max()))
+        self.total += float(values.sum())
+        self.abs_total += float(np.abs(values).sum())
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else math.nan
+
+    @property
+    def abs_mean(self) -> float:
+        return self.abs_total / self.count if self.count else math.nan
+
+
+def iter_chunks(
+    bundle: Mapping[str, Any],
+    channels: Sequence[str],
+    chunk_samples: int = DEFAULT_CHUNK_SAMPLES,
+    start: int = 0,
+) -> Iterator[tuple[np.ndarray, ...]]:
+    """Yield aligned float64 slices of `channels`, at most `chunk_samples` rows each.
+
+    Channels are cut to the shortest one, as `zip` would. Bundle channels are
+    read slice by slice from disk, so memory use is bounded by the chunk size
+    rather than the log length.
+    """
+    if isinstance(bundle, WaveformBundle):
+        n = min((bundle.length(name) for name in channels), default=0)
+        read = bundle.read
+    else:
+        n = min((len(bundle[name]) for name in channels), default=0)
+
+        def read(name: str, begin: int, end: int) -> np.ndarray:
+            return np.asarray(bundle[name][begin:end])
+    for offset in range(max(start, 0), n, chunk_samples):
+        stop = min(offset + chunk_samples, n)
+        yield tuple(np.asarray(read(name, offset, stop), dtype=np.float64) for name in channels)
+
+
+def channel_stats(
+    bundle: Mapping[str, Any],
+    name: str,
+    tail_fraction: float | None = None,
+    chunk_samples: int = DEFAULT_CHUNK_SAMPLES,
+) -> tuple[RunningStats, RunningStats]:
+    """Stats of a whole channel and of its tail window (from `int(n * tail_fraction)`), in one pass."""
+    n = bundle.length(name) if isinstance(bundle, WaveformBundle) else len(bundle[name])
+    tail_start = int(n * tail_fraction) if tail_fraction is not None else n
+    whole = RunningStats()
+    tail = RunningStats()
+    offset = 0
+    for (values,) in iter_chunks(bundle, (name,), chunk_samples):
+        whole.update(values)
+        if offset + len(values) > tail_start:
+            tail.update(values[max(tail_start - offset, 0):])
+        offset += len(values)
+    return whole, tail
+
+
+class MinMaxDecimator:
+    """Reduce a trace to its first, min, max and last sample per pixel column.
+
+    Fed chunk by chunk, so its memory is proportional to `columns`, not to the
+    trace. Every column's extremes survive, so overshoot peaks and ripple
+    envelopes look the same as in the full-resolution plot.
+    """
+
+    def __init__(self, t_min: float, t_max: float, columns: int) -> None:
+        self.t_min = t_min
+        self.scale = columns / (t_max - t_min) if t_max > t_min else 0.0
+        self.columns = columns
+        self._seen = np.zeros(columns, dtype=bool)
+        # Rows: first, min, max, last; each holds (time, value) per column.
+        self._t = np.zeros((4, columns))
+        self._v = np.zeros((4, columns))
+
+    def update(self, time_s: np.ndarray, values: np.ndarray) -> None:
+        if time_s.size == 0:
+            return
+        column = np.clip(((time_s - self.t_min) * self.scale).astype(np.int64), 0, self.columns - 1)
+        order = np.argsort(column, kind='stable')
+        column, time_s, values = column[order], time_s[order], values[order]
+        cols, starts = np.unique(column, return_index=True)
+        ends = np.append(starts[1:], column.size) - 1
+        seg = np.repeat(np.arange(cols.size), np.diff(np.append(starts, column.size)))
+        seg_min = np.minimum.reduceat(values, starts)
+        seg_max = np.maximum.reduceat(values, starts)
+        at_min = _first_per_segment(seg, values == seg_min[seg], cols.size)
+        at_max = _first_per_segment(seg, values == seg_max[seg], cols.size)
+
+        fresh = ~self._seen[cols]
+        self._t[0, cols[fresh]] = time_s[starts[fresh]]
+        self._v[0, cols[fresh]] = values[starts[fresh]]
+        lower = fresh | (seg_min < self._v[1, cols])
+        self._t[1, cols[lower]] = time_s[at_min[lower]]
+        self._v[1, cols[lower]] = seg_min[lower]
+        higher = fresh | (seg_max > self._v[2, cols])
+        self._t[2, cols[higher]] = time_s[at_max[higher]]
+        self._v[2, cols[higher]] = seg_max[higher]
+        self._t[3, cols] = time_s[ends]
+        self._v[3, cols] = values[ends]
+        self._seen[cols] = True
+
+    def points(self) -> tuple[np.ndarray, np.ndarray]:
+        """Kept samples in time order, with repeats within a column dropped."""
+        t = self._t[:, self._seen]
+        v = self._v[:, self._seen]
+        order = np.argsort(t, axis=0, kind='stable')
+        t = np.take_along_axis(t, order, axis=0)
+        v = np.take_along_axis(v, order, axis=0)
+        keep = np.ones(t.shape, dtype=bool)
+        keep[1:] = (t[1:] != t[:-1]) | (v[1:] != v[:-1])
+        keep = keep.T.reshape(-1)
+        return t.T.reshape(-1)[keep], v.T.reshape(-1)[keep]
+
+
+def decimated_chunks(
+    chunks: Iterable[tuple[np.ndarray, np.ndarray]],
+    count: int,
+    t_min: float,
+    t_max: float,
+    columns: int,
+) -> Iterator[tuple[np.ndarray, np.ndarray]]:
+    """Pass `(time, value)` chunks through when `count` fits the plot, else min/max-decimate them."""
+    if count <= columns * POINTS_PER_COLUMN:
+        yield from chunks
+        return
+    decimator = MinMaxDecimator(t_min, t_max, columns)
+    for time_s, values in chunks:
+        decimator.update(time_s, values)
+    yield decimator.points()
+
+
+def decimate_minmax(time_s: Any, values: Any, columns: int) -> tuple[np.ndarray, np.ndarray]:
+    t = np.asarray(time_s, dtype=np.float64)
+    v = np.asarray(values, dtype=np.float64)
+    if t.size == 0:
+        return t, v
+    return next(decimated_chunks([(t, v)], t.size, float(t.min()), float(t.max()), columns))
+
+
+def write_json_streamed(path: Path, fields: Mapping[str, Any], chunk_samples: int = DEFAULT_CHUNK_SAMPLES) -> Path:
+    """Write `fields` as `dump_json` would (indent=2), streaming array values chunk by chunk."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open('w', encoding='utf-8') as fh:
+        if not fields:
+            fh.write('{}')
+            return path
+        fh.write('{')
+        for index, (key, value) in enumerate(fields.items()):
+            fh.write(',\n  ' if index else '\n  ')
+            fh.write(f'{json.dumps(str(key))}: ')
+            if isinstance(value, (list, tuple, np.ndarray)) and len(value):
+                fh.write('[')
+                for offset in range(0, len(value), chunk_samples):
+                    fh.write(',' if offset else '')
+                    fh.write(_json_items(value[offset : offset + chunk_samples]))
+                fh.write('\n  ]')
+            elif isinstance(value, np.ndarray):
+                fh.write('[]')
+            else:
+                fh.write(json.dumps(value, indent=2).replace('\n', '\n  '))
+        fh.write('\n}')
+    return path
+
+
+def channel_unit(name: str) -> str:
+    for suffix, unit in _UNIT_SUFFIXES:
+        if name.endswith(suffix):
+            return unit
+    return ''
+
+
+def write_waveforms(directory: Path, waveforms: Mapping[str, Any], export_json: Path | None = None) -> Path:
+    """Write `waveforms` as a columnar bundle; optionally also export the JSON layout.
+
+    Sequences become channels, everything else (law, topology, ...) goes to the
+    header's `attrs`. Returns the bundle directory, which is what goes into
+    `SimulationResult.waveform_files`.
+    """
+    directory.mkdir(parents=True, exist_ok=True)
+    channels: dict[str, dict[str, Any]] = {}
+    attrs: dict[str, Any] = {}
+    for name, value in waveforms.items():
+        if isinstance(value, (str, bytes)) or np.ndim(value) == 0:
+            attrs[name] = value.item() if isinstance(value, np.generic) else value
+            continue
+        array = np.ascontiguousarray(value, dtype=np.float64)
+        file_name = f'{name}.npy'
+        np.save(directory / file_name, array)
+        channels[name] = {
+            'file': file_name,
+            'dtype': array.dtype.str,
+            'shape': list(array.shape),
+            'unit': channel_unit(name),
+        }
+    header = {
+        'format': WAVEFORM_FORMAT,
+        'length': int(channels['time_s']['shape'][0]) if 'time_s' in channels else None,
+        'sample_rate_hz': _sample_rate(waveforms.get('time_s')),
+        'channels': channels,
+        'attrs': attrs,
+    }
+    # The header goes last: a directory without one is an incomplete write.
+    dump_json(directory / HEADER_NAME, header)
+    if export_json is not None:
+        export_waveforms_json(directory, export_json)
+    return directory
+
+
+def open_waveforms(path: str | Path) -> WaveformBundle:
+    """Open a columnar bundle (directory or its header.json), an archive or a legacy JSON waveform file."""
+    path = Path(path)
+    if path.suffix == ARCHIVE_SUFFIX:
+        from src.waveform_archive import open_archive
+
+        return open_archive(path)
+    if path.is_dir():
+        path = path / HEADER_NAME
+    data = json.loads(path.read_text(encoding='utf-8'))
+    if not isinstance(data, dict):
+        raise ValueError(f'waveform file {path} does not hold an object')
+    if data.get('format') == WAVEFORM_FORMAT:
+        channels = data.get('channels') or {}
+        if not isinstance(channels, dict):
+            raise ValueError(f'waveform header {path} has no channel map')
+        return WaveformBundle(
+            path.parent,
+            channels,
+            attrs=data.get('attrs') or {},
+            sample_rate_hz=data.get('sample_rate_hz'),
+        )
+
+    # Legacy layout: every list is a channel, already parsed.
+    arrays: dict[str, np.ndarray] = {}
+    attrs: dict[str, Any] = {}
+    for name, value in data.items():
+        if isinstance(value, list):
+            arrays[name] = np.asarray(value, dtype=np.float64)
+        else:
+            attrs[name] = value
+    return WaveformBundle(
+        path,
+        {name: {'unit': channel_unit(name)} for name in arrays},
+        attrs=attrs,
+        sample_rate_hz=_sample_rate(arrays.get('time_s')),
+        arrays=arrays,
+    )
+
+
+def export_waveforms_json(source: str | Path | WaveformBundle, json_path: Path) -> Path:
+    bundle = source if isinstance(source, WaveformBundle) else open_waveforms(source)
+    return write_json_streamed(json_path, {key: bundle[key] for key in bundle})
+
+
+def waveform_stem(path: str | Path) -> str:
+    """Base name for artifacts derived from a waveform (`waveforms.wf` -> `waveforms`)."""
+    path = Path(path)
+    if path.name == HEADER_NAME:
+        path = path.parent
+    return path.name[: -len(WAVEFORM_DIR_SUFFIX)] if path.name.endswith(WAVEFORM_DIR_SUFFIX) else path.stem
+
+
+def _map_channel(directory: Path, spec: dict[str, Any]) -> np.ndarray:
+    file_path = directory / str(spec['file'])
+    if file_path.suffix == '.npy':
+        return np.load(file_path, mmap_mode='r')
+    shape = tuple(int(n) for n in spec.get('shape') or [spec.get('length', 0)])
+    if math.prod(shape) == 0:
+        return np.zeros(shape, dtype=np.dtype(spec.get('dtype', '<f8')))
+    return np.memmap(file_path, dtype=np.dtype(spec.get('dtype', '<f8')), mode='r', shape=shape)
+
+
+def _channel_layout(directory: Path, spec: dict[str, Any]) -> tuple[Path, np.dtype, tuple[int, ...], int]:
+    # (file, dtype, shape, byte offset of the first sample) for direct reads.
+    file_path = directory / str(spec['file'])
+    if file_path.suffix != '.npy':
+        shape = tuple(int(n) for n in spec.get('shape') or [spec.get('length', 0)])
+        return file_path, np.dtype(spec.get('dtype', '<f8')), shape, 0
+    with file_path.open('rb') as fh:
+        version = np.lib.format.read_magic(fh)
+        if version == (1, 0):
+            shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(fh)
+        else:
+            shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(fh)
+        if fortran_order and len(shape) > 1:
+            raise ValueError(f'{file_path}: Fortran-ordered channels are not supported')
+        return file_path, dtype, tuple(shape), fh.tell()
+
+
+def _json_items(values: Any) -> str:
+    items = values.tolist() if isinstance(values, np.ndarray) else list(values)
+    if isinstance(values, np.ndarray) and values.ndim == 1 and values.dtype.kind == 'f' and np.isfinite(values).all():
+        text = map(repr, items)
+    else:
+        text = (json.dumps(item, indent=2).replace('\n', '\n    ') for item in items)
+    return ','.join('\n    ' + item for item in text)
+
+
+def _first_per_segment(seg: np.ndarray, mask: np.ndarray, segments: int) -> np.ndarray:
+    # Index of the first True in `mask` for each segment id (every segment has one).
+    hits = np.flatnonzero(mask)
+    first = np.full(segments, -1, dtype=np.int64)
+    first[seg[hits][::-1]] = hits[::-1]
+    return first
+
+
+def _sample_rate(time_s: Any) -> float | None:
+    if time_s is None or np.ndim(time_s) != 1 or len(time_s) < 2:
+        return None
+    t = np.asarray(time_s, dtype=np.float64)
+    steps = np.diff(t)
+    dt = float(steps.mean())
+    if dt <= 0.0 or not np.allclose(steps, dt, rtol=1e-6, atol=0.0):
+        return None
+    return 1.0 / dt
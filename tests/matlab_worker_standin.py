@@ -0,0 +1,76 @@
+"""Python stand-in for `matlab/acss_worker.m`, launched through ACSS_MATLAB_WORKER.
+
+    python matlab_worker_standin.py <port> <token> [--bad-token] [--skip-odd]
+
+Speaks the worker protocol of `src.matlab_bridge.MatlabWorker`. A "run" writes
+a `matlab_result.json` per job (one job, or every job of an `acss_batch_v1`
+manifest) whose metrics and `job` field identify the job. Run options steer
+failures: `crash` exits mid-job, `crash_once` (a marker path) exits only while
+the marker does not exist yet, and `sleep_s` stalls before replying.
+`--skip-odd` leaves odd-numbered manifest jobs without a result.
+"""
+from __future__ import annotations
+
+import json
+import os
+import socket
+import sys
+import time
+from pathlib import Path
+
+
+def main() -> None:
+    port, token = int(sys.argv[1]), sys.argv[2]
+    flags = set(sys.argv[3:])
+    conn = socket.create_connection(('127.0.0.1', port))
+    stream = conn.makefile('rw', encoding='utf-8', newline='\n')
+
+    def send(message: dict[str, object]) -> None:
+        stream.write(json.dumps(message) + '\n')
+        stream.flush()
+
+    send({'op': 'hello', 'token': 'wrong' if '--bad-token' in flags else token, 'pid': os.getpid()})
+    for line in stream:
+        msg = json.loads(line)
+        reply: dict[str, object] = {'id': msg['id'], 'op': msg['op'], 'ok': True, 'error': ''}
+        if msg['op'] == 'run':
+            options = msg.get('options') or {}
+            send({'id': msg['id'], 'op': 'progress', 'stage': 'simulate', 'fraction': 0.5})
+            marker = options.get('crash_once')
+            if options.get('crash') or (marker and not Path(marker).exists()):
+                if marker:
+                    Path(marker).touch()
+                os._exit(3)
+            time.sleep(float(options.get('sleep_s', 0.0)))
+            reply['stdout'] = _run(Path(msg['payload']), Path(msg['out_json']), '--skip-odd' in flags)
+        elif msg['op'] == 'shutdown':
+            send(reply)
+            return
+        elif msg['op'] != 'ping':
+            reply.update(ok=False, error=f"Unknown op: {msg['op']}")
+        send(reply)
+
+
+def _run(payload: Path, out_json: Path, skip_odd: bool) -> str:
+    data = json.loads(payload.read_text(encoding='utf-8'))
+    if data.get('format') != 'acss_batch_v1':
+        _write_result(out_json, payload.name, 0)
+        return f'ran {payload}'
+    statuses = []
+    for index, job in enumerate(data['jobs']):
+        if skip_odd and index % 2:
+            statuses.append({'id': job['id'], 'ok': False, 'error': 'skipped by stand-in'})
+            continue
+        _write_result(Path(job['out_json']), job['id'], index)
+        statuses.append({'id': job['id'], 'ok': True})
+    out_json.write_text(json.dumps({'jobs': statuses}), encoding='utf-8')
+    return f"ran {len(data['jobs'])} job(s)"
+
+
+def _write_result(out_json: Path, job: str, index: int) -> None:
+    metrics = {'overshoot_pct': float(index), 'settling_time_ms': 1.0, 'ripple_v_pp': 0.01, 'efficiency_pct': 95.0}
+    out_json.write_text(json.dumps({'job': job, 'metrics': metrics}), encoding='utf-8')
+
+
+if __name__ == '__main__':
+    main()
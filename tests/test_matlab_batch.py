@@ -0,0 +1,88 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import sys
+from dataclasses import replace
+from pathlib import Path
+
+import pytest
+
+from src.agents.control_agent import ControlAgent
+from src.agents.model_builder_agent import ModelBuilderAgent
+from src.agents.sensor_agent import SensorAgent
+from src.agents.simulation_agent import SimulationAgent
+from src.agents.topology_agent import TopologyAgent
+from src.contracts import RequirementSpec, load_requirements
+from src.matlab_bridge import WORKER_COMMAND_ENV, MatlabWorker, run_matlab_stub
+
+_EXAMPLES = Path(__file__).resolve().parents[1] / 'examples'
+_STANDIN = Path(__file__).resolve().parent / 'matlab_worker_standin.py'
+_TEMPLATE = _EXAMPLES / 'topology.slx'
+
+
+def _jobs(tmp_path: Path, gains: list[float]) -> tuple[RequirementSpec, list[tuple[object, ...]]]:
+    req = load_requirements(_EXAMPLES / 'requirements_buck_48to12_500w.json')
+    topology = TopologyAgent().design(req)
+    sensors = SensorAgent().design(req, topology)
+    control = ControlAgent().design(req, topology)
+    jobs = []
+    for idx, kp in enumerate(gains):
+        out_dir = tmp_path / f'cand_{idx}'
+        out_dir.mkdir()
+        candidate = replace(control, kp=kp)
+        payload = ModelBuilderAgent().build_payload(req, topology, sensors, candidate, out_dir)
+        jobs.append((topology, candidate, payload, out_dir))
+    return req, jobs
+
+
+def test_sweep_demuxes_partial_batch_results_and_falls_back_per_job(
+    monkeypatch: pytest.MonkeyPatch, tmp_path: Path
+) -> None:
+    # The stand-in writes results for even-numbered manifest jobs only.
+    monkeypatch.setenv(WORKER_COMMAND_ENV, f'{sys.executable} {_STANDIN} {{port}} {{token}} --skip-odd')
+    req, jobs = _jobs(tmp_path, [0.05, 0.1, 0.15, 0.2])
+
+    with MatlabWorker(startup_timeout_s=30.0) as worker:
+        results = SimulationAgent().run_sweep(
+            req, jobs, use_matlab=True, template_override=_TEMPLATE, matlab_worker=worker
+        )
+        assert worker.jobs_run == 1
+
+    manifest = json.loads((tmp_path / 'matlab_batch_manifest.json').read_text(encoding='utf-8'))
+    for idx, (result, entry, (_, _, _, out_dir)) in enumerate(zip(results, manifest['jobs'], jobs)):
+        assert entry['out_json'] == (out_dir / 'matlab_result.json').as_posix()
+        if idx % 2 == 0:
+            assert result.raw['job'] == entry['id']
+            assert result.metrics['overshoot_pct'] == float(idx)
+            assert json.loads((out_dir / 'matlab_result.json').read_text(encoding='utf-8'))['job'] == entry['id']
+        else:
+            assert not (out_dir / 'matlab_result.json').exists()
+            assert (out_dir / 'matlab_bridge_error.log').read_text(encoding='utf-8') == 'skipped by stand-in'
+            assert result.raw['mode'] == 'averaged_model'
+            assert result.raw['validation'] == 'synthetic_after_matlab_failure'
+            assert result.raw['payload'] == str(jobs[idx][2])
+
+
+def test_blocking_entry_points_work_inside_a_running_event_loop(
+    monkeypatch: pytest.MonkeyPatch, tmp_path: Path
+) -> None:
+    monkeypatch.setenv(WORKER_COMMAND_ENV, f'{sys.executable} {_STANDIN} {{port}} {{token}}')
+    req, jobs = _jobs(tmp_path, [0.05, 0.1])
+    topology, control, payload, out_dir = jobs[0]
+
+    async def caller() -> None:
+        with MatlabWorker(startup_timeout_s=30.0) as worker:
+            agent = SimulationAgent()
+            single = agent.run(
+                req, topology, control, payload, out_dir, True, template_override=_TEMPLATE, matlab_worker=worker
+            )
+            sweep = agent.run_sweep(req, jobs, use_matlab=True, template_override=_TEMPLATE, matlab_worker=worker)
+            direct = run_matlab_stub(payload, out_dir, worker=worker)
+        assert single.raw['job'] == direct.raw['job'] == payload.name
+        manifest = json.loads((tmp_path / 'matlab_batch_manifest.json').read_text(encoding='utf-8'))
+        assert [result.raw['job'] for result in sweep] == [entry['id'] for entry in manifest['jobs']]
+        synthetic = SimulationAgent().run(req, topology, control, payload, out_dir, False, template_override=_TEMPLATE)
+        assert synthetic.raw['mode'] == 'averaged_model'
+
+    asyncio.run(caller())
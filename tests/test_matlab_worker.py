@@ -0,0 +1,103 @@
+from __future__ import annotations
+
+import json
+import os
+import sys
+import threading
+from pathlib import Path
+
+import pytest
+
+from src.matlab_bridge import WORKER_COMMAND_ENV, MatlabWorker, MatlabWorkerError
+
+_STANDIN = Path(__file__).resolve().parent / 'matlab_worker_standin.py'
+
+
+def _use_standin(monkeypatch: pytest.MonkeyPatch, *flags: str) -> None:
+    monkeypatch.setenv(WORKER_COMMAND_ENV, ' '.join([sys.executable, str(_STANDIN), '{port}', '{token}', *flags]))
+
+
+def _payload(tmp_path: Path) -> Path:
+    path = tmp_path / 'model_payload.json'
+    path.write_text(json.dumps({'requirements': {'vout_target_v': 12.0}}), encoding='utf-8')
+    return path
+
+
+def _exited(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return True
+    return False
+
+
+def test_worker_handshake_ping_and_job(monkeypatch: pytest.MonkeyPatch, tmp_path: Path) -> None:
+    _use_standin(monkeypatch)
+    progress: list[tuple[str, float | None]] = []
+    with MatlabWorker(startup_timeout_s=30.0) as worker:
+        assert worker.alive and worker.ping()
+        reply = worker.run_job(
+            _payload(tmp_path),
+            tmp_path / 'matlab_result.json',
+            '',
+            on_progress=lambda stage, fraction: progress.append((stage, fraction)),
+        )
+        pid = worker.pid
+    assert reply['ok'] and worker.jobs_run == 1
+    assert progress == [('simulate', 0.5)]
+    assert json.loads((tmp_path / 'matlab_result.json').read_text(encoding='utf-8'))['job'] == 'model_payload.json'
+    assert not worker.alive and _exited(pid)
+
+
+def test_worker_rejects_a_wrong_handshake_token(monkeypatch: pytest.MonkeyPatch) -> None:
+    _use_standin(monkeypatch, '--bad-token')
+    worker = MatlabWorker(startup_timeout_s=30.0)
+    with pytest.raises(MatlabWorkerError, match='handshake'):
+        worker.start()
+    assert not worker.alive
+
+
+def test_worker_restarts_after_a_crash_mid_job(monkeypatch: pytest.MonkeyPatch, tmp_path: Path) -> None:
+    _use_standin(monkeypatch)
+    with MatlabWorker(startup_timeout_s=30.0) as worker:
+        first = worker.pid
+        reply = worker.run_job(
+            _payload(tmp_path), tmp_path / 'matlab_result.json', '', options={'crash_once': str(tmp_path / 'crashed')}
+        )
+        assert reply['ok'] and worker.restarts == 1
+        assert worker.pid != first and _exited(first)
+        assert worker.ping()
+
+
+def test_worker_gives_up_after_max_restarts(monkeypatch: pytest.MonkeyPatch, tmp_path: Path) -> None:
+    _use_standin(monkeypatch)
+    with MatlabWorker(startup_timeout_s=30.0, max_restarts=1) as worker:
+        with pytest.raises(MatlabWorkerError, match='crashed during job'):
+            worker.run_job(_payload(tmp_path), tmp_path / 'matlab_result.json', '', options={'crash': True})
+        assert worker.restarts == 1 and not worker.alive
+
+
+def test_worker_is_killed_when_a_job_times_out(monkeypatch: pytest.MonkeyPatch, tmp_path: Path) -> None:
+    _use_standin(monkeypatch)
+    with MatlabWorker(startup_timeout_s=30.0) as worker:
+        pid = worker.pid
+        with pytest.raises(MatlabWorkerError, match='exceeded'):
+            worker.run_job(
+                _payload(tmp_path), tmp_path / 'matlab_result.json', '', options={'sleep_s': 30.0}, timeout_s=0.5
+            )
+        assert not worker.alive and _exited(pid)
+        # The next job starts a fresh session.
+        assert worker.run_job(_payload(tmp_path), tmp_path / 'matlab_result.json', '')['ok']
+        assert worker.pid != pid
+
+
+def test_worker_cancel_from_another_thread_kills_the_job(monkeypatch: pytest.MonkeyPatch, tmp_path: Path) -> None:
+    _use_standin(monkeypatch)
+    with MatlabWorker(startup_timeout_s=30.0) as worker:
+        pid = worker.pid
+        timer = threading.Timer(0.3, worker.cancel)
+        timer.start()
+        with pytest.raises(MatlabWorkerError, match='cancelled'):
+            worker.run_job(_payload(tmp_path), tmp_path / 'matlab_result.json', '', options={'sleep_s': 30.0})
+        timer.join()
+        assert not worker.alive and _exited(pid)
@@ -0,0 +1,106 @@
+from __future__ import annotations
+
+from dataclasses import replace
+from pathlib import Path
+
+from src.agents.control_agent import ControlAgent
+from src.agents.control_strategy_agent import ControlStrategyAgent
+from src.agents.topology_agent import TopologyAgent
+from src.contracts import EvaluationResult, load_requirements
+from src.llm import estimate_tokens, prompt_json
+from src.llm.prompting import shared_prefix_length
+from src.rag import pack_retrieved_context
+from src.rag.contracts import KnowledgeChunk, RetrievedContext
+
+_EXAMPLES = Path(__file__).resolve().parents[1] / 'examples'
+
+
+class _RecordingClient:
+    enabled = True
+
+    def __init__(self, reply: dict[str, object]) -> None:
+        self.reply = reply
+        self.prompts: list[tuple[str, str]] = []
+
+    def complete_json(self, system_prompt: str, user_prompt: str, **kwargs: object) -> dict[str, object]:
+        self.prompts.append((system_prompt, user_prompt))
+        return dict(self.reply)
+
+
+def _chunk(name: str, words: int, **metadata: object) -> KnowledgeChunk:
+    text = ' '.join(f'{name}word{i}' for i in range(words))
+    return KnowledgeChunk(chunk_id=name, source_path=f'{name}.json', title=name.title(), section='notes', text=text, **metadata)
+
+
+def test_prompt_json_renders_equal_values_to_equal_bytes() -> None:
+    # Key order, float noise, unset fields and excluded fields do not change the bytes.
+    first = {'b': [1.0, 24.200000000000003], 'a': {'x': 0.1 + 0.2}, 'unset': None, 'skip': 'me'}
+    second = {'a': {'x': 0.3}, 'skip': 'other', 'b': [1.0, 24.2]}
+    assert prompt_json(first, exclude=['skip']) == prompt_json(second, exclude=['skip']) == '{"a":{"x":0.3},"b":[1.0,24.2]}'
+
+    req = load_requirements(_EXAMPLES / 'requirements_buck_48to12_500w.json')
+    revised = replace(req, control_design_notes='Reduce overshoot; slower integral action.')
+    assert prompt_json(req, exclude=['control_design_notes']) == prompt_json(revised, exclude=['control_design_notes'])
+
+
+def test_agent_prompts_keep_a_stable_prefix_across_iterations() -> None:
+    req = load_requirements(_EXAMPLES / 'requirements_buck_48to12_500w.json')
+    topology = TopologyAgent().design(req)
+    context = RetrievedContext(query='buck', chunks=[_chunk('alpha', 20, topology='buck')], scores=[1.0])
+    strategy = ControlStrategyAgent()
+    strategy.client = _RecordingClient(
+        {'controller': 'pi', 'architecture': 'pi', 'current_loop_enabled': False, 'inrush_control': 'none', 'secondary_controller': 'none'}
+    )
+    control = ControlAgent()
+    control.client = _RecordingClient({'controller': 'pi', 'architecture': 'pi', 'kp': 0.1, 'ki': 20.0, 'sample_time_s': 1e-5})
+
+    revisions = [
+        (req, None),
+        (replace(req, control_design_notes='Cut overshoot.'), EvaluationResult(passed=False, violations=['overshoot'], score=0.4)),
+    ]
+    for iteration, (revised, evaluation) in enumerate(revisions):
+        strategy._choose_with_llm(revised, topology, iteration, evaluation, context)
+        control._design_with_llm(revised, topology, iteration, {'controller': 'pi', 'knowledge_refs': ['x']}, context)
+
+    for client in (strategy.client, control.client):
+        (system_a, user_a), (system_b, user_b) = client.prompts
+        assert system_a == system_b
+        # Requirements and topology come first and do not change with revisions.
+        stable = user_a[: user_a.index('iteration=')]
+        assert stable.startswith('requirements=') and 'control_design_notes' not in stable
+        assert shared_prefix_length(user_a, user_b) >= len(stable)
+        assert user_a != user_b
+
+
+def test_packing_drops_lowest_scores_first_and_stays_within_budget() -> None:
+    chunks = [
+        _chunk('alpha', 30, topology='buck', architecture='pi'),
+        _chunk('beta', 30, topology='buck', architecture='pi'),
+        _chunk('gamma', 30, topology='buck', architecture='cascaded', operating_mode='standalone'),
+        _chunk('delta', 30, topology='buck', architecture='cascaded', operating_mode='standalone'),
+    ]
+    context = RetrievedContext(query='buck', chunks=chunks, scores=[9.0, 3.0, 5.0, 3.0])
+    full = pack_retrieved_context(context, max_tokens=10_000)
+    assert full.chunk_ids == ['alpha', 'beta', 'gamma', 'delta'] and not full.dropped_chunk_ids
+    # Metadata every chunk shares is stated once; a repeated set points back to its first chunk.
+    assert full.text.splitlines()[0] == 'shared [topology=buck]'
+    assert '[delta] Delta / notes [metadata as gamma]' in full.text
+
+    previous = full
+    for budget in range(full.tokens - 1, 0, -25):
+        packed = pack_retrieved_context(context, max_tokens=budget)
+        assert packed.tokens == estimate_tokens(packed.text)
+        assert packed.tokens <= budget or (packed.truncated and len(packed.chunk_ids) == 1)
+        # Ties drop the later-ranked chunk first, then the order is fixed by score.
+        expected_drops = ['delta', 'beta', 'gamma'][: len(packed.dropped_chunk_ids)]
+        assert packed.dropped_chunk_ids == expected_drops
+        assert packed.chunk_ids == [c.chunk_id for c in chunks if c.chunk_id not in expected_drops]
+        assert len(packed.chunk_ids) <= len(previous.chunk_ids)
+        previous = packed
+
+    lone = pack_retrieved_context(context, max_tokens=40)
+    assert lone.chunk_ids == ['alpha'] and lone.truncated and lone.tokens <= 40
+    assert lone.text.startswith('[alpha] Alpha / notes') and 'alphaword0' in lone.text
+    assert 'alphaword29' not in lone.text
+    empty = pack_retrieved_context(RetrievedContext(query='buck', chunks=[]))
+    assert empty.chunk_ids == [] and empty.tokens == estimate_tokens(empty.text)
@@ -0,0 +1,134 @@
+from __future__ import annotations
+
+import json
+import os
+import shutil
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from src.rag.benchmark import generate_corpus
+from src.rag.bm25 import tokenize
+from src.rag.chunk_store import chunk_store_path, encode_chunk
+from src.rag.contracts import KnowledgeIndex
+from src.rag.indexer import build_index, refresh_index
+from src.rag.postings import Postings
+from src.rag.retriever import LocalKnowledgeBase
+from src.rag.store import load_index
+
+_KNOWLEDGE = Path(__file__).resolve().parents[1] / 'knowledge'
+
+
+def _corpus(kind: str, tmp_path: Path) -> Path:
+    if kind == 'repo':
+        return Path(shutil.copytree(_KNOWLEDGE, tmp_path / 'knowledge', ignore=shutil.ignore_patterns('index*')))
+    return generate_corpus(tmp_path / 'synthetic', 2000)
+
+
+def _by_chunk_id(index: KnowledgeIndex, postings: Postings) -> dict[str, list[tuple[str, int]]]:
+    # Postings keyed by chunk id instead of position, so differently ordered indexes compare equal.
+    ids = [chunk.chunk_id for chunk in index.chunks]
+    values = postings.values if postings.values is not None else np.ones(len(postings.positions), dtype=np.int64)
+    runs: dict[str, list[tuple[str, int]]] = {}
+    for row, key in enumerate(postings.keys.tolist()):
+        lo, hi = int(postings.indptr[row]), int(postings.indptr[row + 1])
+        entries = zip(postings.positions[lo:hi], values[lo:hi])
+        runs[key] = sorted((ids[position], int(value)) for position, value in entries)
+    return runs
+
+
+def _content(files: dict[str, dict[str, object]]) -> dict[str, dict[str, object]]:
+    # Manifest entries without mtimes, which differ between the two trees.
+    return {name: {key: value for key, value in entry.items() if key != 'mtime_ns'} for name, entry in files.items()}
+
+
+@pytest.mark.parametrize('corpus', ['repo', 'synthetic'])
+def test_incremental_refresh_matches_a_full_rebuild(corpus: str, tmp_path: Path) -> None:
+    root = _corpus(corpus, tmp_path)
+    index_path = root / 'index.json'
+    index = build_index(root, index_path)
+    vectors = {chunk.chunk_id: row for chunk, row in zip(index.chunks, np.asarray(index.dense.vectors))}
+
+    # Touching a file without changing it re-ingests nothing.
+    files = sorted(path for path in root.rglob('*.json') if path.name != 'index.json')
+    os.utime(files[0], ns=(files[0].stat().st_atime_ns, files[0].stat().st_mtime_ns + 10**9))
+    assert refresh_index(root, index_path, index) is index
+
+    changed = json.loads(files[1].read_text(encoding='utf-8'))
+    changed['sections'][0]['text'] += ' extra buck overshoot damping'
+    changed['tags'] = ['weak_grid']
+    files[1].write_text(json.dumps(changed), encoding='utf-8')
+    files[2].unlink()
+    added = json.loads(files[3].read_text(encoding='utf-8'))
+    added['title'] = 'Added notes'
+    (files[3].parent / 'added_notes.json').write_text(json.dumps(added), encoding='utf-8')
+
+    patched = refresh_index(root, index_path, index)
+    reloaded = load_index(index_path)
+    full_root = Path(shutil.copytree(root, tmp_path / 'full', ignore=shutil.ignore_patterns('index*')))
+    full = build_index(full_root, full_root / 'index.json')
+
+    expected = {chunk.chunk_id: chunk for chunk in full.chunks}
+    assert len(expected) == len(full.chunks)
+    for candidate in (patched, reloaded):
+        assert {chunk.chunk_id: chunk for chunk in candidate.chunks} == expected
+        assert len(candidate.chunks) == len(full.chunks)
+        assert _content(candidate.files) == _content(full.files)
+        assert _by_chunk_id(candidate, candidate.lexical.postings) == _by_chunk_id(full, full.lexical.postings)
+        assert _by_chunk_id(candidate, candidate.facets.postings) == _by_chunk_id(full, full.facets.postings)
+        lengths = dict(zip((chunk.chunk_id for chunk in candidate.chunks), candidate.lexical.doc_lengths.tolist()))
+        assert lengths == dict(zip((chunk.chunk_id for chunk in full.chunks), full.lexical.doc_lengths.tolist()))
+
+        # Same postings and lengths, so the same BM25 score for every chunk.
+        tokens = tokenize('buck overshoot damping weak grid added notes settling')
+        scores = dict(zip((chunk.chunk_id for chunk in candidate.chunks), candidate.lexical.scores(tokens)))
+        full_scores = dict(zip((chunk.chunk_id for chunk in full.chunks), full.lexical.scores(tokens)))
+        assert scores == pytest.approx(full_scores, rel=1e-12)
+
+        # Unchanged chunks keep their LSA vectors; new ones are folded into the old basis.
+        dense = dict(zip((chunk.chunk_id for chunk in candidate.chunks), np.asarray(candidate.dense.vectors)))
+        assert len(dense) == len(candidate.chunks)
+        for chunk in candidate.chunks:
+            if chunk.source_path != str(files[1].relative_to(root)) and chunk.chunk_id in vectors:
+                assert np.array_equal(dense[chunk.chunk_id], vectors[chunk.chunk_id])
+
+
+def test_chunk_store_is_byte_exact_and_rebuilt_when_its_size_changes(tmp_path: Path) -> None:
+    root = _corpus('repo', tmp_path)
+    index_path = root / 'index.json'
+    index = build_index(root, index_path)
+    store_path = chunk_store_path(index_path)
+    for position, chunk in enumerate(index.chunks):
+        assert index.chunks.raw(position) == encode_chunk(chunk)
+    assert index.chunks.live_bytes == store_path.stat().st_size
+    assert load_index(index_path).chunks.source_paths == index.chunks.source_paths
+    chunk_ids = [chunk.chunk_id for chunk in index.chunks]
+
+    # Rewritten line endings or truncation shift every offset: the saved index is refused.
+    original = store_path.read_bytes()
+    for damaged in (original.replace(b'\n', b'\r\n'), original[:-1]):
+        store_path.write_bytes(damaged)
+        assert load_index(index_path) is None
+        kb = LocalKnowledgeBase(root)
+        assert [chunk.chunk_id for chunk in kb._load_chunks()] == chunk_ids
+        assert store_path.read_bytes() == original
+        assert load_index(index_path) is not None
+    store_path.unlink()
+    assert load_index(index_path) is None
+    (root / 'index_lexical_values.npy').unlink()
+    assert load_index(index_path) is None
+
+    # Repeated edits append to the store until dead bytes outweigh live ones, then it is compacted.
+    index = build_index(root, index_path)
+    source = sorted((root / 'tuning').glob('*.json'))[0]
+    data = json.loads(source.read_text(encoding='utf-8'))
+    sizes = []
+    for edit in range(40):
+        data['sections'][0]['text'] += f' edit{edit}' + ' padding' * 200
+        source.write_text(json.dumps(data), encoding='utf-8')
+        index = refresh_index(root, index_path, index)
+        sizes.append(store_path.stat().st_size)
+        assert store_path.stat().st_size <= 2 * index.chunks.live_bytes
+        assert f'edit{edit}' in LocalKnowledgeBase(root).retrieve(f'edit{edit}', mode='lexical').chunks[0].text
+    assert any(after < before for before, after in zip(sizes, sizes[1:]))
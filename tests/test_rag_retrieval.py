@@ -0,0 +1,226 @@
+from __future__ import annotations
+
+import json
+import math
+import shutil
+from collections import Counter
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from src.rag.benchmark import benchmark_queries, generate_corpus
+from src.rag.bm25 import BM25_B, BM25_K1, chunk_tokens, tokenize
+from src.rag.contracts import KnowledgeChunk, KnowledgeIndex
+from src.rag.facets import FACET_BOOSTS, LIST_FACETS, facet_values
+from src.rag import retriever
+from src.rag.retriever import (
+    DENSE_CANDIDATES,
+    DENSE_WEIGHT,
+    LocalKnowledgeBase,
+    _top_positions,
+    shared_knowledge_base,
+)
+from src.rag.store import load_index
+
+_KNOWLEDGE = Path(__file__).resolve().parents[1] / 'knowledge'
+_FACETS = (
+    'topic',
+    'topology',
+    'architecture',
+    'power_stage_family',
+    'control_objective',
+    'operating_mode',
+    'revision_trigger',
+    'plant_features',
+    'source_refs',
+    'tags',
+)
+
+
+def _knowledge_copy(tmp_path: Path) -> Path:
+    return Path(shutil.copytree(_KNOWLEDGE, tmp_path / 'knowledge', ignore=shutil.ignore_patterns('index*')))
+
+
+def _reference(
+    index: KnowledgeIndex, query: str, kwargs: dict[str, object], filters: dict[str, list[str]], mode: str
+) -> tuple[list[str], list[float]]:
+    # Ranking before near-stopword pruning: every admitted chunk sharing any
+    # query token (or among the admitted LSA neighbours) is a candidate, and
+    # all chunks are scored in full.
+    tokens = tokenize(query)
+    facets = {name: facet_values(kwargs.get(name) or []) for name in _FACETS}
+    admitted = index.facets.matching(filters) if filters else np.arange(len(index.chunks))
+    scores = np.zeros(len(index.chunks))
+    matched = np.zeros(len(index.chunks), dtype=bool)
+    if mode != 'dense':
+        bm25 = index.lexical.scores(tokens)
+        scores += bm25
+        matched |= bm25 > 0
+    if mode != 'lexical':
+        similarity = index.dense.similarities(tokens)
+        nearest = admitted[_top_positions(similarity[admitted], DENSE_CANDIDATES)]
+        matched[nearest[similarity[nearest] > 0]] = True
+        scores += DENSE_WEIGHT * np.maximum(similarity, 0.0)
+    scores += index.facets.boosts(facets)
+    candidates = np.intersect1d(np.flatnonzero(matched), admitted)
+    top = _top_positions(scores[candidates], int(kwargs.get('top_k', 3)))
+    return [index.chunks[position].chunk_id for position in candidates[top]], list(scores[candidates][top])
+
+
+@pytest.mark.parametrize('corpus', ['repo', 'synthetic'])
+def test_candidate_pruning_keeps_the_full_ranking(corpus: str, tmp_path: Path) -> None:
+    root = _knowledge_copy(tmp_path) if corpus == 'repo' else generate_corpus(tmp_path / 'synthetic', 2000)
+    kb = LocalKnowledgeBase(root, cache_size=0)
+    index = kb.rebuild()
+    calls = [(query, kwargs, {}) for query, kwargs in benchmark_queries()]
+    calls += [
+        ('buck overshoot slow settling', {'top_k': 5}, {'topology': ['buck']}),
+        ('weak grid damping current loop', {'top_k': 5}, {'tags': ['weak_grid', 'damping'], 'topic': ['tuning']}),
+    ]
+    for query, kwargs, filters in calls:
+        for mode in ('lexical', 'dense', 'hybrid'):
+            result = kb.retrieve(query, **{**kwargs, 'filters': filters or None, 'mode': mode})
+            ids, scores = _reference(index, query, kwargs, filters, mode)
+            assert [chunk.chunk_id for chunk in result.chunks] == ids
+            assert result.scores == pytest.approx(scores, abs=1e-9)
+
+
+def _textbook_bm25(chunks: list[list[str]], query: list[str], k1: float = BM25_K1, b: float = BM25_B) -> np.ndarray:
+    # Okapi BM25 from re-tokenized chunks, as ranking worked before the inverted index.
+    counts = [Counter(tokens) for tokens in chunks]
+    avg_length = sum(len(tokens) for tokens in chunks) / len(chunks)
+    scores = np.zeros(len(chunks))
+    for token, qtf in Counter(query).items():
+        df = sum(1 for tf in counts if token in tf)
+        if not df:
+            continue
+        idf = math.log(1.0 + (len(chunks) - df + 0.5) / (df + 0.5))
+        for position, tf in enumerate(counts):
+            if token in tf:
+                norm = k1 * (1.0 - b + b * len(chunks[position]) / avg_length)
+                scores[position] += qtf * idf * tf[token] * (k1 + 1.0) / (tf[token] + norm)
+    return scores
+
+
+@pytest.mark.parametrize('corpus', ['repo', 'synthetic'])
+def test_bm25_postings_score_like_textbook_bm25(corpus: str, tmp_path: Path) -> None:
+    root = _knowledge_copy(tmp_path) if corpus == 'repo' else generate_corpus(tmp_path / 'synthetic', 2000)
+    built = LocalKnowledgeBase(root).rebuild()
+    loaded = load_index(root / 'index.json')
+    assert loaded is not None
+    tokens = [chunk_tokens(chunk) for chunk in built.chunks]
+    assert np.array_equal(loaded.lexical.doc_lengths, [len(t) for t in tokens])
+
+    postings: dict[str, list[int]] = {}
+    for position, chunk in enumerate(tokens):
+        for token in sorted(set(chunk)):
+            postings.setdefault(token, []).append(position)
+    assert loaded.lexical.postings.keys.tolist() == sorted(postings)
+    for token in sorted(postings)[::7]:
+        assert loaded.lexical.postings.lookup(token).tolist() == postings[token]
+    assert loaded.lexical.postings.lookup('no_such_token').size == 0
+
+    # Small position sets match short postings and scatter long ones; large sets scatter everything.
+    few = np.arange(0, len(tokens), 11)
+    many = np.flatnonzero(np.arange(len(tokens)) % 5)
+    for query, _ in benchmark_queries()[::5]:
+        query_tokens = tokenize(query) + ['no_such_token']
+        expected = _textbook_bm25(tokens, query_tokens)
+        for index in (built, loaded):
+            assert index.lexical.scores(query_tokens) == pytest.approx(expected, rel=1e-12)
+            assert index.lexical.scores(query_tokens, few) == pytest.approx(expected[few], rel=1e-12)
+            assert index.lexical.scores(query_tokens, many) == pytest.approx(expected[many], rel=1e-12)
+
+
+def test_facet_filters_admit_only_matching_chunks_and_boosts_add_up(tmp_path: Path) -> None:
+    kb = LocalKnowledgeBase(_knowledge_copy(tmp_path))
+    index = kb.rebuild()
+    chunks = list(index.chunks)
+
+    def admitted(chunk: KnowledgeChunk, filters: dict[str, list[str]]) -> bool:
+        for name, values in filters.items():
+            held = getattr(chunk, name) if name in LIST_FACETS else [getattr(chunk, name)]
+            if not set(held) & set(values):
+                return False
+        return True
+
+    topologies = sorted({chunk.topology for chunk in chunks if chunk.topology})
+    tags = sorted({tag for chunk in chunks for tag in chunk.tags})
+    cases = [
+        {'topology': [topologies[0]]},
+        {'topology': topologies[:2], 'tags': tags[:3]},
+        {'topic': ['tuning'], 'tags': [tags[-1]]},
+        {'topology': ['no_such_topology']},
+    ]
+    for filters in cases:
+        expected = [position for position, chunk in enumerate(chunks) if admitted(chunk, filters)]
+        assert index.facets.matching(filters).tolist() == expected
+        # The first admitted chunk's title is sure to hit in every mode.
+        query = f'{chunks[expected[0]].title} overshoot' if expected else 'buck overshoot'
+        for mode in ('lexical', 'dense', 'hybrid'):
+            found = {chunk.chunk_id for chunk in kb.retrieve(query, filters=filters, mode=mode, top_k=50).chunks}
+            assert found <= {chunks[position].chunk_id for position in expected}
+            assert bool(found) == bool(expected)
+    # Filter values are normalized like facet arguments: one value or a list, any case.
+    upper = kb.retrieve('buck overshoot', filters={'topology': topologies[0].upper()}, top_k=50)
+    assert upper.chunks and all(chunk.topology == topologies[0] for chunk in upper.chunks)
+    with pytest.raises(ValueError, match='unknown knowledge facet'):
+        kb.retrieve('buck', filters={'colour': 'red'})
+
+    facets = {name: [] for name in FACET_BOOSTS}
+    facets.update(topology=[topologies[0]], topic=['tuning'], tags=tags[:2])
+    expected = [
+        FACET_BOOSTS['topology'] * (chunk.topology == topologies[0])
+        + FACET_BOOSTS['topic'] * (chunk.topic == 'tuning')
+        + FACET_BOOSTS['tags'] * len(set(chunk.tags) & set(tags[:2]))
+        for chunk in chunks
+    ]
+    subset = np.arange(0, len(chunks), 9)
+    assert index.facets.boosts(facets).tolist() == expected
+    assert index.facets.boosts(facets, subset).tolist() == [expected[position] for position in subset]
+
+
+def test_retrieval_cache_is_lru_and_dropped_when_the_index_changes(monkeypatch: pytest.MonkeyPatch, tmp_path: Path) -> None:
+    root = _knowledge_copy(tmp_path)
+    ranked: list[str] = []
+
+    def counted(index: KnowledgeIndex, tokens: list[str], *args: object) -> tuple[list[KnowledgeChunk], list[float]]:
+        ranked.append(' '.join(tokens))
+        return rank(index, tokens, *args)
+
+    rank = retriever._rank
+    monkeypatch.setattr(retriever, '_rank', counted)
+    kb = LocalKnowledgeBase(root, cache_size=2)
+    first = kb.retrieve('buck overshoot', topology='buck')
+    assert kb.retrieve('Buck  overshoot', topology='BUCK').chunks == first.chunks
+    kb.retrieve('grid damping')
+    kb.retrieve('buck overshoot', topology='buck')
+    kb.retrieve('slow settling')
+    # The buck query was used last, so the grid query is the one evicted.
+    kb.retrieve('buck overshoot', topology='buck')
+    kb.retrieve('grid damping')
+    assert ranked == ['buck overshoot', 'grid damping', 'slow settling', 'grid damping']
+    # Results for other modes, facets or sizes are cached separately.
+    kb.retrieve('buck overshoot', topology='buck', top_k=5)
+    assert len(ranked) == 5
+
+    # An unchanged tree keeps the cache; a changed file or a rebuild drops it.
+    kb.refresh()
+    kb.retrieve('grid damping')
+    assert len(ranked) == 5
+    source = next(path for path in sorted((root / 'tuning').glob('*.json')))
+    data = json.loads(source.read_text(encoding='utf-8'))
+    data['sections'][0]['text'] += ' zebra_marker'
+    source.write_text(json.dumps(data), encoding='utf-8')
+    kb.refresh()
+    assert [chunk.source_path for chunk in kb.retrieve('zebra_marker', mode='lexical').chunks] == [
+        source.relative_to(root).as_posix()
+    ]
+    kb.retrieve('grid damping')
+    kb.rebuild()
+    kb.retrieve('grid damping')
+    assert ranked[-3:] == ['zebra_marker', 'grid damping', 'grid damping']
+
+    assert shared_knowledge_base(root) is shared_knowledge_base(root / '.')
+    assert shared_knowledge_base(root) is not shared_knowledge_base(tmp_path / 'other')
@@ -0,0 +1,27 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+from src.contracts import load_requirements
+from src.orchestrator import ACSSOrchestrator
+from src.rescore import rescore_run
+
+_EXAMPLES = Path(__file__).resolve().parents[1] / 'examples'
+
+
+def test_rescoring_against_unchanged_requirements_reproduces_stored_metrics(tmp_path: Path) -> None:
+    requirements = _EXAMPLES / 'requirements_buck_48to12_500w.json'
+    run_dir = ACSSOrchestrator(
+        requirements,
+        tmp_path / 'runs',
+        use_matlab=False,
+        template_slx=_EXAMPLES / 'topology.slx',
+    ).run()
+
+    result = rescore_run(run_dir, load_requirements(requirements), tmp_path / 'rescore.json')
+
+    assert result['iterations']
+    for item in result['iterations']:
+        assert not item['notes']
+        assert item['metrics'] == item['stored_metrics']
+        assert item['evaluation'] == item['stored_evaluation']
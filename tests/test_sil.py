@@ -0,0 +1,70 @@
+from __future__ import annotations
+
+from dataclasses import replace
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from src.agents.control_agent import ControlAgent
+from src.agents.simulation_agent import _prepare_run, _resolve_parameter_values
+from src.agents.topology_agent import TopologyAgent
+from src.contracts import load_requirements
+from src.sim import SilController, simulate_dcdc_sil
+from src.sim.averaged import AveragedRun
+from src.sim.sil import find_c_compiler
+
+_EXAMPLES = Path(__file__).resolve().parents[1] / 'examples'
+
+
+@pytest.mark.skipif(find_c_compiler() is None, reason='no C compiler')
+def test_fast_controller_runs_in_blocks_with_fewer_foreign_calls(monkeypatch: pytest.MonkeyPatch, tmp_path: Path) -> None:
+    monkeypatch.setenv('ACSS_SIL_CACHE', str(tmp_path / 'cache'))
+    req = load_requirements(_EXAMPLES / 'requirements_buck_48to12_500w.json')
+    topology = TopologyAgent().design(req)
+    control = ControlAgent().design(req, topology)
+    # A controller sampled well above the plant's resolution shares each plant step.
+    control = replace(control, sample_time_s=control.sample_time_s / 8.0)
+    prepared = _prepare_run(req, topology, control, tmp_path, _EXAMPLES / 'topology.slx')
+    values, _ = _resolve_parameter_values(req, topology, control, [])
+
+    calls = {'block': 0, 'sample': 0}
+    step_block = SilController.step_block
+
+    def counted(self: SilController, u: np.ndarray, y: np.ndarray) -> None:
+        if self.has_block:
+            calls['block'] += 1
+        else:
+            calls['sample'] += u.shape[0]
+        step_block(self, u, y)
+
+    def run() -> AveragedRun:
+        return simulate_dcdc_sil(
+            req,
+            topology,
+            control,
+            values,
+            prepared.sfunc_wrapper_path,
+            prepared.sfun_name,
+            prepared.input_width,
+            prepared.output_width,
+            params=prepared.param_vector,
+        )
+
+    monkeypatch.setattr(SilController, 'step_block', counted)
+    blocked = run()
+    # Without the block entry point every sample is its own foreign call.
+    init = SilController.__init__
+
+    def without_block(self: SilController, *args: object, **kwargs: object) -> None:
+        init(self, *args, **kwargs)
+        self._block = None
+
+    monkeypatch.setattr(SilController, '__init__', without_block)
+    per_sample = run()
+
+    block = int(next(note for note in blocked.notes if note.startswith('sil_block_samples=')).split('=')[1])
+    assert block > 1
+    assert calls['sample'] == block * calls['block']
+    assert blocked.metrics == per_sample.metrics
+    assert np.array_equal(blocked.vout_v, per_sample.vout_v)
@@ -0,0 +1,76 @@
+from __future__ import annotations
+
+from dataclasses import replace
+from pathlib import Path
+
+from src.agents.control_agent import ControlAgent
+from src.agents.simulation_agent import _resolve_parameter_values
+from src.agents.topology_agent import TopologyAgent
+from src.contracts import load_requirements
+from src.sim import simulate_dcdc, simulate_dcdc_batch, simulate_inverter, simulate_inverter_batch
+from src.sim.averaged import _integrate_dcdc, pack_dcdc_candidates
+
+_EXAMPLES = Path(__file__).resolve().parents[1] / 'examples'
+
+
+def _candidates(requirements: str, variants: list[dict[str, object]]):
+    req = load_requirements(_EXAMPLES / requirements)
+    topology = TopologyAgent().design(req)
+    control = ControlAgent().design(req, topology)
+    candidates = []
+    for changes in variants:
+        candidate = replace(control, **changes)
+        values, _ = _resolve_parameter_values(req, topology, candidate, [])
+        candidates.append((topology, candidate, values))
+    return req, candidates
+
+
+def test_dcdc_batch_rows_match_single_runs_with_mixed_sample_times() -> None:
+    req, candidates = _candidates(
+        'requirements_buck_48to12_500w.json',
+        [{}, {'kp': 0.2, 'sample_time_s': 1e-4}, {'kp': 0.05, 'ki': 5.0}],
+    )
+    batch = simulate_dcdc_batch(req, candidates)
+    for row, (topology, control, values) in zip(batch.rows(), candidates):
+        assert row == simulate_dcdc(req, topology, control, values).metrics
+
+
+def test_dcdc_single_run_matches_the_array_path_step_for_step() -> None:
+    req, candidates = _candidates('requirements_buck_48to12_500w.json', [{}, {'kp': 0.05, 'ki': 5.0}])
+    for candidate in candidates:
+        horizon_s = float(candidate[2]['Tstop'])
+        single = _integrate_dcdc(pack_dcdc_candidates(req, [candidate]), horizon_s, req.fsw_hz)
+        # Two identical rows take the array path and freeze together.
+        pair = _integrate_dcdc(pack_dcdc_candidates(req, [candidate, candidate]), horizon_s, req.fsw_hz)
+        assert single.notes == [note for note in pair.notes if not note.startswith('diverged_candidates=')]
+        assert single.converged[0] == pair.converged[0]
+        assert (single.time_s == pair.time_s).all()
+        for trace in ('vout_v', 'il_a', 'duty'):
+            assert (getattr(single, trace)[:, 0] == getattr(pair, trace)[:, 0]).all()
+        assert {key: value[0] for key, value in single.metrics.items()} == {
+            key: value[0] for key, value in pair.metrics.items()
+        }
+
+
+def test_inverter_batch_rows_match_single_runs_with_mixed_sample_times() -> None:
+    req, candidates = _candidates(
+        'requirements_inverter_3ph_grid_loadstep_template.json',
+        [{}, {'sample_time_s': 1e-4}, {'architecture': 'droop', 'controller': 'droop'}],
+    )
+    batch = simulate_inverter_batch(req, candidates)
+    for row, (topology, control, values) in zip(batch.rows(), candidates):
+        assert row == simulate_inverter(req, topology, control, values).metrics
+
+
+def test_inverter_metrics_do_not_depend_on_the_recording_cap() -> None:
+    req, candidates = _candidates(
+        'requirements_inverter_3ph_grid_loadstep_template.json',
+        [{}, {'architecture': 'droop', 'controller': 'droop'}],
+    )
+    for topology, control, values in candidates:
+        full = simulate_inverter(req, topology, control, values, max_recorded=None)
+        capped = simulate_inverter(req, topology, control, values)
+        coarse = simulate_inverter(req, topology, control, values, max_recorded=101)
+        assert len(coarse.time_s) < len(capped.time_s) < len(full.time_s) == full.steps + 1
+        assert full.metrics == capped.metrics == coarse.metrics
+        assert (full.converged, full.notes) == (coarse.converged, coarse.notes)
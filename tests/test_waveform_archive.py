@@ -0,0 +1,74 @@
+from __future__ import annotations
+
+import json
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from src.orchestrator import ACSSOrchestrator
+from src.waveform_archive import ARCHIVE_CODECS, archive_ratio, verify_archive, write_archive
+from src.waveforms import open_waveforms, write_waveforms
+
+_EXAMPLES = Path(__file__).resolve().parents[1] / 'examples'
+
+
+def _waveforms(samples: int = 50000) -> dict[str, object]:
+    time_s = np.arange(samples) * 1e-6
+    return {
+        'time_s': time_s,
+        'vout_v': 12.0 + 0.3 * np.sin(2.0 * np.pi * 5e3 * time_s) * np.exp(-time_s / 5e-3),
+        'i_abc': np.stack([np.sin(2.0 * np.pi * 50.0 * time_s + phase) for phase in (0.0, 2.1, 4.2)], axis=1),
+        'law': 'dq',
+    }
+
+
+@pytest.mark.parametrize('codec', ARCHIVE_CODECS)
+def test_archive_window_reads_match_the_raw_bundle(codec: str, tmp_path: Path) -> None:
+    bundle = open_waveforms(write_waveforms(tmp_path / 'waveforms.wf', _waveforms()))
+    archive = open_waveforms(write_archive(bundle, tmp_path / 'waveforms.wfz', codec=codec, chunk_samples=4096))
+
+    assert archive.codec == codec
+    assert archive.channels == bundle.channels and archive.attrs == bundle.attrs
+    assert archive.sample_rate_hz == bundle.sample_rate_hz
+    assert archive_ratio(bundle, tmp_path / 'waveforms.wfz') > 1.0
+    # Windows inside one chunk, across chunk edges, over the ragged end and empty.
+    windows = [(0, 10), (4090, 4100), (1000, 13000), (49000, 50000), (45000, 60000), (7, 7), (60000, 70000)]
+    for name in bundle.channels:
+        assert archive.length(name) == bundle.length(name)
+        for start, stop in windows:
+            window = archive.read(name, start, stop)
+            assert window.shape == bundle.read(name, start, stop).shape
+            assert np.array_equal(window, bundle.read(name, start, stop))
+        assert np.array_equal(archive[name], bundle[name])
+    with pytest.raises(ValueError, match='codec'):
+        write_archive(bundle, tmp_path / 'other.wfz', codec='zstd')
+
+
+def test_verify_archive_accepts_a_faithful_copy_and_rejects_a_changed_one(tmp_path: Path) -> None:
+    bundle = open_waveforms(write_waveforms(tmp_path / 'waveforms.wf', _waveforms()))
+    archive = write_archive(bundle, tmp_path / 'waveforms.wfz')
+    assert verify_archive(bundle, archive)
+
+    changed = _waveforms()
+    changed['vout_v'][40000] += 1e-9
+    other = write_archive(open_waveforms(write_waveforms(tmp_path / 'changed.wf', changed)), tmp_path / 'changed.wfz')
+    assert not verify_archive(bundle, other)
+    other.write_bytes(other.read_bytes()[:-4])
+    assert not verify_archive(bundle, other)
+
+
+def test_runs_replace_raw_waveforms_with_the_archive_unless_asked_to_keep_them(tmp_path: Path) -> None:
+    for keep in (False, True):
+        run_dir = ACSSOrchestrator(
+            _EXAMPLES / 'requirements_buck_48to12_500w.json',
+            tmp_path / str(keep),
+            use_matlab=False,
+            template_slx=_EXAMPLES / 'topology.slx',
+            keep_raw_waveforms=keep,
+        ).run()
+        iter_dir = run_dir / 'iter_00'
+        summary = json.loads((iter_dir / 'summary.json').read_text(encoding='utf-8'))
+        assert (iter_dir / 'waveforms.wfz').exists()
+        assert (iter_dir / 'waveforms.wf').exists() == keep
+        assert Path(summary['simulation']['waveform_files'][0]).suffix == ('.wf' if keep else '.wfz')
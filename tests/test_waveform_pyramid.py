@@ -0,0 +1,56 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+import numpy as np
+
+from src.waveform_pyramid import open_pyramid, write_pyramid
+from src.waveforms import export_waveforms_json, open_waveforms, write_waveforms
+
+
+def _waveforms(samples: int = 20001) -> dict[str, object]:
+    rng = np.random.default_rng(3)
+    time_s = np.arange(samples) * 1e-6
+    return {
+        'time_s': time_s,
+        'vout_v': 12.0 + 0.1 * rng.standard_normal(samples),
+        'i_abc': np.zeros((samples, 3)),
+        'law': 'dq',
+    }
+
+
+def test_pyramid_levels_hold_the_min_and_max_of_each_bin(tmp_path: Path) -> None:
+    source = _waveforms()
+    bundle = open_waveforms(write_waveforms(tmp_path / 'waveforms.wf', source))
+    # An odd chunk size is rounded up to keep sample pairs within one chunk.
+    write_pyramid(bundle, top_bins=1000, chunk_samples=999)
+    pyramid = open_pyramid(bundle)
+
+    assert pyramid is not None and pyramid.channels == ['vout_v']
+    assert [level['length'] for level in pyramid.levels] == [10001, 5001, 2501, 1251, 626]
+    assert pyramid.level(0) is bundle
+    vout = source['vout_v']
+    for k in range(1, pyramid.top_level + 1):
+        level = pyramid.level(k)
+        factor = 2**k
+        assert level.attrs['factor'] == factor
+        assert np.array_equal(level['time_s'], source['time_s'][::factor])
+        bins = [vout[start : start + factor] for start in range(0, vout.size, factor)]
+        assert np.array_equal(level['vout_v'][:, 0], [b.min() for b in bins])
+        assert np.array_equal(level['vout_v'][:, 1], [b.max() for b in bins])
+
+    assert pyramid.level_for(20001, 20000) == 0
+    assert pyramid.level_for(20001, 2500) == 3
+    assert pyramid.level_for(20001, 10) == pyramid.top_level
+
+
+def test_pyramid_is_ignored_once_the_waveform_is_rewritten(tmp_path: Path) -> None:
+    path = write_waveforms(tmp_path / 'waveforms.wf', _waveforms())
+    write_pyramid(open_waveforms(path), top_bins=1000)
+    assert open_pyramid(open_waveforms(path)) is not None
+
+    write_waveforms(path, _waveforms(5000))
+    assert open_pyramid(open_waveforms(path)) is None
+    # Legacy JSON waveforms get no pyramid.
+    legacy = export_waveforms_json(path, tmp_path / 'waveforms.json')
+    assert write_pyramid(open_waveforms(legacy)) is None
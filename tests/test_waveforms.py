@@ -0,0 +1,107 @@
+from __future__ import annotations
+
+import json
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from src.waveforms import (
+    POINTS_PER_COLUMN,
+    channel_stats,
+    decimate_minmax,
+    decimated_chunks,
+    export_waveforms_json,
+    iter_chunks,
+    open_waveforms,
+    write_waveforms,
+)
+
+
+def _waveforms(samples: int = 20000) -> dict[str, object]:
+    time_s = np.arange(samples) * 1e-6
+    return {
+        'time_s': time_s,
+        'vout_v': 12.0 + 0.3 * np.sin(2.0 * np.pi * 5e3 * time_s) * np.exp(-time_s / 5e-3),
+        'i_abc': np.stack([np.sin(2.0 * np.pi * 50.0 * time_s + phase) for phase in (0.0, 2.1, 4.2)], axis=1),
+        'law': 'dq',
+        'vref_v': np.float64(12.0),
+    }
+
+
+def test_columnar_bundle_round_trips_through_memory_maps(tmp_path: Path) -> None:
+    source = _waveforms()
+    path = write_waveforms(tmp_path / 'waveforms.wf', source, export_json=tmp_path / 'waveforms.json')
+    bundle = open_waveforms(path)
+
+    assert bundle.channels == ['time_s', 'vout_v', 'i_abc']
+    assert bundle.attrs == {'law': 'dq', 'vref_v': 12.0}
+    assert bundle.sample_rate_hz == 1e6
+    assert bundle.unit('vout_v') == 'V' and bundle.unit('time_s') == 's'
+    assert bundle.length('i_abc') == 20000
+    for name in bundle.channels:
+        assert isinstance(bundle[name], np.memmap)
+        assert np.array_equal(bundle[name], source[name])
+        assert np.array_equal(bundle.read(name, 12345, 12400), source[name][12345:12400])
+    assert bundle.read('vout_v', 19990, 30000).shape == (10,)
+
+    # The JSON export is the legacy layout and opens to the same values.
+    legacy = open_waveforms(tmp_path / 'waveforms.json')
+    assert json.loads((tmp_path / 'waveforms.json').read_text(encoding='utf-8'))['law'] == 'dq'
+    for name in bundle.channels:
+        assert np.array_equal(legacy[name], source[name])
+    assert legacy.attrs == bundle.attrs
+    again = export_waveforms_json(legacy, tmp_path / 'again.json')
+    assert again.read_bytes() == (tmp_path / 'waveforms.json').read_bytes()
+
+
+def test_chunked_stats_match_the_full_array(tmp_path: Path) -> None:
+    source = _waveforms()
+    bundle = open_waveforms(write_waveforms(tmp_path / 'waveforms.wf', source))
+    vout = source['vout_v']
+    tail = vout[int(len(vout) * 0.8):]
+    for data in (bundle, source):
+        # 999 does not divide the length, so the tail starts inside a chunk.
+        whole, window = channel_stats(data, 'vout_v', tail_fraction=0.8, chunk_samples=999)
+        assert whole.count == len(vout) and window.count == len(tail)
+        assert (whole.minimum, whole.maximum) == (vout.min(), vout.max())
+        assert (window.minimum, window.maximum) == (tail.min(), tail.max())
+        assert whole.mean == pytest.approx(vout.mean(), rel=1e-12)
+        assert window.abs_mean == pytest.approx(np.abs(tail).mean(), rel=1e-12)
+
+    chunks = list(iter_chunks(bundle, ('time_s', 'i_abc'), chunk_samples=4096, start=100))
+    assert [len(time_s) for time_s, _ in chunks] == [4096] * 4 + [20000 - 100 - 4 * 4096]
+    assert np.array_equal(np.concatenate([time_s for time_s, _ in chunks]), source['time_s'][100:])
+    assert np.array_equal(np.concatenate([i_abc for _, i_abc in chunks]), source['i_abc'][100:])
+    # Channels of different lengths are cut to the shortest, as zip would.
+    ragged = {'time_s': source['time_s'], 'short': source['vout_v'][:5000]}
+    assert sum(len(t) for t, _ in iter_chunks(ragged, ('time_s', 'short'), chunk_samples=999)) == 5000
+
+
+def test_minmax_decimation_keeps_every_column_peak() -> None:
+    rng = np.random.default_rng(7)
+    time_s = np.arange(200000) * 1e-7
+    values = 12.0 + 0.01 * rng.standard_normal(time_s.size)
+    # One-sample spikes, far narrower than a pixel column.
+    values[[1234, 98765, 151515]] = [14.5, 9.0, 13.2]
+    columns = 300
+
+    t, v = decimate_minmax(time_s, values, columns)
+    assert t.size <= columns * POINTS_PER_COLUMN
+    assert np.all(np.diff(t) >= 0)
+    for index in (1234, 98765, 151515):
+        assert time_s[index] in t and values[index] in v
+    column = np.minimum((time_s / time_s[-1] * columns).astype(int), columns - 1)
+    kept = np.minimum((t / time_s[-1] * columns).astype(int), columns - 1)
+    for c in range(columns):
+        assert v[kept == c].max() == values[column == c].max()
+        assert v[kept == c].min() == values[column == c].min()
+    assert (t[0], v[0], t[-1], v[-1]) == (time_s[0], values[0], time_s[-1], values[-1])
+
+    # Fed chunk by chunk, the decimator keeps the same points.
+    chunks = [(time_s[i : i + 7777], values[i : i + 7777]) for i in range(0, time_s.size, 7777)]
+    (t_chunked, v_chunked), = decimated_chunks(chunks, time_s.size, time_s[0], time_s[-1], columns)
+    assert np.array_equal(t_chunked, t) and np.array_equal(v_chunked, v)
+    # A trace that already fits the plot passes through untouched.
+    short = [(time_s[:100], values[:100])]
+    assert list(decimated_chunks(short, 100, time_s[0], time_s[99], columns)) == short